@@ -0,0 +1,131 @@
+# --- Synthetic inputs for the hot-path benchmarks ---
+# Everything is generated from a seed, so two commits benchmarked with the same sizes see
+# byte-identical inputs. Shapes follow what the server reads in production: the
+# detailedStatusTable rows of live_report.html, <sim root>/<case>.<n>/<timestamp>/ directories
+# with a 'latest' symlink, parse_run.log and run.log, the IP test list under dv/sim_ctrl/ts, and
+# msim stdout interleaving UVM chatter with [TEST_DONE] lines.
+import os
+import random
+import time
+
+import hjson
+
+STATUS_WEIGHTS = (('P', 70), ('F', 15), ('K', 5), ('U', 10)) # Rough mix of a nightly regression
+ERROR_HINTS = ("UVM_ERROR tb_scoreboard.sv(812) @ {time} ns: [SCB] data mismatch exp 0x{value:08x}",
+               "UVM_FATAL tb_env.sv(120) @ {time} ns: [TIMEOUT] watchdog expired after {value} cycles",
+               "Job killed most likely because its dependent job failed.")
+_REPORT_HEAD = """<html>
+<head><title>Regression report</title></head>
+<body>
+<h2 align="center">Detailed Run Job Statuses</h2>
+<table id="detailedStatusTable" class="results">
+<thead>
+<tr>
+<th align="left">Job Name (Test Seed)</th>
+<th align="center">Status</th>
+<th align="center">Pass Rate</th>
+<th align="left">Log Path</th>
+<th align="left">Error Hint (if Failed/Killed)</th>
+<th align="center">Select for Rerun</th>
+</tr>
+</thead>
+<tbody>
+"""
+_REPORT_TAIL = """<tr>
+<td align="left"><strong>Total Run Jobs</strong></td>
+<td align="center">Completed: {total}</td>
+<td align="center"><strong>0.00%</strong></td>
+<td align="left">({total} total logs)</td>
+<td align="left">Failed/Killed: {failed}</td>
+<td align="center"></td>
+</tr>
+</tbody>
+</table>
+</body>
+</html>
+"""
+
+def case_ids(count, ip_name="ipx", test_count=None, seed=0):
+    # "<ip>_t<n>_seed<seed>" ids, several seeds per test as in a real regression
+    rng = random.Random(seed)
+    test_count = test_count or max(1, count // 4)
+    return [f"{ip_name}_t{index % test_count}_seed{rng.randrange(1, 2 ** 32)}" for index in range(count)]
+
+def _weighted_status(rng):
+    return rng.choices([status for status, _ in STATUS_WEIGHTS], weights=[weight for _, weight in STATUS_WEIGHTS])[0]
+
+def write_html_report(path, ids, seed=0):
+    # A live_report.html with one detailedStatusTable row per case id
+    rng = random.Random(seed)
+    failed_count = 0
+    with open(path, 'w') as report_file:
+        report_file.write(_REPORT_HEAD)
+        for case_id in ids:
+            test_name, case_seed = case_id.rsplit('_seed', 1)
+            status = _weighted_status(rng)
+            error_hint = ""
+            if status in ('F', 'K'):
+                failed_count += 1
+                error_hint = rng.choice(ERROR_HINTS).format(time=rng.randrange(10 ** 6), value=rng.randrange(2 ** 32))
+            report_file.write(f'<tr>\n<td align="left">{test_name} (Seed: {case_seed})</td>\n'
+                              f'<td align="center" class="status-{status}">{status}</td>\n'
+                              f'<td align="center">{100 if status == "P" else 0}%</td>\n'
+                              f'<td align="left"><code>sim/{test_name}.0/2025-05-21_16-52-27-549608/run.log</code></td>\n'
+                              f'<td align="left">{error_hint}</td>\n'
+                              f'<td align="center"><input type="checkbox" class="rerun-checkbox" data-casename="{test_name}" data-seed="{case_seed}"></td>\n'
+                              f'</tr>\n')
+        report_file.write(_REPORT_TAIL.format(total=len(ids), failed=failed_count))
+    return path
+
+def rerun_results(ids, round_index, seed=0):
+    # detailed_results as parse_msim_output_for_test_statuses returns them; the status flips
+    # every round so each round really rewrites the rows
+    rng = random.Random(seed + round_index)
+    return [{"id": case_id, "status": "PASSED" if (index + round_index) % 2 else "FAILED",
+             "error_hint": "" if (index + round_index) % 2 else ERROR_HINTS[0].format(time=rng.randrange(10 ** 6), value=rng.randrange(2 ** 32)),
+             "new_log_path": f"rerun/sim/{case_id}/latest/run.log"} for index, case_id in enumerate(ids)]
+
+def write_sim_root(sim_root, ids, seed=0, with_run_logs=True, missing_parse_log_every=10, run_log_lines=200):
+    # <sim_root>/<case_id>.0/<timestamp>/{run.log,parse_run.log} plus a 'latest' symlink. Every
+    # missing_parse_log_every-th case has no parse_run.log (its status then comes from msim
+    # stdout); failing cases get a run.log with a UVM_ERROR part way through.
+    rng = random.Random(seed)
+    timestamp = time.strftime('%Y-%m-%d_%H-%M-%S', time.gmtime(1700000000))
+    os.makedirs(sim_root, exist_ok=True)
+    for index, case_id in enumerate(ids):
+        run_dir = os.path.join(sim_root, f"{case_id}.0", timestamp)
+        os.makedirs(run_dir, exist_ok=True)
+        os.symlink(timestamp, os.path.join(sim_root, f"{case_id}.0", 'latest'))
+        passed = _weighted_status(rng) == 'P'
+        if missing_parse_log_every <= 0 or index % missing_parse_log_every:
+            with open(os.path.join(run_dir, 'parse_run.log'), 'w') as parse_log_file: parse_log_file.write('run.log passed\n' if passed else 'run.log failed\n')
+        if with_run_logs:
+            with open(os.path.join(run_dir, 'run.log'), 'w') as run_log_file:
+                for line_index in range(run_log_lines):
+                    run_log_file.write(f"UVM_INFO tb_seq.sv({line_index}) @ {line_index * 10} ns: [SEQ] item {line_index} sent\n")
+                    if not passed and line_index == run_log_lines // 2:
+                        run_log_file.write(ERROR_HINTS[0].format(time=line_index * 10, value=rng.randrange(2 ** 32)) + "\n")
+                run_log_file.write(f"--- UVM Report Summary ---\nUVM_ERROR :    {0 if passed else 1}\nUVM_FATAL :    0\n")
+    return sim_root
+
+def msim_stdout(ids, seed=0, noise_lines_per_case=5):
+    # Merged msim stdout: compile/run chatter with one [TEST_DONE] line per case
+    rng = random.Random(seed)
+    lines = ["DIAG_PRJ_ICDIR_VALUE: /proj/ipx", "msim: compiling default build"]
+    for case_id in ids:
+        lines += [f"# UVM_INFO @ {rng.randrange(10 ** 6)} ns: reporter [RNTST] Running test for {case_id}" for _ in range(noise_lines_per_case)]
+        lines.append(f"[TEST_DONE] Test {case_id} ({'PASSED' if rng.random() < 0.8 else 'FAILED'})")
+    return "\n".join(lines)
+
+def write_project_hjson(project_root, ip_name, test_count, seed=0):
+    # <project_root>/dv/sim_ctrl/ts/<ip>/<ip>.hjson with test_count test definitions
+    rng = random.Random(seed)
+    hjson_dir = os.path.join(project_root, "dv", "sim_ctrl", "ts", ip_name)
+    os.makedirs(hjson_dir, exist_ok=True)
+    tests = [{"name": f"{ip_name}_t{index}", "uvm_test_seq": f"{ip_name}_t{index}_vseq", "build_mode": rng.choice(("default", "cov", "gls")),
+              "run_opts": [f"+timeout_ns={rng.randrange(10 ** 6, 10 ** 8)}", f"+ntb_random_seed={rng.randrange(2 ** 32)}"],
+              "reseed": rng.randrange(1, 50)} for index in range(test_count)]
+    regressions = [{"name": "nightly", "tests": [test["name"] for test in tests]}, {"name": "smoke", "tests": [test["name"] for test in tests[:20]]}]
+    hjson_path = os.path.join(hjson_dir, f"{ip_name}.hjson")
+    with open(hjson_path, 'w') as hjson_file: hjson.dump({"tests": tests, "regressions": regressions}, hjson_file, indent=2)
+    return hjson_path
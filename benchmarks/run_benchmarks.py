@@ -0,0 +1,168 @@
+"""
+Micro-benchmarks for the report and log-parsing hot paths of live_report_server_v1p0.
+
+    python benchmarks/run_benchmarks.py                      # default sizes, JSON on stdout
+    python benchmarks/run_benchmarks.py --output before.json --repeat 5
+    python benchmarks/run_benchmarks.py --filter total_stats --sizes 1000,10000,100000
+
+Each benchmark runs against synthetic inputs from generators.py in a scratch directory. Timed
+runs come first (min / median seconds, items per second from the best run), then one more run
+under tracemalloc for the peak of Python allocations. 'cold' variants delete the report
+sidecar and reset the report model cache before every run; 'warm' variants run against an
+already synced sidecar and cached model. Report writes use a zero batch window, so only the
+rewrite itself is timed. Compare two commits by diffing the JSON of runs with the same sizes.
+"""
+import argparse
+import contextlib
+import gc
+import json
+import logging
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(BENCHMARKS_DIR)
+sys.path[:0] = [REPO_ROOT, BENCHMARKS_DIR]
+
+with contextlib.redirect_stdout(sys.stderr): # Import-time notices must not end up in the JSON on stdout
+    import live_report_server_v1p0 as server
+import generators
+
+server.REPORT_WRITE_BATCH_WINDOW_SECONDS = 0.0
+
+def _reset_report_caches(html_file_path):
+    # Cold start for one report: no sidecar store on disk, no cached model in the process
+    for suffix in ('', '-wal', '-shm', '-journal'):
+        with contextlib.suppress(FileNotFoundError): os.remove(f"{html_file_path}{server.REPORT_SIDECAR_SUFFIX}{suffix}")
+    server.REPORT_MODEL_CACHE = server.ReportModelCache(server.REPORT_MODEL_CACHE_MAX_BYTES)
+
+# --- Benchmarks: prepare(work_dir, size) -> (before_each, run, items per run) ---
+def prepare_report_stats(cold):
+    def prepare(work_dir, size):
+        html_file_path = generators.write_html_report(os.path.join(work_dir, 'live_report.html'), generators.case_ids(size))
+        before_each = (lambda: _reset_report_caches(html_file_path)) if cold else (lambda: None)
+        run = lambda: server.calculate_total_stats_from_html(html_file_path, logger_for_internal_errors=logging.getLogger('benchmarks'))
+        if not cold: run() # Sync the sidecar and cache the model once
+        return before_each, run, size
+    return prepare
+
+def prepare_report_update(cold):
+    # A rerun of 1% of the report's cases (at least one); statuses flip every round
+    def prepare(work_dir, size):
+        ids = generators.case_ids(size)
+        html_file_path = generators.write_html_report(os.path.join(work_dir, 'live_report.html'), ids)
+        rerun_ids = ids[::100]
+        round_counter = iter(range(10 ** 9))
+        def run():
+            if not server.update_html_report_on_disk(html_file_path, generators.rerun_results(rerun_ids, next(round_counter)), None, None, None, None, None):
+                raise RuntimeError("update_html_report_on_disk applied no results")
+        before_each = (lambda: _reset_report_caches(html_file_path)) if cold else (lambda: None)
+        if not cold: run()
+        return before_each, run, len(rerun_ids)
+    return prepare
+
+def prepare_parse_msim_output(work_dir, size):
+    ids = generators.case_ids(size)
+    sim_root = generators.write_sim_root(os.path.join(work_dir, 'ipx-main', 'sim'), ids)
+    stdout_text = generators.msim_stdout(ids)
+    def run():
+        results = server.parse_msim_output_for_test_statuses(stdout_text, ids, sim_root, "work/d1/ipx-main")
+        if len(results) != len(ids): raise RuntimeError("parse_msim_output_for_test_statuses lost cases")
+    return (lambda: None), run, size
+
+def prepare_rerun_hjson(work_dir, size):
+    # size tests in the IP's hjson, one seed of each selected for the rerun
+    generators.write_project_hjson(work_dir, 'ipx', size)
+    options = {'selectedCases': generators.case_ids(size, test_count=size)}
+    def run():
+        if not server.prepare_rerun_hjson_files(work_dir, options, work_dir, 'ipx'): raise RuntimeError("prepare_rerun_hjson_files failed")
+    return (lambda: None), run, size
+
+def prepare_find_primary_log(with_run_logs):
+    # Called with the work area context dir; without any run.log/comp.log the whole sim tree is walked, twice
+    def prepare(work_dir, size):
+        context_dir = os.path.join(work_dir, 'ipx-main')
+        generators.write_sim_root(os.path.join(context_dir, 'sim'), generators.case_ids(size), with_run_logs=with_run_logs, run_log_lines=10)
+        def run():
+            if (server.find_primary_log_for_rerun(context_dir) is None) == with_run_logs: raise RuntimeError("find_primary_log_for_rerun returned an unexpected result")
+        return (lambda: None), run, size
+    return prepare
+
+BENCHMARKS = [ # (name, variant, default sizes, prepare)
+    ('calculate_total_stats_from_html', 'cold', (1000, 10000, 100000), prepare_report_stats(cold=True)),
+    ('calculate_total_stats_from_html', 'warm', (1000, 10000, 100000), prepare_report_stats(cold=False)),
+    ('update_html_report_on_disk', 'cold', (1000, 10000, 100000), prepare_report_update(cold=True)),
+    ('update_html_report_on_disk', 'warm', (1000, 10000, 100000), prepare_report_update(cold=False)),
+    ('parse_msim_output_for_test_statuses', 'sim_root', (100, 300, 1000), prepare_parse_msim_output),
+    ('prepare_rerun_hjson_files', 'all_selected', (100, 1000, 5000), prepare_rerun_hjson),
+    ('find_primary_log_for_rerun', 'found', (1000, 10000), prepare_find_primary_log(with_run_logs=True)),
+    ('find_primary_log_for_rerun', 'missing', (1000, 10000), prepare_find_primary_log(with_run_logs=False)),
+]
+
+def measure(before_each, run, repeat):
+    # (seconds of each timed run, tracemalloc peak bytes of one more run); the functions' own prints are discarded
+    timings = []
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        for _ in range(repeat):
+            before_each(); gc.collect()
+            started_perf = time.perf_counter(); run(); timings.append(time.perf_counter() - started_perf)
+        before_each(); gc.collect()
+        tracemalloc.start()
+        try:
+            run(); _, peak_bytes = tracemalloc.get_traced_memory()
+        finally: tracemalloc.stop()
+    return timings, peak_bytes
+
+def _git_commit():
+    try: return subprocess.run(["git", "rev-parse", "HEAD"], cwd=REPO_ROOT, capture_output=True, text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError): return None
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the report and log-parsing hot paths; prints JSON results.")
+    parser.add_argument('--filter', default='', help="Only run benchmarks whose 'name/variant' contains this text.")
+    parser.add_argument('--sizes', default='', help="Comma-separated sizes overriding every benchmark's defaults.")
+    parser.add_argument('--repeat', type=int, default=3, help="Timed runs per benchmark and size (default 3).")
+    parser.add_argument('--output', help="Also write the JSON results to this file.")
+    parser.add_argument('--keep-work-dir', action='store_true', help="Leave the generated inputs behind for inspection.")
+    args = parser.parse_args(argv)
+    override_sizes = tuple(int(size) for size in args.sizes.split(',') if size.strip())
+
+    results = []
+    work_root = tempfile.mkdtemp(prefix='live_report_bench_')
+    try:
+        for name, variant, default_sizes, prepare in BENCHMARKS:
+            if args.filter not in f"{name}/{variant}": continue
+            for size in override_sizes or default_sizes:
+                work_dir = os.path.join(work_root, f"{name}-{variant}-{size}"); os.makedirs(work_dir)
+                with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+                    setup_started_perf = time.perf_counter()
+                    before_each, run, item_count = prepare(work_dir, size)
+                    setup_seconds = time.perf_counter() - setup_started_perf
+                timings, peak_bytes = measure(before_each, run, max(1, args.repeat))
+                results.append({'name': name, 'variant': variant, 'size': size, 'items': item_count, 'repeat': len(timings),
+                                'min_seconds': round(min(timings), 6), 'median_seconds': round(statistics.median(timings), 6),
+                                'items_per_second': round(item_count / min(timings), 1) if min(timings) > 0 else None,
+                                'peak_traced_bytes': peak_bytes, 'setup_seconds': round(setup_seconds, 3)})
+                print(f"{name}/{variant} size={size}: {min(timings) * 1000:.1f} ms min, {peak_bytes / (1024 * 1024):.1f} MB peak", file=sys.stderr)
+                if not args.keep_work_dir: shutil.rmtree(work_dir, ignore_errors=True)
+    finally:
+        if not args.keep_work_dir: shutil.rmtree(work_root, ignore_errors=True)
+        else: print(f"Inputs kept in {work_root}", file=sys.stderr)
+
+    report = {'commit': _git_commit(), 'created_at': time.strftime('%Y-%m-%dT%H:%M:%S%z'), 'python': platform.python_version(),
+              'platform': platform.platform(), 'cpu_count': os.cpu_count(), 'results': results}
+    report_text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as output_file: output_file.write(report_text + "\n")
+    print(report_text)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
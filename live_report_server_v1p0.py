@@ -9,9 +9,25 @@ import uuid
 import time
 import copy
 import re
-from flask import render_template, request, jsonify, send_from_directory, Blueprint, Flask, current_app
+import mmap
+import html
+import tempfile
+import contextlib
+import collections
+import gzip
+import hashlib
+import bisect
+import fnmatch
+import json
+import zlib
+import sqlite3
+import select
+import struct
+import heapq
+import sys
+import atexit
+from flask import render_template, request, jsonify, send_file, Response, Blueprint, Flask, current_app, abort, g
 from flask_cors import CORS # Added CORS import
-from bs4 import BeautifulSoup # Added BeautifulSoup import
 # Removed: from .app import app as main_flask_app
 import os.path # For path manipulation in update_html_report_on_disk
 # Attempt to import database models and extension, fail gracefully if not available for standalone use
@@ -22,6 +38,19 @@ except ImportError:
     Repo = None
     db = None
     print("Warning: 'models' or 'extensions' module not found. Database features will be disabled.")
+try:
+    import fcntl # POSIX only; used to serialize report rewrites across server processes
+except ImportError:
+    fcntl = None
+try:
+    import ctypes, ctypes.util # inotify for the live sim-directory watcher (Linux only)
+    _libc = ctypes.CDLL(ctypes.util.find_library('c') or None, use_errno=True)
+    _inotify_init1 = _libc.inotify_init1
+    _inotify_add_watch = _libc.inotify_add_watch
+    _inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+except (ImportError, OSError, AttributeError):
+    _inotify_init1 = None
+    _inotify_add_watch = None
 
 _current_file_dir = os.path.dirname(os.path.abspath(__file__))
 _project_root_approx = os.path.dirname(_current_file_dir)
@@ -49,10 +78,119 @@ def log_bp_request():
 
     _logger_instance_bp.info(f"--- Blueprint 'live_reporter' before_request: Path: {request.path}, Endpoint: {request.endpoint}, Method: {request.method} ---")
     print(f"[DEBUG_PRINT_BP_BEFORE_REQUEST] Path: {request.path}, Endpoint: {request.endpoint}, Method: {request.method} at {time.strftime('%Y-%m-%d %H:%M:%S')}")
+    g.request_started_perf = time.perf_counter()
+
+@bp.after_request
+def record_bp_request_latency(response):
+    # Time to produce the response object; a streamed body (log follow) is not included
+    request_started_perf = g.get('request_started_perf')
+    if request_started_perf is not None:
+        METRICS.observe('live_report_request_duration_seconds', time.perf_counter() - request_started_perf,
+                        endpoint=(request.endpoint or 'unknown').rsplit('.', 1)[-1], status=str(response.status_code))
+    return response
 
 script_dir = os.path.dirname(os.path.abspath(__file__))
 JOB_STATUS = {}
 
+# --- Metrics registry (Prometheus text format at /metrics) ---
+# Every thread updates its own shard (a plain dict reached through threading.local), so
+# counting an output line or observing a latency takes no lock; a scrape sums the shards.
+# Shards of finished threads are folded into one retired shard at scrape time, which keeps the
+# shard list as short as the live thread count. Values reflect the last moment each thread
+# wrote, which is all a scrape needs.
+class MetricsRegistry:
+    def __init__(self):
+        self._metric_definitions = {} # name -> (type, help, histogram bucket bounds)
+        self._thread_local = threading.local()
+        self._shards_lock = threading.Lock() # Taken when a thread first writes and at scrape time, never per update
+        self._thread_shards = [] # (thread, shard)
+        self._retired_shard = {}
+
+    def counter(self, name, help_text):
+        self._metric_definitions[name] = ('counter', help_text, None)
+
+    def histogram(self, name, help_text, bucket_bounds):
+        self._metric_definitions[name] = ('histogram', help_text, tuple(sorted(bucket_bounds)))
+
+    def _shard(self):
+        shard = getattr(self._thread_local, 'shard', None)
+        if shard is None:
+            shard = self._thread_local.shard = {}
+            with self._shards_lock: self._thread_shards.append((threading.current_thread(), shard))
+        return shard
+
+    def inc(self, name, value=1, **labels):
+        shard = self._shard(); key = (name, tuple(sorted(labels.items())))
+        shard[key] = shard.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        # Histogram state: [per-bucket counts..., +Inf count, sum]
+        shard = self._shard(); key = (name, tuple(sorted(labels.items())))
+        state = shard.get(key)
+        bucket_bounds = self._metric_definitions[name][2]
+        if state is None: state = shard[key] = [0] * (len(bucket_bounds) + 1) + [0.0]
+        state[bisect.bisect_left(bucket_bounds, value)] += 1
+        state[-1] += value
+
+    @staticmethod
+    def _merge_into(target_shard, source_shard):
+        for key, value in list(source_shard.items()):
+            if isinstance(value, list):
+                target_state = target_shard.setdefault(key, [0] * (len(value) - 1) + [0.0])
+                for index, item in enumerate(value): target_state[index] += item
+            else: target_shard[key] = target_shard.get(key, 0) + value
+
+    def collect(self):
+        # {(name, labels): value or histogram state}, summed over all threads
+        with self._shards_lock:
+            live_thread_shards = []
+            for thread, shard in self._thread_shards:
+                if thread.is_alive(): live_thread_shards.append((thread, shard))
+                else: self._merge_into(self._retired_shard, shard) # Its thread can no longer write to it
+            self._thread_shards = live_thread_shards
+            totals = {}
+            self._merge_into(totals, self._retired_shard)
+            for _, shard in live_thread_shards: self._merge_into(totals, shard)
+        return totals
+
+    def render(self, gauges=()):
+        # Prometheus text exposition; gauges are (name, help, {labels tuple: value}) computed by the caller
+        def label_text(labels, extra=()):
+            label_items = list(labels) + list(extra)
+            if not label_items: return ""
+            escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in label_items)
+            return "{" + ",".join(f'{key}="{value}"' for (key, _), value in zip(label_items, escaped)) + "}"
+        values_by_name = collections.defaultdict(list)
+        for (name, labels), value in self.collect().items(): values_by_name[name].append((labels, value))
+        lines = []
+        for name, (metric_type, help_text, bucket_bounds) in self._metric_definitions.items():
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {metric_type}"]
+            for labels, value in sorted(values_by_name.get(name, [])):
+                if metric_type != 'histogram':
+                    lines.append(f"{name}{label_text(labels)} {value}"); continue
+                cumulative_count = 0
+                for bucket_bound, bucket_count in zip(bucket_bounds + (float('inf'),), value[:-1]):
+                    cumulative_count += bucket_count
+                    lines.append(f"{name}_bucket{label_text(labels, [('le', '+Inf' if bucket_bound == float('inf') else repr(float(bucket_bound)))])} {cumulative_count}")
+                lines += [f"{name}_sum{label_text(labels)} {value[-1]}", f"{name}_count{label_text(labels)} {cumulative_count}"]
+        for name, help_text, values_by_labels in gauges:
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} gauge"]
+            lines += [f"{name}{label_text(labels)} {value}" for labels, value in sorted(values_by_labels.items())]
+        return "\n".join(lines) + "\n"
+
+METRICS = MetricsRegistry()
+METRICS.counter('live_report_output_lines_total', "Job output lines ingested.")
+METRICS.counter('live_report_output_bytes_total', "Job output bytes ingested (UTF-8).")
+METRICS.counter('live_report_jobs_finished_total', "Rerun jobs finished, by final status.")
+METRICS.histogram('live_report_stage_duration_seconds', "Rerun stage latency (prepare_hjson, git_pull, msim, parse_results, report_update, ...).",
+                  (0.1, 0.5, 1, 5, 15, 60, 300, 900, 1800, 3600, 7200, 14400, 43200))
+METRICS.histogram('live_report_report_parse_seconds', "Report parsing: full HTML scans into the sidecar and model loads.",
+                  (0.01, 0.05, 0.1, 0.5, 1, 2.5, 5, 10, 30, 60))
+METRICS.histogram('live_report_report_write_seconds', "Batched report writes (row patching plus sidecar update).",
+                  (0.01, 0.05, 0.1, 0.5, 1, 2.5, 5, 10, 30, 60))
+METRICS.histogram('live_report_request_duration_seconds', "Blueprint request latency by endpoint.",
+                  (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5))
+
 def update_job_status(job_id, status, message=None, command=None, returncode=None, stdout=None, stderr=None):
     if job_id not in JOB_STATUS:
         JOB_STATUS[job_id] = {"output_lines": [], "status": "initializing", "message": "Job initializing."}
@@ -70,6 +208,8 @@ def add_output_line_to_job(job_id, line):
     elif "output_lines" not in JOB_STATUS[job_id]:
          JOB_STATUS[job_id]["output_lines"] = []
     JOB_STATUS[job_id]["output_lines"].append(line)
+    METRICS.inc('live_report_output_lines_total')
+    METRICS.inc('live_report_output_bytes_total', len(line.encode('utf-8', 'surrogateescape')))
 
     if 'progress_summary' in JOB_STATUS[job_id] and JOB_STATUS[job_id].get('status') == 'running_msim':
         uvm_test_done_pattern = re.compile(r"\[TEST_DONE\]\s*Test\s*([\w_.-]+seed\d+)\s*\((\w+)\)")
@@ -83,10 +223,159 @@ def add_output_line_to_job(job_id, line):
                     summary['passed_count'] += 1
                 elif status_from_log == "FAILED":
                     summary['failed_count'] += 1
+            note_case_finished(job_id, match.group(1))
 
 def get_job_status(job_id):
     return JOB_STATUS.get(job_id, {"status": "not_found", "message": "Job ID not found.", "output_lines": []})
 
+# --- Per-job span timing ---
+# Spans are plain dicts in JOB_STATUS[job_id]['spans'] (epoch start, seconds, lane, args), so they
+# are served with the job status and export as Chrome trace events. The rerun task's stages are
+# consecutive spans started with begin_job_stage(); helper calls nest inside them via job_span().
+# A lane is a thread name, or a named track such as one msim shard.
+_OPEN_JOB_STAGES = {} # job_id -> (stage name, start epoch, start perf_counter, lane)
+
+def record_job_span(job_id, name, start_time, duration_seconds, lane=None, category="rerun", args=None):
+    if job_id is None or job_id not in JOB_STATUS: return
+    JOB_STATUS[job_id].setdefault('spans', []).append({'name': name, 'cat': category, 'start': start_time, 'duration': round(duration_seconds, 6),
+                                                        'lane': lane or threading.current_thread().name, 'args': args or {}})
+
+@contextlib.contextmanager
+def job_span(job_id, name, category="rerun", **span_args):
+    # Times the block; the yielded args dict can be extended before it closes
+    start_time = time.time(); start_perf = time.perf_counter()
+    try: yield span_args
+    finally: record_job_span(job_id, name, start_time, time.perf_counter() - start_perf, category=category, args=span_args)
+
+def begin_job_stage(job_id, stage_name):
+    end_job_stage(job_id)
+    _OPEN_JOB_STAGES[job_id] = (stage_name, time.time(), time.perf_counter(), threading.current_thread().name)
+
+def end_job_stage(job_id):
+    open_stage = _OPEN_JOB_STAGES.pop(job_id, None)
+    if open_stage:
+        stage_name, start_time, start_perf, lane = open_stage
+        stage_seconds = time.perf_counter() - start_perf
+        record_job_span(job_id, stage_name, start_time, stage_seconds, lane=lane, category="stage")
+        METRICS.observe('live_report_stage_duration_seconds', stage_seconds, stage=stage_name)
+
+def job_stage_timings_text(job_id):
+    # "git_pull 3.1s, msim 812.4s, ..." in stage order
+    stage_seconds = {}
+    for span in JOB_STATUS.get(job_id, {}).get('spans', []):
+        if span['cat'] == "stage": stage_seconds[span['name']] = stage_seconds.get(span['name'], 0.0) + span['duration']
+    return ", ".join(f"{stage_name} {seconds:.1f}s" for stage_name, seconds in stage_seconds.items())
+
+def chrome_trace_for_job(job_id):
+    # Trace-event JSON ('X' complete events, one thread track per lane) for chrome://tracing or Perfetto
+    job_status = JOB_STATUS.get(job_id, {})
+    lane_track_ids = {}; trace_events = []
+    for span in sorted(job_status.get('spans', []), key=lambda span: span['start']):
+        track_id = lane_track_ids.setdefault(span['lane'], len(lane_track_ids) + 1)
+        trace_events.append({'name': span['name'], 'cat': span['cat'], 'ph': 'X', 'ts': int(span['start'] * 1e6), 'dur': int(span['duration'] * 1e6),
+                             'pid': 1, 'tid': track_id, 'args': span['args']})
+    trace_events.append({'name': 'process_name', 'ph': 'M', 'pid': 1, 'args': {'name': f"rerun {job_id}"}})
+    trace_events.extend({'name': 'thread_name', 'ph': 'M', 'pid': 1, 'tid': track_id, 'args': {'name': lane}} for lane, track_id in lane_track_ids.items())
+    return {'traceEvents': trace_events, 'displayTimeUnit': 'ms', 'otherData': {'job_id': job_id, 'status': job_status.get('status')}}
+
+# --- Opt-in sampling profiler ---
+# A daemon thread samples the stacks of every thread (request handlers, rerun tasks, msim output
+# readers, watchers) with sys._current_frames() and counts them as collapsed stacks, the input
+# format of flamegraph.pl / speedscope / inferno. The root frame is the thread name with ids
+# masked, so e.g. all rerun tasks aggregate under 'rerun-*'. Samples are wall-clock: threads
+# waiting on msim or locks show up too, which is what a slow-under-load incident needs. Started
+# by LIVE_REPORT_PROFILER=1 or POST /profiler; the aggregate is rewritten into the profile
+# directory every flush interval and on stop.
+PROFILER_ENABLED_AT_START = os.environ.get('LIVE_REPORT_PROFILER', '0') in ('1', 'true', 'yes')
+PROFILER_SAMPLE_HZ = float(os.environ.get('LIVE_REPORT_PROFILER_HZ', 20.0))
+PROFILER_MAX_SAMPLE_HZ = 250.0
+PROFILER_FLUSH_SECONDS = float(os.environ.get('LIVE_REPORT_PROFILER_FLUSH_SECONDS', 30.0))
+PROFILE_DIR = os.environ.get('LIVE_REPORT_PROFILE_DIR', os.path.join(script_dir, '.profiles'))
+PROFILER_MAX_STACK_DEPTH = 200
+_THREAD_NAME_ID_RE = re.compile(r"[0-9a-f]{8,}|\d+")
+
+class SamplingProfiler:
+    def __init__(self):
+        self._control_lock = threading.Lock() # Start/stop only; samples are taken and counted by the sampler thread alone
+        self._sampler_thread = None
+        self._stop_event = None
+        self._frame_labels = {} # code object -> label
+        self.stack_counts = collections.Counter()
+        self.samples = 0; self.sample_hz = None; self.started_at = None; self.stopped_at = None; self.output_path = None
+        self.sampler_cpu_seconds = 0.0
+
+    def start(self, sample_hz=None):
+        # False if already running
+        with self._control_lock:
+            if self._sampler_thread is not None: return False
+            self.sample_hz = min(PROFILER_MAX_SAMPLE_HZ, max(0.1, float(sample_hz or PROFILER_SAMPLE_HZ)))
+            self.stack_counts = collections.Counter(); self.samples = 0; self.sampler_cpu_seconds = 0.0
+            self.started_at = time.time(); self.stopped_at = None
+            self.output_path = os.path.join(PROFILE_DIR, f"live_report-{os.getpid()}-{time.strftime('%Y%m%d-%H%M%S', time.localtime(self.started_at))}.collapsed")
+            self._stop_event = threading.Event()
+            self._sampler_thread = threading.Thread(target=self._run, args=(self._stop_event, 1.0 / self.sample_hz), name="profiler-sampler", daemon=True)
+            self._sampler_thread.start()
+            print(f"Sampling profiler started at {self.sample_hz} Hz; writing {self.output_path}")
+            return True
+
+    def stop(self):
+        # False if not running
+        with self._control_lock:
+            sampler_thread, stop_event = self._sampler_thread, self._stop_event
+            if sampler_thread is None: return False
+            stop_event.set(); sampler_thread.join()
+            self._sampler_thread = None; self.stopped_at = time.time()
+        self._write()
+        print(f"Sampling profiler stopped after {self.samples} sample(s); profile in {self.output_path}")
+        return True
+
+    def _frame_label(self, code):
+        frame_label = self._frame_labels.get(code)
+        if frame_label is None: # ';' separates frames and the last space precedes the count in the collapsed format
+            frame_label = self._frame_labels[code] = f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})".replace(";", ":")
+        return frame_label
+
+    def _run(self, stop_event, interval_seconds):
+        own_thread_ident = threading.get_ident()
+        next_flush_at = time.monotonic() + PROFILER_FLUSH_SECONDS
+        while not stop_event.wait(interval_seconds):
+            sample_cpu_started = time.thread_time()
+            thread_names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_ident, frame in sys._current_frames().items():
+                if thread_ident == own_thread_ident: continue
+                frame_labels = []
+                while frame is not None and len(frame_labels) < PROFILER_MAX_STACK_DEPTH:
+                    frame_labels.append(self._frame_label(frame.f_code)); frame = frame.f_back
+                frame_labels.append(_THREAD_NAME_ID_RE.sub("*", thread_names.get(thread_ident, "unknown")).replace(";", ":"))
+                self.stack_counts[";".join(reversed(frame_labels))] += 1
+            frame = None # Do not keep the last sampled frame (and its locals) alive between samples
+            self.samples += 1
+            self.sampler_cpu_seconds += time.thread_time() - sample_cpu_started
+            if time.monotonic() >= next_flush_at:
+                self._write(); next_flush_at = time.monotonic() + PROFILER_FLUSH_SECONDS
+
+    def _write(self):
+        if not self.output_path: return
+        try:
+            os.makedirs(PROFILE_DIR, exist_ok=True)
+            temp_output_path = f"{self.output_path}.tmp"
+            with open(temp_output_path, 'w', encoding='utf-8') as profile_file:
+                for stack, count in list(self.stack_counts.items()): profile_file.write(f"{stack} {count}\n")
+            os.replace(temp_output_path, self.output_path)
+        except OSError as e: print(f"Sampling profiler could not write {self.output_path}: {e}")
+
+    def status(self):
+        running = self._sampler_thread is not None
+        elapsed_seconds = ((time.time() if running else (self.stopped_at or time.time())) - self.started_at) if self.started_at else 0.0
+        return {'running': running, 'sample_hz': self.sample_hz, 'samples': self.samples, 'output_path': self.output_path,
+                'started_at': time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(self.started_at)) if self.started_at else None,
+                'sampler_cpu_fraction': round(self.sampler_cpu_seconds / elapsed_seconds, 5) if elapsed_seconds > 0 else None, # Overhead, as a share of one CPU
+                'top_stacks': [{'stack': stack, 'samples': count} for stack, count in collections.Counter(dict(self.stack_counts)).most_common(10)]} # Snapshot: the sampler thread adds keys meanwhile
+
+SAMPLING_PROFILER = SamplingProfiler()
+if PROFILER_ENABLED_AT_START: SAMPLING_PROFILER.start()
+atexit.register(SAMPLING_PROFILER.stop) # Final write; a no-op when not running
+
 def get_project_root_from_branch_path(branch_path, job_id_for_logging=None):
     if not branch_path or '/work/' not in branch_path:
         if job_id_for_logging:
@@ -131,6 +420,351 @@ def find_primary_log_for_rerun(base_search_path):
     print(f"No run.log or comp.log found in {base_search_path} after checking common locations and deep search.")
     return None
 
+# --- Simulation log serving helpers (used by the /log/<repo_id> endpoints) ---
+LOG_TAIL_DEFAULT_LINES = 200
+LOG_TAIL_MAX_LINES = 20000
+LOG_TAIL_MAX_BYTES = 16 * 1024 * 1024 # Never map back further than this from EOF
+LOG_FOLLOW_POLL_SECONDS = 1.0
+LOG_FOLLOW_DEFAULT_IDLE_TIMEOUT = 60
+LOG_FOLLOW_MAX_IDLE_TIMEOUT = 600
+LOG_FOLLOW_CHUNK_BYTES = 64 * 1024
+
+def resolve_confined_log_path(project_root, requested_log_path):
+    """
+    Resolves a log path from the report (absolute, relative to the project root, or
+    relative to a work/<dir>/<vcs_context> area such as 'sim/<case>/<ts>/run.log')
+    to a real file inside <project_root>/work. Returns None if it escapes the work tree.
+    """
+    if not project_root or not requested_log_path: return None
+    work_root_real = os.path.realpath(os.path.join(project_root, "work"))
+    requested_log_path = requested_log_path.strip().replace('\\', '/')
+    candidates = []
+    if os.path.isabs(requested_log_path):
+        candidates.append(requested_log_path)
+    else:
+        candidates.append(os.path.join(project_root, requested_log_path))
+        if not requested_log_path.startswith("work/"):
+            # Original msim reports store paths relative to work/<dir>/<vcs_context>
+            try:
+                for dir_entry in os.scandir(work_root_real):
+                    if not dir_entry.is_dir(): continue
+                    for ctx_entry in os.scandir(dir_entry.path):
+                        if ctx_entry.is_dir(): candidates.append(os.path.join(ctx_entry.path, requested_log_path))
+            except OSError: pass
+    for candidate in candidates:
+        candidate_real = os.path.realpath(candidate)
+        try:
+            if os.path.commonpath([work_root_real, candidate_real]) != work_root_real: continue
+        except ValueError: continue # Different drives / mix of abs and rel
+        if os.path.isfile(candidate_real): return candidate_real
+    return None
+
+def tail_log_file_mmap(log_file_path, num_lines, max_bytes=LOG_TAIL_MAX_BYTES):
+    """
+    Returns (tail_bytes, start_offset) for the last num_lines lines of a file by scanning
+    backward from EOF through mmap, touching at most max_bytes of the file.
+    """
+    with open(log_file_path, 'rb') as f:
+        file_size = os.fstat(f.fileno()).st_size
+        if file_size == 0 or num_lines <= 0: return b"", file_size
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            scan_floor = max(0, file_size - max_bytes)
+            end = file_size
+            if mm[end - 1:end] == b"\n": end -= 1 # Trailing newline does not start a new line
+            pos = end; newlines_found = 0
+            while newlines_found < num_lines:
+                pos = mm.rfind(b"\n", scan_floor, pos)
+                if pos == -1:
+                    pos = scan_floor
+                    break
+                newlines_found += 1
+                if newlines_found == num_lines:
+                    pos += 1 # Start just after the newline preceding the first wanted line
+                    break
+            return mm[pos:file_size], pos
+
+def _follow_log_file_generator(log_file_path, start_offset, idle_timeout):
+    # Streams the file from start_offset, then keeps yielding appended data until the
+    # file has not grown for idle_timeout seconds (e.g. the case finished or hung).
+    with open(log_file_path, 'rb') as f:
+        position = min(start_offset, os.fstat(f.fileno()).st_size); last_growth_time = time.time()
+        while True:
+            current_size = os.fstat(f.fileno()).st_size
+            if current_size < position: position = 0 # File was truncated / rewritten
+            if current_size > position:
+                f.seek(position)
+                while position < current_size:
+                    chunk = f.read(min(LOG_FOLLOW_CHUNK_BYTES, current_size - position))
+                    if not chunk: break
+                    position += len(chunk)
+                    yield chunk
+                last_growth_time = time.time()
+            elif time.time() - last_growth_time >= idle_timeout:
+                return
+            time.sleep(LOG_FOLLOW_POLL_SECONDS)
+
+# --- Error hints from run.log: bounded mmap scans, never a full read of a multi-GB log ---
+# The first UVM_ERROR/UVM_FATAL/Error- line is searched for in a forward window from the start
+# of the file; the UVM report summary counts come from a backward scan of the last few MB.
+RUN_LOG_HINT_HEAD_BYTES = int(os.environ.get('LIVE_REPORT_RUN_LOG_HINT_HEAD_BYTES', 32 * 1024 * 1024))
+RUN_LOG_HINT_TAIL_BYTES = int(os.environ.get('LIVE_REPORT_RUN_LOG_HINT_TAIL_BYTES', 4 * 1024 * 1024))
+RUN_LOG_HINT_MAX_LINE_CHARS = 300
+_RUN_LOG_ERROR_TOKENS = (b"UVM_ERROR", b"UVM_FATAL", b"Error-[")
+_RUN_LOG_SUMMARY_COUNT_LINE_RE = re.compile(rb"^\s*UVM_(?:INFO|WARNING|ERROR|FATAL)\s*:\s*\d+\s*$") # Summary lines, not real errors
+_RUN_LOG_SUMMARY_MARKER = b"UVM Report Summary"
+_RUN_LOG_SUMMARY_COUNT_RE = re.compile(rb"^\s*UVM_(ERROR|FATAL)\s*:\s*(\d+)", re.MULTILINE)
+
+def extract_run_log_hint(run_log_path, head_bytes=RUN_LOG_HINT_HEAD_BYTES, tail_bytes=RUN_LOG_HINT_TAIL_BYTES):
+    """
+    Returns an error hint for a failed case's run.log, e.g.
+    "UVM_ERROR tb.sv(42) @ 1200 ns: [SCB] mismatch (UVM_ERROR: 3, UVM_FATAL: 0)", or None if
+    the log is missing or shows neither an error line nor summary counts.
+    """
+    try:
+        with open(run_log_path, 'rb') as f:
+            file_size = os.fstat(f.fileno()).st_size
+            if file_size == 0: return None
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                first_error_line = None; head_end = min(file_size, head_bytes); scan_pos = 0
+                next_token_positions = {token: -2 for token in _RUN_LOG_ERROR_TOKENS} # -2: not searched yet, -1: absent
+                while scan_pos < head_end: # Literal finds (memchr speed) rather than a regex over every line
+                    for token, token_pos in next_token_positions.items():
+                        if token_pos == -2 or 0 <= token_pos < scan_pos: next_token_positions[token] = mm.find(token, scan_pos, head_end)
+                    token_positions = [pos for pos in next_token_positions.values() if pos >= 0]
+                    if not token_positions: break
+                    token_pos = min(token_positions)
+                    line_start = mm.rfind(b"\n", 0, token_pos) + 1
+                    line_end = mm.find(b"\n", token_pos)
+                    if line_end == -1: line_end = file_size
+                    error_line = mm[line_start:min(line_end, line_start + RUN_LOG_HINT_MAX_LINE_CHARS * 4)]
+                    if not _RUN_LOG_SUMMARY_COUNT_LINE_RE.match(error_line):
+                        first_error_line = error_line.decode('utf-8', errors='replace').strip()
+                        break
+                    scan_pos = line_end + 1
+                summary_counts = {}; tail_floor = max(0, file_size - tail_bytes)
+                summary_pos = mm.rfind(_RUN_LOG_SUMMARY_MARKER, tail_floor, file_size)
+                if summary_pos != -1:
+                    for match in _RUN_LOG_SUMMARY_COUNT_RE.finditer(mm, summary_pos, file_size):
+                        summary_counts.setdefault(f"UVM_{match.group(1).decode()}", int(match.group(2))) # First count after the marker
+    except (OSError, ValueError): return None # Missing, unreadable or vanished while mapping
+    summary_text = ", ".join(f"{name}: {summary_counts[name]}" for name in ('UVM_ERROR', 'UVM_FATAL') if name in summary_counts)
+    if first_error_line:
+        if len(first_error_line) > RUN_LOG_HINT_MAX_LINE_CHARS: first_error_line = first_error_line[:RUN_LOG_HINT_MAX_LINE_CHARS] + "..."
+        return f"{first_error_line} ({summary_text})" if summary_text else first_error_line
+    if summary_text and any(summary_counts.values()):
+        return f"{summary_text} (first error not within the first {head_bytes // (1024 * 1024)}MB of run.log)"
+    return None
+
+def extract_run_log_hints(run_log_paths):
+    # {run_log_path: hint or None}, scanned inline: the mmap finds are bound by I/O, and a process
+    # pool would cost far more to start (each worker imports this module) than it saves.
+    return {run_log_path: extract_run_log_hint(run_log_path) for run_log_path in dict.fromkeys(run_log_paths)}
+
+# --- Live sim-directory watcher: case results while msim is still running ---
+# Layout watched: <sim root>/<case dir>/<timestamp dir>/parse_run.log. inotify (via ctypes) is
+# used where available, otherwise the tree is polled with scandir. Only parse_run.log files
+# written after the msim start count, so leftovers from earlier runs are ignored. Off unless
+# LIVE_REPORT_SIM_WATCH=1 or the rerun request sets watchSimDir; without it, live results come
+# from the case's run directory when msim prints its [TEST_DONE] line.
+SIM_WATCH_ENABLED_DEFAULT = os.environ.get('LIVE_REPORT_SIM_WATCH', '0') in ('1', 'true', 'yes')
+SIM_WATCH_POLL_SECONDS = float(os.environ.get('LIVE_REPORT_SIM_WATCH_POLL_SECONDS', 5.0))
+SIM_WATCH_MTIME_SLACK_SECONDS = 2.0 # Tolerance for coarse filesystem timestamps
+_IN_CLOSE_WRITE = 0x00000008; _IN_MOVED_TO = 0x00000080; _IN_CREATE = 0x00000100
+_IN_Q_OVERFLOW = 0x00004000; _IN_IGNORED = 0x00008000; _IN_ISDIR = 0x40000000
+_INOTIFY_EVENT_HEADER = struct.Struct('iIII') # wd, mask, cookie, len
+
+def _case_id_for_sim_dir(sim_dir_name, case_ids):
+    # Longest selected case id the directory name starts with, never splitting a seed number
+    # (so '<test>_seed1' does not claim '<test>_seed12').
+    for prefix_len in range(len(sim_dir_name), 0, -1):
+        if sim_dir_name[:prefix_len] in case_ids and not sim_dir_name[prefix_len:prefix_len + 1].isdigit():
+            return sim_dir_name[:prefix_len]
+    return None
+
+def resolve_case_result_from_run_dir(case_id, case_sim_dir_name, run_dir_path, base_log_path_for_html):
+    # Result dict (as produced by parse_msim_output_for_test_statuses) for one finished run
+    # directory, or None while its parse_run.log is missing or not conclusive yet.
+    status_from_parse_log = _parse_individual_parse_run_log(os.path.join(run_dir_path, 'parse_run.log'))
+    if status_from_parse_log not in ("PASSED", "FAILED"): return None
+    error_hint = ""
+    if status_from_parse_log == "FAILED":
+        error_hint = extract_run_log_hint(os.path.join(run_dir_path, 'run.log')) or "Failed (from parse_run.log)"
+    safe_base_html_path = base_log_path_for_html.replace(os.sep, '/') if base_log_path_for_html else "unknown_html_base"
+    return {"id": case_id, "status": status_from_parse_log, "error_hint": error_hint,
+            "new_log_path": f"{safe_base_html_path}/sim/{case_sim_dir_name}/{os.path.basename(run_dir_path)}/run.log"}
+
+TEST_DONE_LINE_PATTERN = re.compile(r"\[TEST_DONE\]\s*Test\s*([\w_.-]+seed\d+)\s*\((\w+)\)")
+
+def resolve_case_result_for_test_done(case_id, sim_root, base_log_path_for_html, min_mtime):
+    # Result for a case msim just reported with [TEST_DONE], from its newest run directory, or None
+    # when that parse_run.log predates min_mtime or is not conclusive yet (the end-of-run parse
+    # still picks the case up). Feeds live report publishing when the sim watcher is off.
+    newest_parse_log = None # (mtime, case sim dir name, run dir path)
+    try:
+        with os.scandir(sim_root) as entries:
+            case_sim_dirs = [entry for entry in entries if entry.is_dir(follow_symlinks=False) and _case_id_for_sim_dir(entry.name, {case_id})]
+    except OSError: return None
+    for case_sim_dir in case_sim_dirs:
+        try:
+            with os.scandir(case_sim_dir.path) as run_dirs:
+                for run_dir in run_dirs:
+                    if not run_dir.is_dir(follow_symlinks=False): continue # 'latest' may still point at an earlier run
+                    try: parse_log_mtime = os.stat(os.path.join(run_dir.path, 'parse_run.log')).st_mtime
+                    except OSError: continue
+                    if newest_parse_log is None or parse_log_mtime > newest_parse_log[0]: newest_parse_log = (parse_log_mtime, case_sim_dir.name, run_dir.path)
+        except OSError: continue
+    if newest_parse_log is None or newest_parse_log[0] < min_mtime: return None
+    return resolve_case_result_from_run_dir(case_id, newest_parse_log[1], newest_parse_log[2], base_log_path_for_html)
+
+class SimDirWatcher:
+    def __init__(self, sim_root, case_ids, base_log_path_for_html, on_result, started_at, job_id_for_logging=None):
+        self.sim_root = sim_root
+        self.case_ids = set(case_ids)
+        self.base_log_path_for_html = base_log_path_for_html
+        self.on_result = on_result # on_result(case_id, result_dict), called from the watcher thread
+        self.min_mtime = started_at - SIM_WATCH_MTIME_SLACK_SECONDS
+        self.job_id = job_id_for_logging
+        self.mode = None # 'inotify' or 'poll' once running
+        self._seen_stat_keys = {} # parse_run.log path -> (mtime_ns, size) last handled
+        self._stop_event = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"sim-watch-{job_id_for_logging}", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self, timeout=10):
+        self._stop_event.set()
+        self._thread.join(timeout)
+
+    def _handle_parse_log(self, parse_log_path):
+        try: st = os.stat(parse_log_path)
+        except OSError: return
+        stat_key = (st.st_mtime_ns, st.st_size)
+        if st.st_mtime < self.min_mtime or self._seen_stat_keys.get(parse_log_path) == stat_key: return
+        self._seen_stat_keys[parse_log_path] = stat_key
+        run_dir_path = os.path.dirname(parse_log_path); case_sim_dir_path = os.path.dirname(run_dir_path)
+        case_sim_dir_name = os.path.basename(case_sim_dir_path)
+        case_id = _case_id_for_sim_dir(case_sim_dir_name, self.case_ids)
+        if not case_id: return
+        result = resolve_case_result_from_run_dir(case_id, case_sim_dir_name, run_dir_path, self.base_log_path_for_html)
+        if result:
+            try: self.on_result(case_id, result)
+            except Exception as e: print(f"Sim watcher ({self.sim_root}): result callback failed for {case_id}: {e}")
+
+    def _scan(self, directory_path, depth):
+        # depth 0: sim root, 1: case dir, 2: timestamp dir. Symlinks such as 'latest' are skipped.
+        try:
+            with os.scandir(directory_path) as entries:
+                for entry in entries:
+                    if depth < 2:
+                        if depth == 0 and not _case_id_for_sim_dir(entry.name, self.case_ids): continue
+                        if entry.is_dir(follow_symlinks=False): yield from self._scan(entry.path, depth + 1)
+                    elif entry.name == 'parse_run.log':
+                        yield entry.path
+        except OSError: return
+
+    def _run(self):
+        try:
+            while not self._stop_event.is_set() and not os.path.isdir(self.sim_root): # msim creates it
+                self._stop_event.wait(SIM_WATCH_POLL_SECONDS)
+            if self._stop_event.is_set(): return
+            if _inotify_init1 is None or not self._run_inotify():
+                self.mode = 'poll'
+                while not self._stop_event.is_set():
+                    for parse_log_path in self._scan(self.sim_root, 0): self._handle_parse_log(parse_log_path)
+                    self._stop_event.wait(SIM_WATCH_POLL_SECONDS)
+        except Exception as e:
+            print(f"Sim watcher ({self.sim_root}) stopped on error: {e}")
+            if self.job_id: add_output_line_to_job(self.job_id, f"Warning: live sim-directory watcher stopped: {e}")
+
+    def _run_inotify(self):
+        # Returns False if inotify cannot be set up (no support, watch limit), so the caller polls instead.
+        inotify_fd = _inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if inotify_fd < 0: return False
+        watched_dirs = {} # wd -> (path, depth)
+        def add_watch(directory_path, depth):
+            # Watch first, then scan, so files created in between are not missed
+            mask = _IN_CREATE | _IN_MOVED_TO | (_IN_CLOSE_WRITE if depth == 2 else 0)
+            wd = _inotify_add_watch(inotify_fd, os.fsencode(directory_path), mask)
+            if wd < 0: raise OSError(ctypes.get_errno(), f"inotify_add_watch failed for {directory_path}")
+            watched_dirs[wd] = (directory_path, depth)
+            try:
+                with os.scandir(directory_path) as entries:
+                    for entry in entries:
+                        if depth < 2 and entry.is_dir(follow_symlinks=False):
+                            if depth == 0 and not _case_id_for_sim_dir(entry.name, self.case_ids): continue
+                            add_watch(entry.path, depth + 1)
+                        elif depth == 2 and entry.name == 'parse_run.log': self._handle_parse_log(entry.path)
+            except FileNotFoundError: pass
+        try:
+            try: add_watch(self.sim_root, 0)
+            except OSError as e:
+                print(f"Sim watcher ({self.sim_root}): inotify unavailable ({e}); polling every {SIM_WATCH_POLL_SECONDS}s.")
+                return False
+            self.mode = 'inotify'
+            while not self._stop_event.is_set():
+                readable, _, _ = select.select([inotify_fd], [], [], 1.0)
+                if not readable: continue
+                try: event_buffer = os.read(inotify_fd, 256 * 1024)
+                except BlockingIOError: continue
+                offset = 0
+                while offset < len(event_buffer):
+                    wd, mask, _, name_len = _INOTIFY_EVENT_HEADER.unpack_from(event_buffer, offset)
+                    name = os.fsdecode(event_buffer[offset + _INOTIFY_EVENT_HEADER.size:offset + _INOTIFY_EVENT_HEADER.size + name_len].rstrip(b'\0'))
+                    offset += _INOTIFY_EVENT_HEADER.size + name_len
+                    if mask & _IN_Q_OVERFLOW: # Events were dropped: rescan everything once
+                        for parse_log_path in self._scan(self.sim_root, 0): self._handle_parse_log(parse_log_path)
+                        continue
+                    if mask & _IN_IGNORED: watched_dirs.pop(wd, None); continue
+                    if wd not in watched_dirs or not name: continue
+                    parent_path, depth = watched_dirs[wd]
+                    if depth < 2 and mask & _IN_ISDIR:
+                        if depth == 0 and not _case_id_for_sim_dir(name, self.case_ids): continue
+                        try: add_watch(os.path.join(parent_path, name), depth + 1)
+                        except OSError as e: print(f"Sim watcher ({self.sim_root}): could not watch {name}: {e}")
+                    elif depth == 2 and name == 'parse_run.log' and mask & (_IN_CLOSE_WRITE | _IN_MOVED_TO):
+                        self._handle_parse_log(os.path.join(parent_path, name))
+            return True
+        finally:
+            os.close(inotify_fd)
+
+def derive_sim_log_roots(project_root, options, final_msim_dir_option, job_id=None):
+    """
+    Where msim writes the per-case sim directories for this rerun. Returns
+    (actual_sim_root_for_parsing, base_log_path_for_html, vcs_context_basename, log_path_error),
+    base_log_path_for_html being relative to the project root, as the report stores it.
+    """
+    actual_sim_root_for_parsing = None; base_log_path_for_html = None; log_path_error = False; vcs_context_basename = ""
+    if not project_root:
+        if job_id: add_output_line_to_job(job_id, "CRITICAL Error: Project root not available for log parsing.")
+        return None, None, vcs_context_basename, True
+    vcs_context_from_client_for_log_parsing = options.get('vcsContext', '')
+    vcs_context_basename = os.path.basename(vcs_context_from_client_for_log_parsing) if vcs_context_from_client_for_log_parsing else ""
+    if not vcs_context_basename: # Fallback to deriving from branchPath if vcsContext is empty
+        current_full_branch_path_for_log_parsing = options.get('branchPath', '') # This is the original branchPath from client
+        if current_full_branch_path_for_log_parsing:
+            vcs_context_basename = os.path.basename(current_full_branch_path_for_log_parsing)
+
+    if not vcs_context_basename: # If still no vcs_context_basename
+        if job_id: add_output_line_to_job(job_id, "Warning: Could not determine vcs_context_basename for log path construction.")
+        log_path_error = True
+    elif final_msim_dir_option:
+        actual_sim_root_for_parsing = os.path.join(project_root, "work", final_msim_dir_option, vcs_context_basename, "sim")
+        base_log_path_for_html = os.path.join("work", final_msim_dir_option, vcs_context_basename)
+    else: # Fallback if -dir was not used or derived
+        current_full_branch_path_for_log_parsing = options.get('branchPath', '')
+        extracted_branch_suffix = ""
+        if "work/" in current_full_branch_path_for_log_parsing:
+            extracted_branch_suffix = current_full_branch_path_for_log_parsing.split("work/", 1)[1]
+        if not extracted_branch_suffix:
+            if job_id: add_output_line_to_job(job_id, "Warning: Could not extract branch suffix from branchPath for log path construction.")
+            log_path_error = True
+        else:
+            actual_sim_root_for_parsing = os.path.join(project_root, "work", extracted_branch_suffix, "sim")
+            base_log_path_for_html = os.path.join("work", extracted_branch_suffix)
+    return actual_sim_root_for_parsing, base_log_path_for_html, vcs_context_basename, log_path_error
+
 def parse_msim_output_for_test_statuses(msim_stdout, selected_cases_with_seed, actual_sim_root_for_parsing, base_log_path_for_html, job_id_for_logging=None):
     results_map = {}
     if job_id_for_logging:
@@ -138,8 +772,9 @@ def parse_msim_output_for_test_statuses(msim_stdout, selected_cases_with_seed, a
     if not base_log_path_for_html and actual_sim_root_for_parsing:
          add_output_line_to_job(job_id_for_logging, "Warning: base_log_path_for_html is missing, HTML log paths might be incorrect.")
 
+    run_log_paths_by_failed_case_id = {}
     for case_id in selected_cases_with_seed:
-        current_status = "UNKNOWN"; error_hint = "Status not determined."
+        current_status = "UNKNOWN"; error_hint = "Status not determined."; parse_log_mtime = None
         safe_base_html_path = base_log_path_for_html.replace(os.sep, '/') if base_log_path_for_html else "unknown_html_base"
         html_log_path = f"{safe_base_html_path}/sim/{case_id}/latest/run.log"
         case_id_variant_dir_name = None; individual_test_sim_dir_actual = None
@@ -178,8 +813,10 @@ def parse_msim_output_for_test_statuses(msim_stdout, selected_cases_with_seed, a
                     status_from_parse_log = _parse_individual_parse_run_log(parse_run_log_path)
                     if status_from_parse_log:
                         current_status = status_from_parse_log
+                        with contextlib.suppress(OSError): parse_log_mtime = os.path.getmtime(parse_run_log_path) # 'latest' may still be an earlier run's
                         error_hint = "Failed (from parse_run.log)" if current_status == "FAILED" else ("" if current_status == "PASSED" else "Status unclear from parse_run.log")
                         if job_id_for_logging: add_output_line_to_job(job_id_for_logging, f"For {case_id}: Status from parse_run.log: {current_status}")
+                        if current_status == "FAILED": run_log_paths_by_failed_case_id[case_id] = os.path.join(latest_log_dir, 'run.log')
                 elif job_id_for_logging:
                     add_output_line_to_job(job_id_for_logging, f"For {case_id} (in {case_id_variant_dir_name if case_id_variant_dir_name else 'N/A'}): 'latest' or timestamped log directory not resolved or not a directory: {latest_log_dir}")
             elif job_id_for_logging and actual_sim_root_for_parsing and os.path.isdir(actual_sim_root_for_parsing):
@@ -198,11 +835,33 @@ def parse_msim_output_for_test_statuses(msim_stdout, selected_cases_with_seed, a
                     error_hint = "Failed (from [TEST_DONE] in msim stdout)" if status_from_stdout == "FAILED" else ("" if status_from_stdout == "PASSED" else error_hint)
                     if job_id_for_logging: add_output_line_to_job(job_id_for_logging, f"For {case_id}: Status from msim_stdout [TEST_DONE]: {current_status}")
                     break
-        results_map[case_id] = {"id": case_id, "status": current_status, "error_hint": error_hint, "new_log_path": html_log_path}
+        results_map[case_id] = {"id": case_id, "status": current_status, "error_hint": error_hint, "new_log_path": html_log_path, "parse_log_mtime": parse_log_mtime}
         if job_id_for_logging: add_output_line_to_job(job_id_for_logging, f"For {case_id}: Final determined status: {current_status}, Log: {html_log_path}")
+    if run_log_paths_by_failed_case_id:
+        hint_start_time = time.time()
+        with job_span(job_id_for_logging, "extract_run_log_hints", run_logs=len(run_log_paths_by_failed_case_id)):
+            hints_by_run_log_path = extract_run_log_hints(run_log_paths_by_failed_case_id.values())
+        for case_id, run_log_path in run_log_paths_by_failed_case_id.items():
+            if hints_by_run_log_path.get(run_log_path): results_map[case_id]["error_hint"] = hints_by_run_log_path[run_log_path]
+        if job_id_for_logging:
+            add_output_line_to_job(job_id_for_logging, f"Extracted run.log error hints for {sum(1 for path in run_log_paths_by_failed_case_id.values() if hints_by_run_log_path.get(path))}/{len(run_log_paths_by_failed_case_id)} failed case(s) in {time.time() - hint_start_time:.2f}s.")
     return list(results_map.values())
 
-def prepare_rerun_hjson_files(project_root_for_hjson, options, temp_rerun_dir, ip_name):
+def result_is_from_run(result, run_started_at, finished_at_by_case_id):
+    # Whether a parsed verdict was produced by the msim run started at run_started_at: its
+    # parse_run.log was written since then, or the case reported [TEST_DONE] in this run's output.
+    # A failed compile or aborted run leaves the previous run's 'latest' logs in place.
+    if result['id'] in finished_at_by_case_id: return True
+    return bool(run_started_at) and result.get('parse_log_mtime') is not None and result['parse_log_mtime'] >= run_started_at - SIM_WATCH_MTIME_SLACK_SECONDS
+
+def find_source_test_hjson(project_root, ip_name):
+    # <project_root>/dv/sim_ctrl/ts/**/<ip_name>.hjson, the test list reruns are derived from
+    target_hjson_filename = f"{ip_name}.hjson"
+    for root, dirs, files in os.walk(os.path.join(project_root, "dv", "sim_ctrl", "ts")):
+        if target_hjson_filename in files: return os.path.join(root, target_hjson_filename)
+    return None
+
+def prepare_rerun_hjson_files(project_root_for_hjson, options, temp_rerun_dir, ip_name, shard_case_groups=None, runtime_predictions=None, build_case_ids=None, config_name="rerun"):
     print(f"--- prepare_rerun_hjson_files called for IP: {ip_name} ---")
     print(f"Using project_root_for_hjson: {project_root_for_hjson}")
     job_id_for_logging = options.get("job_id_for_logging")
@@ -219,13 +878,11 @@ def prepare_rerun_hjson_files(project_root_for_hjson, options, temp_rerun_dir, i
     if job_id_for_logging: add_output_line_to_job(job_id_for_logging, log_msg_search)
     else: print(log_msg_search)
 
-    for root, dirs, files in os.walk(base_search_dir_for_hjson):
-        if target_hjson_filename in files:
-            found_original_hjson_path = os.path.join(root, target_hjson_filename)
-            log_msg_found = f"Found source HJSON at: {found_original_hjson_path}"
-            if job_id_for_logging: add_output_line_to_job(job_id_for_logging, log_msg_found)
-            else: print(log_msg_found)
-            break
+    found_original_hjson_path = find_source_test_hjson(proj_root_dir, ip_name)
+    if found_original_hjson_path:
+        log_msg_found = f"Found source HJSON at: {found_original_hjson_path}"
+        if job_id_for_logging: add_output_line_to_job(job_id_for_logging, log_msg_found)
+        else: print(log_msg_found)
 
     if not found_original_hjson_path:
         error_msg = f"CRITICAL ERROR: Source HJSON file '{target_hjson_filename}' not found in '{base_search_dir_for_hjson}' or its subdirectories."
@@ -234,17 +891,17 @@ def prepare_rerun_hjson_files(project_root_for_hjson, options, temp_rerun_dir, i
         return None
 
     target_hjson_dir_for_temp_copy = os.path.join(proj_root_dir, "dv", "sim_ctrl", "ts", "temp")
-    print(f"Target directory for 'rerun.hjson' (temp copy) under PRJ_ICDIR: {target_hjson_dir_for_temp_copy}")
+    print(f"Target directory for '{config_name}.hjson' (temp copy) under PRJ_ICDIR: {target_hjson_dir_for_temp_copy}")
     try:
         os.makedirs(target_hjson_dir_for_temp_copy, exist_ok=True)
-        print(f"Ensured target directory for 'rerun.hjson' (temp copy) exists: {target_hjson_dir_for_temp_copy}")
+        print(f"Ensured target directory for '{config_name}.hjson' (temp copy) exists: {target_hjson_dir_for_temp_copy}")
     except Exception as e:
-        error_msg = f"CRITICAL ERROR: Failed to create target directory {target_hjson_dir_for_temp_copy} for 'rerun.hjson': {e}"
+        error_msg = f"CRITICAL ERROR: Failed to create target directory {target_hjson_dir_for_temp_copy} for '{config_name}.hjson': {e}"
         print(error_msg)
         if job_id_for_logging: add_output_line_to_job(job_id_for_logging, f"Error: Failed to create target directory {target_hjson_dir_for_temp_copy}: {e}")
         return None
 
-    temp_target_hjson_path = os.path.join(target_hjson_dir_for_temp_copy, "rerun.hjson")
+    temp_target_hjson_path = os.path.join(target_hjson_dir_for_temp_copy, f"{config_name}.hjson") # One file per job: msim reads it when each shard starts
     print(f"Temporary target HJSON path for modified copy: {temp_target_hjson_path}")
     try:
         shutil.copy(found_original_hjson_path, temp_target_hjson_path)
@@ -281,7 +938,7 @@ def prepare_rerun_hjson_files(project_root_for_hjson, options, temp_rerun_dir, i
     # ...
     selected_cases_for_this_ip = [case_id for case_id in options.get('selectedCases', []) if case_id.startswith(ip_name + "_")]
     if not selected_cases_for_this_ip:
-        print(f"Info: No cases selected for IP '{ip_name}'. 'tests' section in rerun.hjson will be empty.")
+        print(f"Info: No cases selected for IP '{ip_name}'. 'tests' section in {config_name}.hjson will be empty.")
     else:
         for case_id_with_seed in selected_cases_for_this_ip:
             # ... (parsing case_id_with_seed, creating new_test_def_object, updating run_opts) ...
@@ -303,6 +960,9 @@ def prepare_rerun_hjson_files(project_root_for_hjson, options, temp_rerun_dir, i
             final_tests_section_for_output.append(new_test_def_object)
             test_names_for_regression_list.append(case_id_with_seed)
 
+    if runtime_predictions: # Longest-first, so long tests do not start last and stretch the run
+        test_names_for_regression_list.sort(key=lambda case_id: -runtime_predictions.get(case_id, RUNTIME_HISTORY_DEFAULT_SECONDS))
+        final_tests_section_for_output.sort(key=lambda test_def: -runtime_predictions.get(test_def['name'], RUNTIME_HISTORY_DEFAULT_SECONDS))
     target_hjson_data['tests'] = final_tests_section_for_output
     rerun_regression_group = {"name": "rerun", "tests": test_names_for_regression_list}
     if not isinstance(target_hjson_data.get("regressions"), list):
@@ -312,6 +972,14 @@ def prepare_rerun_hjson_files(project_root_for_hjson, options, temp_rerun_dir, i
         existing_rerun_index = next((i for i, reg in enumerate(target_hjson_data["regressions"]) if isinstance(reg, dict) and reg.get("name") == "rerun"), None)
         if existing_rerun_index is not None: target_hjson_data["regressions"][existing_rerun_index] = rerun_regression_group
         else: target_hjson_data["regressions"].append(rerun_regression_group)
+    if (shard_case_groups and len(shard_case_groups) > 1) or build_case_ids: # One extra group per msim shard (and the build run); 'rerun' keeps every case
+        tests_in_rerun_hjson = set(test_names_for_regression_list)
+        shard_regression_groups = [{"name": f"rerun_s{shard_index}", "tests": [case_id for case_id in shard_case_ids if case_id in tests_in_rerun_hjson]}
+                                   for shard_index, shard_case_ids in enumerate(shard_case_groups or [])]
+        if build_case_ids: shard_regression_groups.append({"name": "rerun_build", "tests": [case_id for case_id in build_case_ids if case_id in tests_in_rerun_hjson]})
+        shard_group_names = {reg["name"] for reg in shard_regression_groups}
+        target_hjson_data["regressions"] = [reg for reg in target_hjson_data["regressions"]
+                                            if not (isinstance(reg, dict) and reg.get("name") in shard_group_names)] + shard_regression_groups
     try:
         with open(temp_target_hjson_path, 'w') as file: hjson.dump(target_hjson_data, file, indent=2)
         print(f"Successfully wrote modified HJSON to {temp_target_hjson_path}")
@@ -324,9 +992,8 @@ def prepare_rerun_hjson_files(project_root_for_hjson, options, temp_rerun_dir, i
 
 def calculate_total_stats_from_html(html_file_path, job_id_for_logging=None, logger_for_internal_errors=None):
     """
-    Parses an HTML report file to calculate total test statistics.
+    Calculates total test statistics for an HTML report from its sidecar results store.
     """
-    stats = {'total': 0, 'passed': 0, 'failed': 0, 'killed': 0, 'other': 0, 'pass_rate': 0.0}
     actual_logger = logger_for_internal_errors if logger_for_internal_errors else current_app.logger # Fallback
     
     log_func = lambda msg, level="info": (actual_logger.info(msg) if level == "info" else actual_logger.error(msg)) if actual_logger else print(msg)
@@ -338,76 +1005,9 @@ def calculate_total_stats_from_html(html_file_path, job_id_for_logging=None, log
         return None
         
     try:
-        with open(html_file_path, 'r', encoding='utf-8') as f:
-            soup = BeautifulSoup(f, 'html.parser')
-        
-        table_body = soup.find('table', id='detailedStatusTable').find('tbody')
-        if not table_body:
-            error_msg = f"Error: Could not find table body (tbody with id='detailedStatusTable') in HTML for total stats: {html_file_path}"
-            if job_id_for_logging: add_output_line_to_job(job_id_for_logging, error_msg)
-            log_func(error_msg, "error")
-            return None
-
-        all_rows_in_tbody = table_body.find_all('tr', recursive=False) # Get only direct children <tr>
-        num_total_rows = len(all_rows_in_tbody)
-        rows_to_process = []
-
-        if num_total_rows == 0:
-            if job_id_for_logging: add_output_line_to_job(job_id_for_logging, "Debug_HTML_Stats: No rows found in tbody.")
-            # rows_to_process remains empty
-        elif num_total_rows == 1: # If only 1 row, process it (could be data or the footer itself)
-            rows_to_process = all_rows_in_tbody
-            if job_id_for_logging: add_output_line_to_job(job_id_for_logging, f"Debug_HTML_Stats: Processing the only row (1 total) found in tbody.")
-        else: # num_total_rows > 1, skip only the LAST row
-            rows_to_process = all_rows_in_tbody[:-1] # Process all rows except the last one
-            if job_id_for_logging: 
-                add_output_line_to_job(job_id_for_logging, f"Debug_HTML_Stats: Skipping only the last row. Processing {len(rows_to_process)} of {num_total_rows} total rows.")
-                last_row_text = all_rows_in_tbody[-1].get_text(strip=True, separator='|')[:100]
-                add_output_line_to_job(job_id_for_logging, f"Debug_HTML_Stats: Skipped last row content: {last_row_text}...")
-                # No first row is explicitly skipped here if num_total_rows > 1
-
-        for row_idx, row in enumerate(rows_to_process):
-            td_cells = row.find_all('td')
-
-            if not td_cells:
-                if job_id_for_logging:
-                    row_content_for_log = row.get_text(strip=True, separator='|')[:70]
-                    add_output_line_to_job(job_id_for_logging, f"Debug_HTML_Stats: Row {row_idx} (in selection) has no <td> cells, skipping. Content: {row_content_for_log}...")
-                continue
-            
-            # Assuming the row is a data row based on the new heuristic (position in table)
-            if len(td_cells) > 1: # Need at least two cells for name/status
-                status_text_cell_content = td_cells[1].get_text(strip=True)
-                status_class_list = td_cells[1].get('class', [])
-                if isinstance(status_class_list, str): status_class_list = status_class_list.split()
-
-                final_status_text = status_text_cell_content.upper() 
-                if status_class_list:
-                    for cls in status_class_list:
-                        if cls.startswith('status-'):
-                            status_from_class = cls.split('-',1)[1].upper()
-                            # Be more specific about valid status prefixes from class
-                            if status_from_class in ['P', 'F', 'K', 'U', 'PASSED', 'FAILED', 'KILLED', 'UNKNOWN']: 
-                                final_status_text = status_from_class
-                                break
-                
-                stats['total'] += 1
-                if final_status_text == 'P' or final_status_text == 'PASSED':
-                    stats['passed'] += 1
-                elif final_status_text == 'F' or final_status_text == 'FAILED':
-                    stats['failed'] += 1
-                elif final_status_text == 'K' or final_status_text == 'KILLED': # Assuming K or KILLED for killed status
-                    stats['killed'] += 1
-                else: # Includes UNKNOWN, U, or any other text not matched above
-                    stats['other'] += 1 
-                    if job_id_for_logging:
-                        add_output_line_to_job(job_id_for_logging, f"Debug_HTML_Stats: Case '{td_cells[0].get_text(strip=True)[:50]}...' status '{final_status_text}' (from text: '{status_text_cell_content}', class: '{status_class_list}') categorized as 'Other/Unknown'.")
-            else: 
-                if job_id_for_logging: add_output_line_to_job(job_id_for_logging, f"Debug_HTML_Stats: Valid data row (checkbox found) but <2 cells: {row.get_text(strip=True, separator='|')[:70]}...")
-
-        if stats['total'] > 0:
-            stats['pass_rate'] = (stats['passed'] / stats['total']) * 100
-        
+        # Counters come from the cached report model / sidecar store; only case rows (rerun-checkbox or
+        # 'name (Seed: N)' rows) are counted, so the summary row needs no special handling.
+        stats = get_report_model(html_file_path).stats()
         if job_id_for_logging: add_output_line_to_job(job_id_for_logging, f"Successfully calculated total stats from {html_file_path}")
         return stats
     except Exception as e:
@@ -418,12 +1018,734 @@ def calculate_total_stats_from_html(html_file_path, job_id_for_logging=None, log
         traceback.print_exc() # For server console debugging
         return None
 
+# --- Per-case runtime history: longest-first ordering, shard balancing and ETAs ---
+# Wall-clock seconds are kept per case id and per test (all seeds) as an EWMA in a small SQLite
+# file. Durations come from the run directory name (its start timestamp) to the last write of
+# run.log / parse_run.log, or, when that is not available, from the [TEST_DONE] arrival time.
+RUNTIME_HISTORY_DB_PATH = os.environ.get('LIVE_REPORT_RUNTIME_HISTORY_DB', os.path.join(script_dir, '.runtime_history.sqlite'))
+RUNTIME_HISTORY_DEFAULT_SECONDS = float(os.environ.get('LIVE_REPORT_RUNTIME_DEFAULT_SECONDS', 600.0)) # Tests never seen before
+RUNTIME_HISTORY_EWMA_ALPHA = 0.3
+RUNTIME_HISTORY_MAX_SECONDS = 7 * 24 * 3600 # Anything longer is a clock or naming artifact
+_RUN_DIR_TIMESTAMP_RE = re.compile(r"(\d{4})-(\d{2})-(\d{2})[_T ](\d{2})[-:](\d{2})[-:](\d{2})")
+JOB_RUNTIME_PLANS = {} # job_id -> {'predictions', 'started_at', 'finished_at'}; kept out of JOB_STATUS, which is served as JSON
+
+class RuntimeHistory:
+    def __init__(self, db_path):
+        self.db_path = db_path
+
+    @contextlib.contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            conn.execute("CREATE TABLE IF NOT EXISTS runtimes (key TEXT PRIMARY KEY, ewma_seconds REAL NOT NULL, samples INTEGER NOT NULL,"
+                         " last_seconds REAL NOT NULL, updated_at REAL NOT NULL)")
+            yield conn
+        finally: conn.close()
+
+    def predict(self, case_ids):
+        # {case_id: predicted seconds}: the case's own history, else its test's, else the default
+        case_ids = list(case_ids); known_seconds = {}
+        lookup_keys = [f"case:{case_id}" for case_id in case_ids] + [f"test:{_split_case_id(case_id)[0]}" for case_id in case_ids]
+        try:
+            with self._connect() as conn:
+                for batch_start in range(0, len(lookup_keys), 500):
+                    key_batch = lookup_keys[batch_start:batch_start + 500]
+                    known_seconds.update(conn.execute(f"SELECT key, ewma_seconds FROM runtimes WHERE key IN ({','.join('?' * len(key_batch))})", key_batch))
+        except sqlite3.Error as e: print(f"Runtime history ({self.db_path}) unavailable for predictions: {e}")
+        return {case_id: known_seconds.get(f"case:{case_id}", known_seconds.get(f"test:{_split_case_id(case_id)[0]}", RUNTIME_HISTORY_DEFAULT_SECONDS))
+                for case_id in case_ids}
+
+    def record(self, seconds_by_case_id):
+        if not seconds_by_case_id: return
+        now = time.time(); samples_by_key = {}
+        for case_id, seconds in seconds_by_case_id.items():
+            samples_by_key.setdefault(f"case:{case_id}", []).append(seconds)
+            samples_by_key.setdefault(f"test:{_split_case_id(case_id)[0]}", []).append(seconds)
+        try:
+            with self._connect() as conn, conn:
+                for key, samples in samples_by_key.items():
+                    row = conn.execute("SELECT ewma_seconds, samples FROM runtimes WHERE key = ?", (key,)).fetchone()
+                    ewma_seconds, sample_count = row if row else (samples[0], 0)
+                    for seconds in samples: ewma_seconds += RUNTIME_HISTORY_EWMA_ALPHA * (seconds - ewma_seconds)
+                    conn.execute("INSERT OR REPLACE INTO runtimes VALUES (?, ?, ?, ?, ?)", (key, ewma_seconds, sample_count + len(samples), samples[-1], now))
+        except sqlite3.Error as e: print(f"Runtime history ({self.db_path}) not updated: {e}")
+
+RUNTIME_HISTORY = RuntimeHistory(RUNTIME_HISTORY_DB_PATH)
+
+def case_run_duration_seconds(run_dir_path):
+    # Start from the run directory's timestamp name, end at the last log write; None if unknown
+    timestamp_match = _RUN_DIR_TIMESTAMP_RE.search(os.path.basename(run_dir_path))
+    if not timestamp_match: return None
+    try: started_at = time.mktime(time.strptime("-".join(timestamp_match.groups()), "%Y-%m-%d-%H-%M-%S"))
+    except (ValueError, OverflowError): return None
+    finished_at = None
+    for log_name in ('run.log', 'parse_run.log'):
+        try: finished_at = max(finished_at or 0, os.path.getmtime(os.path.join(run_dir_path, log_name)))
+        except OSError: pass
+    if finished_at is None or not 0 < finished_at - started_at < RUNTIME_HISTORY_MAX_SECONDS: return None
+    return finished_at - started_at
+
+def note_case_finished(job_id, case_id):
+    # Called for [TEST_DONE] lines and live watcher results; refreshes the ETA in progress_summary.
+    plan = JOB_RUNTIME_PLANS.get(job_id)
+    if not plan or case_id not in plan['predictions'] or case_id in plan['finished_at']: return
+    plan['finished_at'][case_id] = time.time()
+    summary = JOB_STATUS.get(job_id, {}).get('progress_summary')
+    if summary is None or not plan.get('started_at'): return
+    finished_predicted_seconds = sum(plan['predictions'][finished_case_id] for finished_case_id in plan['finished_at'])
+    remaining_predicted_seconds = max(0.0, sum(plan['predictions'].values()) - finished_predicted_seconds)
+    elapsed_seconds = time.time() - plan['started_at']
+    # Observed throughput (predicted seconds completed per wall second) absorbs msim's parallelism
+    eta_seconds = remaining_predicted_seconds * elapsed_seconds / finished_predicted_seconds if finished_predicted_seconds > 0 else None
+    summary['predicted_remaining_seconds'] = round(remaining_predicted_seconds, 1)
+    summary['eta_seconds'] = round(eta_seconds, 1) if eta_seconds is not None else None
+    summary['eta_at'] = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(time.time() + eta_seconds)) if eta_seconds is not None else None
+
+# --- Result memo: passed results keyed by everything that determines them ---
+# Key: HEAD commit, hash of the test's definition in the source HJSON, the normalized options
+# that reach the simulator, test name and seed. Only PASSED results are memoized, and only from
+# clean work trees; 'force' in the request bypasses the memo.
+RESULT_MEMO_DB_PATH = os.environ.get('LIVE_REPORT_RESULT_MEMO_DB', os.path.join(script_dir, '.result_memo.sqlite'))
+RESULT_MEMO_GIT_TIMEOUT_SECONDS = 120
+
+def _normalized_option_text(value):
+    # Whitespace-insensitive; token order is kept since it can matter to the simulator
+    return " ".join(str(value or "").split())
+
+def result_memo_options_fingerprint(options):
+    return json.dumps({'runOpts': _normalized_option_text(options.get('runOpts')), 'elabOpts': _normalized_option_text(options.get('elabOpts')),
+                       'vloganOpts': _normalized_option_text(options.get('vloganOpts')), 'simTimeHours': _normalized_option_text(options.get('simTimeHours', "0"))},
+                      sort_keys=True)
+
+def git_source_state(project_root):
+    # (HEAD commit, tree is clean) for the work tree, or (None, False) if git cannot tell
+    try:
+        head_commit = subprocess.run(["git", "rev-parse", "HEAD"], cwd=project_root, capture_output=True, text=True,
+                                     timeout=RESULT_MEMO_GIT_TIMEOUT_SECONDS, check=True).stdout.strip()
+        porcelain_status = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=project_root, capture_output=True, text=True,
+                                          timeout=RESULT_MEMO_GIT_TIMEOUT_SECONDS, check=True).stdout
+        return head_commit or None, not porcelain_status.strip()
+    except (OSError, subprocess.SubprocessError) as e:
+        print(f"git state unavailable for '{project_root}': {e}")
+        return None, False
+
+def load_test_definitions(source_hjson_path):
+    # {base test name: definition}, from a tests list or dict in the source HJSON
+    with open(source_hjson_path, 'r') as file: hjson_data = hjson.load(file)
+    tests_section = hjson_data.get("tests", [])
+    if isinstance(tests_section, dict): return {name: test_def for name, test_def in tests_section.items() if isinstance(test_def, dict)}
+    return {test_def["name"]: test_def for test_def in tests_section if isinstance(test_def, dict) and "name" in test_def}
+
+def load_test_definition_hashes(source_hjson_path):
+    # {base test name: sha256 of its definition}
+    return {name: hashlib.sha256(json.dumps(test_def, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+            for name, test_def in load_test_definitions(source_hjson_path).items()}
+
+class ResultMemo:
+    def __init__(self, db_path):
+        self.db_path = db_path
+
+    @contextlib.contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            conn.execute("CREATE TABLE IF NOT EXISTS memo (key TEXT PRIMARY KEY, case_id TEXT NOT NULL, status TEXT NOT NULL,"
+                         " new_log_path TEXT, head_commit TEXT, recorded_at REAL NOT NULL)")
+            yield conn
+        finally: conn.close()
+
+    @staticmethod
+    def key(head_commit, test_definition_hash, options_fingerprint, case_id):
+        base_test_name, seed = _split_case_id(case_id)
+        return hashlib.sha256(json.dumps([head_commit, test_definition_hash, options_fingerprint, base_test_name, seed]).encode('utf-8')).hexdigest()
+
+    def lookup(self, keys_by_case_id):
+        # {case_id: result dict} for memo hits
+        hits = {}; case_ids_by_key = {key: case_id for case_id, key in keys_by_case_id.items()}; keys = list(case_ids_by_key)
+        try:
+            with self._connect() as conn:
+                for batch_start in range(0, len(keys), 500):
+                    key_batch = keys[batch_start:batch_start + 500]
+                    for key, status, new_log_path, head_commit in conn.execute(
+                            f"SELECT key, status, new_log_path, head_commit FROM memo WHERE key IN ({','.join('?' * len(key_batch))})", key_batch):
+                        case_id = case_ids_by_key[key]
+                        hits[case_id] = {"id": case_id, "status": status, "error_hint": "", "new_log_path": new_log_path, "memoized_from_commit": head_commit}
+        except sqlite3.Error as e: print(f"Result memo ({self.db_path}) unavailable: {e}")
+        return hits
+
+    def store(self, results_by_key, head_commit):
+        if not results_by_key: return
+        try:
+            with self._connect() as conn, conn:
+                conn.executemany("INSERT OR REPLACE INTO memo VALUES (?, ?, ?, ?, ?, ?)",
+                                 [(key, result['id'], result['status'], result.get('new_log_path'), head_commit, time.time()) for key, result in results_by_key.items()])
+        except sqlite3.Error as e: print(f"Result memo ({self.db_path}) not updated: {e}")
+
+RESULT_MEMO = ResultMemo(RESULT_MEMO_DB_PATH)
+
+# --- Automatic compile-skip decision: -so only when the build inputs are unchanged ---
+# Per build work area and build_mode, the source fingerprint and compile options of the last
+# successful build are recorded. The fingerprint covers the index entries (blob hashes) of the tracked RTL/TB
+# files plus the content of any locally modified ones, so it is commit-independent: a new
+# commit that touches no RTL/TB keeps -so.
+BUILD_STATE_DB_PATH = os.environ.get('LIVE_REPORT_BUILD_STATE_DB', os.path.join(script_dir, '.build_state.sqlite'))
+BUILD_SOURCE_PATHSPECS = os.environ.get('LIVE_REPORT_BUILD_SOURCE_PATHSPECS', 'rtl dv :(exclude)dv/sim_ctrl/ts/temp').split()
+AUTO_BUILD_DECISION_DEFAULT = os.environ.get('LIVE_REPORT_AUTO_BUILD_DECISION', '1') not in ('0', 'false', 'no')
+
+def compute_build_source_fingerprint(project_root):
+    # sha256 over tracked RTL/TB inputs as the work tree has them; None if git cannot tell
+    def git_output(*git_args, stdin_text=None):
+        return subprocess.run(["git", *git_args], cwd=project_root, input=stdin_text, capture_output=True,
+                              timeout=RESULT_MEMO_GIT_TIMEOUT_SECONDS, check=True).stdout
+    try:
+        fingerprint = hashlib.sha256(git_output("ls-files", "-s", "-z", "--", *BUILD_SOURCE_PATHSPECS))
+        modified_paths = [path for path in git_output("diff", "--name-only", "-z", "--diff-filter=d", "--", *BUILD_SOURCE_PATHSPECS).decode('utf-8', 'surrogateescape').split('\0') if path]
+        deleted_paths = [path for path in git_output("diff", "--name-only", "-z", "--diff-filter=D", "--", *BUILD_SOURCE_PATHSPECS).decode('utf-8', 'surrogateescape').split('\0') if path]
+        if modified_paths:
+            blob_hashes = git_output("hash-object", "--stdin-paths", stdin_text="\n".join(modified_paths).encode('utf-8', 'surrogateescape')).split()
+            for path, blob_hash in zip(modified_paths, blob_hashes): fingerprint.update(b"M " + path.encode('utf-8', 'surrogateescape') + b" " + blob_hash)
+        for path in deleted_paths: fingerprint.update(b"D " + path.encode('utf-8', 'surrogateescape'))
+        return fingerprint.hexdigest()
+    except (OSError, subprocess.SubprocessError) as e:
+        print(f"Build source fingerprint unavailable for '{project_root}': {e}")
+        return None
+
+def build_options_fingerprint(options):
+    # Options that change what gets compiled (waveform dumping usually adds debug access)
+    return json.dumps({'elabOpts': _normalized_option_text(options.get('elabOpts')), 'vloganOpts': _normalized_option_text(options.get('vloganOpts')),
+                       'includeWaveform': bool(options.get('includeWaveform'))}, sort_keys=True)
+
+class BuildStateStore:
+    def __init__(self, db_path):
+        self.db_path = db_path
+
+    @contextlib.contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            conn.execute("CREATE TABLE IF NOT EXISTS mode_builds (work_area TEXT NOT NULL, build_mode TEXT NOT NULL, source_fingerprint TEXT NOT NULL,"
+                         " options_fingerprint TEXT NOT NULL, head_commit TEXT, built_at REAL NOT NULL, PRIMARY KEY (work_area, build_mode))")
+            yield conn
+        finally: conn.close()
+
+    def get(self, work_area, build_mode):
+        try:
+            with self._connect() as conn:
+                row = conn.execute("SELECT source_fingerprint, options_fingerprint, head_commit, built_at FROM mode_builds WHERE work_area = ? AND build_mode = ?",
+                                   (work_area, build_mode)).fetchone()
+        except sqlite3.Error as e:
+            print(f"Build state ({self.db_path}) unavailable: {e}")
+            return None
+        return dict(zip(('source_fingerprint', 'options_fingerprint', 'head_commit', 'built_at'), row)) if row else None
+
+    def record(self, work_area, build_modes, source_fingerprint, options_fingerprint, head_commit):
+        try:
+            with self._connect() as conn, conn:
+                conn.executemany("INSERT OR REPLACE INTO mode_builds VALUES (?, ?, ?, ?, ?, ?)",
+                                 [(work_area, build_mode, source_fingerprint, options_fingerprint, head_commit, time.time()) for build_mode in build_modes])
+        except sqlite3.Error as e: print(f"Build state ({self.db_path}) not updated: {e}")
+
+BUILD_STATE = BuildStateStore(BUILD_STATE_DB_PATH)
+
+def _build_mode_label(build_mode):
+    return f"build_mode '{build_mode}'" if build_mode else "the default build_mode"
+
+def decide_sim_only(work_area, build_modes, source_fingerprint, options_fingerprint):
+    # (use -so, reason); -so needs every build_mode the cases use to be built and current
+    if not os.path.isdir(work_area): return False, "work area does not exist yet"
+    newest_build_state = None
+    for build_mode in sorted(build_modes or {""}):
+        build_state = BUILD_STATE.get(work_area, build_mode)
+        if build_state is None: return False, f"no successful build of {_build_mode_label(build_mode)} recorded for this work area"
+        built_at_text = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(build_state['built_at']))
+        if build_state['source_fingerprint'] != source_fingerprint:
+            return False, f"RTL/TB sources changed since the build of {_build_mode_label(build_mode)} at {built_at_text} ({(build_state['head_commit'] or '?')[:12]})"
+        if build_state['options_fingerprint'] != options_fingerprint:
+            return False, f"compile options (elab/vlog/waveform) changed since the build of {_build_mode_label(build_mode)} at {built_at_text}"
+        if newest_build_state is None or build_state['built_at'] > newest_build_state['built_at']: newest_build_state = build_state
+    built_at_text = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(newest_build_state['built_at']))
+    return True, f"sources and compile options unchanged since the build of {built_at_text} ({(newest_build_state['head_commit'] or '?')[:12]})"
+
+def load_case_build_modes(source_hjson_path, case_ids):
+    # {case_id: build_mode}; '' for tests without one (msim's default build)
+    test_defs = load_test_definitions(source_hjson_path) if source_hjson_path else {}
+    return {case_id: str(test_defs.get(_split_case_id(case_id)[0], {}).get("build_mode") or "") for case_id in case_ids}
+
+# --- Shared builds across concurrent jobs and shards ---
+# A build is what msim compiles into a -dir work area for the build_modes of the tests it runs.
+# Jobs and shards that need builds of the same work area go through BUILD_COORDINATOR: the
+# first (the leader) compiles, the others wait for it and then decide again, which for the same
+# build_modes, sources and compile options means -so. N concurrent requests for one build
+# compile it once. An unsharded leader compiles in its one msim run and releases the claim when
+# it exits. A sharded leader, or one that other jobs are already waiting on, compiles in a short
+# 'rerun_build' run of its own first (one case per build_mode, simulated for real, or compile
+# only if the site's msim has such a switch, set in LIVE_REPORT_MSIM_BUILD_ONLY_ARGS), which
+# releases the claim as soon as it ends; the job's remaining cases then run with -so, its shards
+# sharing the one work area. Jobs simulating on a work area's build are its users until their
+# msim runs end; a leader that recompiles waits for the other users first, since compiling
+# replaces the simv they are executing.
+BUILD_COORDINATION_DEFAULT = os.environ.get('LIVE_REPORT_BUILD_COORDINATION', '1') not in ('0', 'false', 'no')
+BUILD_COORDINATION_MAX_WAIT_SECONDS = float(os.environ.get('LIVE_REPORT_BUILD_COORDINATION_MAX_WAIT', 6 * 3600))
+MSIM_BUILD_ONLY_ARGS = os.environ.get('LIVE_REPORT_MSIM_BUILD_ONLY_ARGS', '').split()
+
+class BuildCoordinator:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._users_changed = threading.Condition(self._lock)
+        self._builds_in_flight = {} # work_area -> build claim being compiled
+        self._users = {} # work_area -> ids of the jobs simulating on its build
+        self._claim_generations = collections.Counter() # work_area -> claims registered so far
+
+    def claim(self, work_area, build_modes, source_fingerprint, options_fingerprint, job_id, force=False, on_wait=None):
+        # (claim, reason): a claim means the caller compiles and must finish() it; None means -so.
+        # A work area is compiled by one caller at a time; the others wait and decide again. Either
+        # way the caller is a user of the work area until it calls release_use(). Raises TimeoutError
+        # when another job's build does not finish within BUILD_COORDINATION_MAX_WAIT_SECONDS.
+        build_modes = set(build_modes) or {""}
+        wait_deadline = time.monotonic() + BUILD_COORDINATION_MAX_WAIT_SECONDS
+        while True:
+            with self._lock:
+                build_in_flight = self._builds_in_flight.get(work_area)
+                claim_generation = self._claim_generations[work_area]
+                if build_in_flight is not None: build_in_flight['waiting_job_ids'].add(job_id)
+            if build_in_flight is None:
+                # Decided outside the lock (SQLite, and the work area on NFS); the decision only stands
+                # if no other job claimed the work area meanwhile
+                if force: sim_only, reason = False, "rebuild requested (rebuildCases)"
+                else: sim_only, reason = decide_sim_only(work_area, build_modes, source_fingerprint, options_fingerprint)
+                with self._lock:
+                    if work_area in self._builds_in_flight or self._claim_generations[work_area] != claim_generation: continue
+                    if sim_only:
+                        self._users.setdefault(work_area, set()).add(job_id)
+                        return None, reason
+                    build_claim = self._new_claim(work_area, build_modes, source_fingerprint, options_fingerprint, job_id)
+                    self._builds_in_flight[work_area] = build_claim # Jobs arriving from now on wait for this build
+                    self._claim_generations[work_area] += 1
+                return build_claim, self._wait_for_other_users(work_area, job_id, reason, wait_deadline, on_wait)
+            if on_wait: on_wait(f"Waiting for job {build_in_flight['job_id']} to finish compiling {', '.join(_build_mode_label(build_mode) for build_mode in sorted(build_in_flight['build_modes']))} in {work_area}...")
+            build_finished = build_in_flight['done'].wait(max(0.0, wait_deadline - time.monotonic()))
+            with self._lock: build_in_flight['waiting_job_ids'].discard(job_id)
+            if not build_finished: # Compiling anyway would race the other job's compile in the same -dir
+                raise TimeoutError(f"gave up after {BUILD_COORDINATION_MAX_WAIT_SECONDS:g}s waiting for job {build_in_flight['job_id']} to finish compiling {work_area}")
+            # A forced rebuild is satisfied by a build of the same inputs that finished meanwhile
+            force = force and not (build_in_flight['succeeded'] and build_modes <= build_in_flight['build_modes'] and
+                                   (build_in_flight['source_fingerprint'], build_in_flight['options_fingerprint']) == (source_fingerprint, options_fingerprint))
+
+    def _wait_for_other_users(self, work_area, job_id, reason, wait_deadline, on_wait):
+        # The caller holds the work area's claim; wait (up to the deadline) until the jobs still
+        # simulating on the old build are done, then become a user itself.
+        other_users = lambda: self._users.get(work_area, set()) - {job_id}
+        with self._lock: waiting_for = sorted(other_users())
+        if waiting_for and on_wait: on_wait(f"Waiting for job(s) {', '.join(waiting_for)} to finish simulating on the build in {work_area} before recompiling it...")
+        with self._users_changed:
+            self._users_changed.wait_for(lambda: not other_users(), max(0.0, wait_deadline - time.monotonic()))
+            still_running = sorted(other_users())
+            self._users.setdefault(work_area, set()).add(job_id)
+        if still_running: reason += f"; gave up waiting for job(s) {', '.join(still_running)} still simulating on the old build"
+        return reason
+
+    def has_waiters(self, build_claim):
+        # Whether another job is waiting for this claim's build, i.e. would gain from releasing it early
+        with self._lock: return bool(build_claim['waiting_job_ids'])
+
+    def release_use(self, work_area, job_id):
+        # Idempotent, like finish(): called when the job's msim runs end and again in its cleanup
+        with self._users_changed:
+            users = self._users.get(work_area)
+            if not users or job_id not in users: return
+            users.discard(job_id)
+            if not users: del self._users[work_area]
+            self._users_changed.notify_all()
+
+    @staticmethod
+    def _new_claim(work_area, build_modes, source_fingerprint, options_fingerprint, job_id):
+        return {'work_area': work_area, 'build_modes': set(build_modes), 'source_fingerprint': source_fingerprint, 'options_fingerprint': options_fingerprint,
+                'job_id': job_id, 'done': threading.Event(), 'succeeded': None, 'waiting_job_ids': set()}
+
+    def finish(self, build_claim, succeeded, head_commit=None):
+        # Idempotent, so the job's cleanup can release a claim whatever happened before
+        if build_claim['done'].is_set(): return
+        if succeeded: # Recorded before release, so waiters deciding again see the new build
+            BUILD_STATE.record(build_claim['work_area'], build_claim['build_modes'], build_claim['source_fingerprint'], build_claim['options_fingerprint'], head_commit)
+        with self._lock:
+            if self._builds_in_flight.get(build_claim['work_area']) is build_claim: del self._builds_in_flight[build_claim['work_area']]
+        build_claim['succeeded'] = bool(succeeded)
+        build_claim['done'].set()
+
+BUILD_COORDINATOR = BuildCoordinator()
+
+def choose_build_case_ids(case_build_modes, runtime_predictions):
+    # One case per build_mode, the shortest predicted, for the leader's 'rerun_build' run
+    build_case_ids = {}
+    for case_id, build_mode in case_build_modes.items():
+        predicted_seconds = runtime_predictions.get(case_id, RUNTIME_HISTORY_DEFAULT_SECONDS)
+        if build_mode not in build_case_ids or predicted_seconds < build_case_ids[build_mode][0]: build_case_ids[build_mode] = (predicted_seconds, case_id)
+    return [case_id for _, case_id in sorted(build_case_ids.values(), key=lambda entry: entry[1])]
+
+# --- Sharded msim runs: one rerun split over several concurrent msim processes ---
+# Each shard runs its own regression group ('rerun_s<k>' in the job's rerun hjson). The shards share
+# the job's -dir work area and its build (sim directories are per case), so sharding needs build
+# coordination; without it the job runs a single msim.
+MSIM_MAX_SHARDS = int(os.environ.get('LIVE_REPORT_MSIM_MAX_SHARDS', 4)) # Also the msim license budget of one job
+MSIM_CORES_PER_SHARD = int(os.environ.get('LIVE_REPORT_MSIM_CORES_PER_SHARD', 4))
+MSIM_SHARD_MIN_CASES = int(os.environ.get('LIVE_REPORT_MSIM_SHARD_MIN_CASES', 8))
+
+def choose_msim_shard_count(requested_shards, num_cases):
+    # 'auto' picks from free cores, free license tokens and the case count; explicit counts are
+    # capped by the license budget and the case count only. The license budget is MSIM_MAX_SHARDS
+    # and the admission pool's size, so a job never plans more msim processes than it can lease.
+    if requested_shards in (None, '', 1, '1') or num_cases <= 1: return 1
+    tokens_in_use, token_capacity = ADMISSION.token_pool.usage() # Capacity 0: unlimited; None: unreadable, admission waits for it anyway
+    max_shards = min(MSIM_MAX_SHARDS, token_capacity) if token_capacity else MSIM_MAX_SHARDS
+    if str(requested_shards).strip().lower() == 'auto':
+        # Free cores are those the 1-minute load average leaves idle; free tokens are those not leased right now
+        busy_cores = os.getloadavg()[0] if hasattr(os, 'getloadavg') else 0.0
+        shards_by_cores = max(1, int((os.cpu_count() or 1) - busy_cores) // max(1, MSIM_CORES_PER_SHARD))
+        shards_by_cases = max(1, num_cases // max(1, MSIM_SHARD_MIN_CASES))
+        shards_by_tokens = max(1, token_capacity - tokens_in_use) if token_capacity and tokens_in_use is not None else max_shards
+        return max(1, min(max_shards, shards_by_cores, shards_by_cases, shards_by_tokens))
+    try: return max(1, min(int(requested_shards), max_shards, num_cases))
+    except (TypeError, ValueError): return 1
+
+def split_cases_into_shards(case_ids, shard_count, runtime_predictions=None):
+    # Longest-processing-time first: each case, longest predicted first, goes to the shard with the
+    # least predicted work so far. Every shard's list stays longest-first. Without predictions
+    # this is round-robin in the given order.
+    case_ids = list(case_ids); shard_count = max(1, shard_count)
+    if runtime_predictions: case_ids.sort(key=lambda case_id: -runtime_predictions.get(case_id, RUNTIME_HISTORY_DEFAULT_SECONDS))
+    shards = [[] for _ in range(shard_count)]; shard_loads = [(0.0, shard_index) for shard_index in range(shard_count)]
+    for case_id in case_ids:
+        shard_load, shard_index = heapq.heappop(shard_loads)
+        shards[shard_index].append(case_id)
+        heapq.heappush(shard_loads, (shard_load + (runtime_predictions.get(case_id, RUNTIME_HISTORY_DEFAULT_SECONDS) if runtime_predictions else 1.0), shard_index))
+    return [shard_case_ids for shard_case_ids in shards if shard_case_ids]
+
+def rerun_hjson_config_name(job_id):
+    # msim config name of a job's rerun hjson (dv/sim_ctrl/ts/temp/<name>.hjson). A shared
+    # 'rerun.hjson' would be rewritten by a concurrent job while this job's shards still read it.
+    return "rerun_" + re.sub(r'[^A-Za-z0-9]', '', str(job_id))[:16]
+
+def _build_msim_command_parts(options, regression_name, msim_dir_option, sim_only, config_name="rerun"):
+    msim_command_parts = ["msim", config_name, "-t", regression_name]
+    if sim_only: msim_command_parts.append("-so")
+    if options.get('includeWaveform'): msim_command_parts.append("-w")
+    sim_time_hours_str = options.get('simTimeHours', "0")
+    try:
+        sim_time_hours = int(sim_time_hours_str)
+        if sim_time_hours > 0: msim_command_parts.extend(["-rto", str(sim_time_hours * 60)])
+    except ValueError: pass # Ignore invalid simTimeHours
+    if msim_dir_option: msim_command_parts.extend(["-dir", msim_dir_option])
+    elab_opts_value = options.get('elabOpts', '').strip()
+    if elab_opts_value: msim_command_parts.extend(["-elab", elab_opts_value])
+    vlogan_opts_value = options.get('vloganOpts', '').strip()
+    if vlogan_opts_value: msim_command_parts.extend(["-vlog", vlogan_opts_value])
+    run_opts_value = options.get('runOpts', '').strip()
+    if run_opts_value: msim_command_parts.extend(["-ro", run_opts_value])
+    return msim_command_parts
+
+# --- Admission control: simulator licenses and host capacity in front of the msim stage ---
+# A job leases one license token per msim process it runs at once. The pool size is the first
+# integer in LIVE_REPORT_LICENSE_TOKEN_FILE, re-read on every check so a license monitor can
+# resize it; leases live next to it in '<token file>.leases' under flock, shared by every server
+# process on the host. Without a token file the pool is in-process and sized by
+# LIVE_REPORT_LICENSE_TOKENS (0: unlimited). The host must also be under the load-average and
+# over the available-memory thresholds. Jobs that cannot start wait in arrival order; a long
+# queue, or a queue head that has waited too long, is sustained overload and /rerun answers 429.
+LICENSE_TOKEN_FILE = os.environ.get('LIVE_REPORT_LICENSE_TOKEN_FILE', '')
+LICENSE_TOKENS_DEFAULT = int(os.environ.get('LIVE_REPORT_LICENSE_TOKENS', 0))
+ADMISSION_MAX_LOAD_PER_CPU = float(os.environ.get('LIVE_REPORT_ADMISSION_MAX_LOAD_PER_CPU', 1.5)) # 1-minute load average per CPU; <= 0 disables
+ADMISSION_MIN_AVAILABLE_MB = int(os.environ.get('LIVE_REPORT_ADMISSION_MIN_AVAILABLE_MB', 2048)) # MemAvailable; <= 0 disables
+ADMISSION_POLL_SECONDS = float(os.environ.get('LIVE_REPORT_ADMISSION_POLL_SECONDS', 5.0))
+ADMISSION_MAX_QUEUED_JOBS = int(os.environ.get('LIVE_REPORT_ADMISSION_MAX_QUEUED_JOBS', 16)) # <= 0 disables
+ADMISSION_OVERLOAD_SECONDS = float(os.environ.get('LIVE_REPORT_ADMISSION_OVERLOAD_SECONDS', 900)) # <= 0 disables
+ADMISSION_RETRY_AFTER_DEFAULT_SECONDS = 60
+ADMISSION_WAIT_REPORT_SECONDS = 60 # Job output gets the wait reason at most this often
+_HOST_NAME = os.uname().nodename if hasattr(os, 'uname') else ''
+
+def _pid_alive(pid):
+    try: os.kill(int(pid), 0)
+    except ProcessLookupError: return False
+    except (PermissionError, TypeError, ValueError): return True # Exists under another user, or unknown: keep the lease
+    return True
+
+def _mem_available_mb():
+    try:
+        with open('/proc/meminfo', 'r') as meminfo_file:
+            for line in meminfo_file:
+                if line.startswith('MemAvailable:'): return int(line.split()[1]) // 1024
+    except (OSError, ValueError, IndexError): pass
+    return None
+
+def host_resource_pressure():
+    # Why the host is too busy to start msim now, or None
+    if ADMISSION_MAX_LOAD_PER_CPU > 0 and hasattr(os, 'getloadavg'):
+        load_per_cpu = os.getloadavg()[0] / (os.cpu_count() or 1)
+        if load_per_cpu > ADMISSION_MAX_LOAD_PER_CPU: return f"host load average {load_per_cpu:.2f} per CPU is above {ADMISSION_MAX_LOAD_PER_CPU}"
+    if ADMISSION_MIN_AVAILABLE_MB > 0:
+        available_mb = _mem_available_mb()
+        if available_mb is not None and available_mb < ADMISSION_MIN_AVAILABLE_MB: return f"{available_mb} MB memory available, {ADMISSION_MIN_AVAILABLE_MB} MB required"
+    return None
+
+class LicenseTokenPool:
+    def __init__(self, token_file, default_tokens):
+        self.token_file = token_file
+        self.default_tokens = default_tokens
+        self._local_leases = {} # Used without a token file
+        self._lock = threading.Lock()
+
+    def capacity(self):
+        # Pool size (0: unlimited), or None if the token file cannot be read
+        if not self.token_file: return self.default_tokens
+        try:
+            with open(self.token_file, 'r') as token_file: pool_size_match = re.search(r"\d+", token_file.read())
+        except OSError: return None
+        return int(pool_size_match.group()) if pool_size_match else None
+
+    @contextlib.contextmanager
+    def _leases(self):
+        # {lease_id: lease}, written back on exit if changed; leases of dead processes on this host are dropped.
+        # Callers replace or remove whole leases, never edit one in place, so a shallow compare suffices.
+        if not self.token_file:
+            yield self._local_leases; return
+        leases_path = f"{self.token_file}.leases"
+        with open(f"{self.token_file}.lock", 'a') as lock_file:
+            if fcntl: fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            try:
+                try:
+                    with open(leases_path, 'r') as leases_file: stored_leases = json.load(leases_file)
+                except (OSError, ValueError): stored_leases = {}
+                leases = {lease_id: lease for lease_id, lease in stored_leases.items() if lease.get('host') != _HOST_NAME or _pid_alive(lease.get('pid'))}
+                yield leases
+                if leases == stored_leases: return # Polling waiters must not rewrite the file on NFS every poll
+                temp_leases_path = f"{leases_path}.tmp{os.getpid()}"
+                with open(temp_leases_path, 'w') as leases_file: json.dump(leases, leases_file)
+                os.replace(temp_leases_path, leases_path)
+            finally:
+                if fcntl: fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+    def _lease_id(self, job_id):
+        return f"{_HOST_NAME}:{os.getpid()}:{job_id}"
+
+    def try_acquire(self, job_id, tokens):
+        # (acquired, reason); a request larger than the pool waits for the whole pool. Shard plans are
+        # capped by the pool size, so that only happens when the pool shrank after the job was planned.
+        with self._lock:
+            capacity = self.capacity()
+            if capacity is None: return False, f"license token file {self.token_file} is missing or unreadable"
+            with self._leases() as leases:
+                lease_id = self._lease_id(job_id)
+                if capacity > 0:
+                    tokens = min(tokens, capacity)
+                    tokens_in_use = sum(lease['tokens'] for other_lease_id, lease in leases.items() if other_lease_id != lease_id)
+                    if tokens_in_use + tokens > capacity: return False, f"{max(0, capacity - tokens_in_use)} of {capacity} license token(s) free, {tokens} needed"
+                leases[lease_id] = {'host': _HOST_NAME, 'pid': os.getpid(), 'job_id': job_id, 'tokens': tokens, 'leased_at': time.time()}
+            return True, None
+
+    def release(self, job_id):
+        with self._lock:
+            try:
+                with self._leases() as leases: leases.pop(self._lease_id(job_id), None)
+            except OSError as e: print(f"License token lease of job {job_id} not released: {e}") # Reaped once this process exits
+
+    def usage(self):
+        # (tokens in use, pool size or None)
+        with self._lock:
+            capacity = self.capacity()
+            try:
+                with self._leases() as leases: return sum(lease['tokens'] for lease in leases.values()), capacity
+            except OSError: return None, capacity
+
+class AdmissionController:
+    def __init__(self, token_pool):
+        self.token_pool = token_pool
+        self._lock = threading.Lock()
+        self._queue = collections.OrderedDict() # job_id -> {'tokens', 'queued_at', 'reason'}, in arrival order
+        self._admitted = {} # job_id -> tokens
+
+    def acquire(self, job_id, tokens, on_wait=None):
+        # Blocks until the job may start its msim processes. Only the queue head is considered, so
+        # a large job is not starved by a stream of small ones.
+        with self._lock: self._queue[job_id] = {'tokens': tokens, 'queued_at': time.time(), 'reason': None}
+        last_reported_at = None
+        try:
+            while True:
+                with self._lock: queue_head_job_id = next(iter(self._queue))
+                reason = f"queued behind job {queue_head_job_id} in the admission queue" if queue_head_job_id != job_id else host_resource_pressure()
+                if reason is None:
+                    acquired, reason = self.token_pool.try_acquire(job_id, tokens)
+                    if acquired:
+                        with self._lock: self._admitted[job_id] = tokens
+                        return
+                with self._lock: self._queue[job_id]['reason'] = reason
+                if on_wait and (last_reported_at is None or time.time() - last_reported_at >= ADMISSION_WAIT_REPORT_SECONDS):
+                    on_wait(reason); last_reported_at = time.time() # Load and memory figures change every poll
+                time.sleep(ADMISSION_POLL_SECONDS)
+        finally:
+            with self._lock: self._queue.pop(job_id, None)
+
+    def release(self, job_id):
+        # Idempotent; the job's cleanup always calls it
+        with self._lock:
+            if self._admitted.pop(job_id, None) is None: return
+        self.token_pool.release(job_id)
+
+    def overload_retry_after(self):
+        # Retry-After seconds while admission is overloaded, else None
+        with self._lock:
+            queue_length = len(self._queue)
+            head_wait_seconds = time.time() - next(iter(self._queue.values()))['queued_at'] if self._queue else 0.0
+            admitted_job_ids = list(self._admitted)
+        if not ((ADMISSION_MAX_QUEUED_JOBS > 0 and queue_length >= ADMISSION_MAX_QUEUED_JOBS) or
+                (ADMISSION_OVERLOAD_SECONDS > 0 and head_wait_seconds >= ADMISSION_OVERLOAD_SECONDS)): return None
+        # Tokens free up when the first running job finishes; its ETA is the best guess available
+        running_etas = [JOB_STATUS.get(admitted_job_id, {}).get('progress_summary', {}).get('eta_seconds') for admitted_job_id in admitted_job_ids]
+        running_etas = [eta_seconds for eta_seconds in running_etas if eta_seconds]
+        return int(max(ADMISSION_POLL_SECONDS, min(running_etas))) if running_etas else ADMISSION_RETRY_AFTER_DEFAULT_SECONDS
+
+    def snapshot(self):
+        tokens_in_use, token_capacity = self.token_pool.usage()
+        with self._lock:
+            queued = [{'job_id': queued_job_id, 'tokens': entry['tokens'], 'waiting_seconds': round(time.time() - entry['queued_at'], 1), 'reason': entry['reason']}
+                      for queued_job_id, entry in self._queue.items()]
+            admitted = dict(self._admitted)
+        return {'queued': queued, 'admitted': admitted, 'tokens_in_use': tokens_in_use, 'token_capacity': token_capacity,
+                'host_pressure': host_resource_pressure()}
+
+ADMISSION = AdmissionController(LicenseTokenPool(LICENSE_TOKEN_FILE, LICENSE_TOKENS_DEFAULT))
+
+# --- Child process resource accounting: CPU, memory and I/O of the git and msim process trees ---
+# os.wait4() on the tcsh we started returns its rusage folded together with every descendant it
+# reaped (msim, vlog/vopt/vsim, ...): exact CPU seconds, the max RSS of the largest single process
+# and block I/O. While the child runs, a sampler walks /proc every few seconds for the live tree:
+# its summed RSS (shards and parallel compiles each stay under the largest-process figure) and
+# /proc/<pid>/io. The kernel adds a reaped child's I/O counters into its parent's, so the sum over
+# the live tree only grows and the last sample is the total, short of the final interval. Linux
+# fills in everything; elsewhere the missing figures are simply absent from the record.
+CHILD_USAGE_SAMPLE_SECONDS = float(os.environ.get('LIVE_REPORT_CHILD_USAGE_SAMPLE_SECONDS', 2.0)) # <= 0 disables the /proc sampler
+_PAGE_SIZE_BYTES = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+_PROC_IO_FIELDS = ('rchar', 'wchar', 'read_bytes', 'write_bytes')
+METRICS.counter('live_report_child_cpu_seconds_total', "CPU seconds used by git and msim process trees, by stage and user/system mode.")
+METRICS.counter('live_report_child_io_bytes_total', "Bytes read and written by git and msim process trees (layer: storage from rusage block counts, syscall from /proc rchar/wchar).")
+METRICS.histogram('live_report_child_max_rss_bytes', "Max RSS of the largest single process in each git or msim process tree.",
+                  tuple(megabytes * 1024 * 1024 for megabytes in (64, 256, 512, 1024, 2048, 4096, 8192, 16384, 32768, 65536, 131072)))
+
+def _proc_process_stats():
+    # {pid: (parent pid, RSS pages)} for every process visible in /proc
+    process_stats = {}
+    try: proc_entries = os.listdir('/proc')
+    except OSError: return process_stats
+    for proc_entry in proc_entries:
+        if not proc_entry.isdigit(): continue
+        try:
+            with open(f"/proc/{proc_entry}/stat", 'rb') as stat_file: stat_fields = stat_file.read().rsplit(b')', 1)[1].split() # comm may contain spaces
+            process_stats[int(proc_entry)] = (int(stat_fields[1]), int(stat_fields[21]))
+        except (OSError, IndexError, ValueError): continue # Exited while we listed
+    return process_stats
+
+def sample_process_tree(root_pid):
+    # (process count, summed RSS bytes, {/proc io field: summed value}) over root_pid and its live descendants
+    process_stats = _proc_process_stats()
+    child_pids = collections.defaultdict(list)
+    for pid, (parent_pid, _) in process_stats.items(): child_pids[parent_pid].append(pid)
+    tree_pids = [root_pid] if root_pid in process_stats else []
+    tree_index = 0
+    while tree_index < len(tree_pids):
+        tree_pids.extend(child_pids.get(tree_pids[tree_index], ())); tree_index += 1
+    io_totals = dict.fromkeys(_PROC_IO_FIELDS, 0)
+    for pid in tree_pids:
+        try:
+            with open(f"/proc/{pid}/io", 'r') as io_file:
+                for line in io_file:
+                    field_name, _, field_value = line.partition(':')
+                    if field_name in io_totals: io_totals[field_name] += int(field_value)
+        except (OSError, ValueError): continue
+    return len(tree_pids), sum(process_stats[pid][1] for pid in tree_pids) * _PAGE_SIZE_BYTES, io_totals
+
+class ChildUsageSampler:
+    # Samples one child's process tree on a daemon thread until stop()
+    def __init__(self, root_pid, thread_name):
+        self.root_pid = root_pid
+        self.peak_process_count = 0
+        self.peak_tree_rss_bytes = 0
+        self.io_totals = {}
+        self._stop_event = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True, name=thread_name)
+
+    def start(self):
+        if CHILD_USAGE_SAMPLE_SECONDS > 0 and os.path.isdir('/proc'): self._thread.start()
+        return self
+
+    def _run(self):
+        while True:
+            process_count, tree_rss_bytes, io_totals = sample_process_tree(self.root_pid)
+            if not process_count: return # Reaped: nothing left to sample
+            self.peak_process_count = max(self.peak_process_count, process_count)
+            self.peak_tree_rss_bytes = max(self.peak_tree_rss_bytes, tree_rss_bytes)
+            # Per-field maximum: a process whose io file could not be read must not shrink the totals
+            self.io_totals = {field_name: max(value, self.io_totals.get(field_name, 0)) for field_name, value in io_totals.items()}
+            if self._stop_event.wait(CHILD_USAGE_SAMPLE_SECONDS): return
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread.is_alive(): self._thread.join(timeout=5)
+        return self
+
+def wait_with_rusage(process):
+    # Popen.wait() that also returns the child's resource usage (None where wait4 is unavailable)
+    if not hasattr(os, 'wait4') or process.returncode is not None: return process.wait(), None
+    try: _, wait_status, child_rusage = os.wait4(process.pid, 0)
+    except ChildProcessError: return process.wait(), None # Reaped elsewhere
+    process.returncode = os.waitstatus_to_exitcode(wait_status) # Popen.wait()/poll() now return it without waiting again
+    return process.returncode, child_rusage
+
+def child_usage_record(child_rusage, sampler, wall_seconds):
+    # JSON-safe usage of one child process tree; CPU and I/O figures are totals over the tree
+    usage = {'wall_seconds': round(wall_seconds, 3)}
+    if child_rusage is not None:
+        cpu_seconds = child_rusage.ru_utime + child_rusage.ru_stime
+        usage.update({'cpu_user_seconds': round(child_rusage.ru_utime, 3), 'cpu_system_seconds': round(child_rusage.ru_stime, 3),
+                      'cpu_cores_average': round(cpu_seconds / wall_seconds, 2) if wall_seconds > 0 else None,
+                      'max_rss_bytes': child_rusage.ru_maxrss * (1 if sys.platform == 'darwin' else 1024), # Largest single process
+                      'storage_read_bytes': child_rusage.ru_inblock * 512, 'storage_write_bytes': child_rusage.ru_oublock * 512,
+                      'major_page_faults': child_rusage.ru_majflt})
+    if sampler and sampler.peak_process_count:
+        usage.update({'peak_tree_rss_bytes': sampler.peak_tree_rss_bytes, 'peak_process_count': sampler.peak_process_count})
+        if sampler.io_totals: usage.update({'read_chars': sampler.io_totals['rchar'], 'write_chars': sampler.io_totals['wchar']})
+    return usage
+
+def record_child_usage(job_id, stage_name, usage, label=None):
+    # Kept in JOB_STATUS[job_id]['resource_usage'] under "stage" or "stage label", and added to the metrics
+    if job_id in JOB_STATUS: JOB_STATUS[job_id].setdefault('resource_usage', {})[f"{stage_name} {label}" if label else stage_name] = usage
+    if 'cpu_user_seconds' in usage:
+        METRICS.inc('live_report_child_cpu_seconds_total', usage['cpu_user_seconds'], stage=stage_name, mode='user')
+        METRICS.inc('live_report_child_cpu_seconds_total', usage['cpu_system_seconds'], stage=stage_name, mode='system')
+        METRICS.observe('live_report_child_max_rss_bytes', usage['max_rss_bytes'], stage=stage_name)
+        METRICS.inc('live_report_child_io_bytes_total', usage['storage_read_bytes'], stage=stage_name, direction='read', layer='storage')
+        METRICS.inc('live_report_child_io_bytes_total', usage['storage_write_bytes'], stage=stage_name, direction='write', layer='storage')
+    if 'read_chars' in usage:
+        METRICS.inc('live_report_child_io_bytes_total', usage['read_chars'], stage=stage_name, direction='read', layer='syscall')
+        METRICS.inc('live_report_child_io_bytes_total', usage['write_chars'], stage=stage_name, direction='write', layer='syscall')
+
+def child_usage_text(usage):
+    # "cpu 812.4s (1.9 cores), max rss 2048 MB, tree rss 6144 MB, read 1200 MB, written 300 MB"
+    megabytes = lambda byte_count: f"{byte_count / (1024 * 1024):.0f} MB"
+    parts = []
+    if 'cpu_user_seconds' in usage:
+        cores_text = f" ({usage['cpu_cores_average']} cores)" if usage['cpu_cores_average'] is not None else ""
+        parts += [f"cpu {usage['cpu_user_seconds'] + usage['cpu_system_seconds']:.1f}s{cores_text}", f"max rss {megabytes(usage['max_rss_bytes'])}"]
+    if 'peak_tree_rss_bytes' in usage: parts.append(f"tree rss {megabytes(usage['peak_tree_rss_bytes'])} over {usage['peak_process_count']} process(es)")
+    if 'read_chars' in usage: parts.append(f"read {megabytes(usage['read_chars'])}, written {megabytes(usage['write_chars'])}")
+    elif 'storage_read_bytes' in usage: parts.append(f"storage read {megabytes(usage['storage_read_bytes'])}, written {megabytes(usage['storage_write_bytes'])}")
+    return ", ".join(parts) or f"wall {usage['wall_seconds']:.1f}s"
+
 def long_running_rerun_task(job_id, options, current_app_logger, actual_flask_app_instance): # Added actual_flask_app_instance
     # Raw print to see if the thread function is entered at all
     print(f"[THREAD_DEBUG] long_running_rerun_task entered for job_id: {job_id} at {time.strftime('%Y-%m-%d %H:%M:%S')}")
 
     rerun_log_path = None
     rerun_log_file_handle = None
+    rerun_config_name = rerun_hjson_config_name(job_id)
+    generated_rerun_hjson_paths = set() # Removed when the job ends; nothing else reads a job's own hjson
     html_report_actual_path = options.get('html_report_actual_path')
 
     if html_report_actual_path:
@@ -526,6 +1848,7 @@ def long_running_rerun_task(job_id, options, current_app_logger, actual_flask_ap
             num_selected_cases = len(options.get('selectedCases', []))
             JOB_STATUS[job_id]['progress_summary'] = {"total_selected": num_selected_cases, "processed_count": 0, "passed_count": 0, "failed_count": 0}
             update_job_status(job_id, "preparing_hjson", "Preparing HJSON files...")
+            begin_job_stage(job_id, "prepare_hjson")
             add_output_line_to_job(job_id, "Rerun task started. Preparing HJSON files...")
             # ... (temp_rerun_dir creation, IP name derivation, HJSON file preparation loop as before) ...
             temp_rerun_dir_name = f"temp_rerun_{job_id}_{str(uuid.uuid4())[:8]}"
@@ -556,11 +1879,19 @@ def long_running_rerun_task(job_id, options, current_app_logger, actual_flask_ap
                 return
 
             ip_names_to_process = {derived_ip_name}
+            runtime_predictions = RUNTIME_HISTORY.predict(options.get('selectedCases', []))
+            JOB_RUNTIME_PLANS[job_id] = {'predictions': runtime_predictions, 'started_at': None, 'finished_at': {}}
+            JOB_STATUS[job_id]['progress_summary']['predicted_total_seconds'] = round(sum(runtime_predictions.values()), 1)
+            msim_shard_count = choose_msim_shard_count(options.get('shards'), num_selected_cases)
+            msim_shard_case_groups = split_cases_into_shards(options.get('selectedCases', []), msim_shard_count, runtime_predictions)
+            if len(msim_shard_case_groups) > 1:
+                add_output_line_to_job(job_id, f"Sharded rerun: {num_selected_cases} case(s) over {len(msim_shard_case_groups)} msim process(es) ({', '.join(str(len(group)) for group in msim_shard_case_groups)}).")
             generated_hjson_paths_map = {}
             all_hjson_prepared_successfully = True
             for ip_name in ip_names_to_process:
-                hjson_path = prepare_rerun_hjson_files(project_root_for_icenv, options, temp_rerun_dir, ip_name) # This function logs to job_id internally
-                if hjson_path: generated_hjson_paths_map[ip_name] = hjson_path
+                with job_span(job_id, "prepare_rerun_hjson_files", ip=ip_name):
+                    hjson_path = prepare_rerun_hjson_files(project_root_for_icenv, options, temp_rerun_dir, ip_name, msim_shard_case_groups, runtime_predictions, config_name=rerun_config_name) # This function logs to job_id internally
+                if hjson_path: generated_hjson_paths_map[ip_name] = hjson_path; generated_rerun_hjson_paths.add(hjson_path)
                 else: all_hjson_prepared_successfully = False; break # prepare_rerun_hjson_files should log its own errors to job_id
             
             if not all_hjson_prepared_successfully:
@@ -581,16 +1912,6 @@ def long_running_rerun_task(job_id, options, current_app_logger, actual_flask_ap
             if rerun_log_file_handle: rerun_log_file_handle.write(f"INFO: {status_msg_hjson_done}\n")
             # ... (msim command parts assembly as before) ...
             prepared_hjson_actual_path = list(generated_hjson_paths_map.values())[0]
-            msim_command_parts = ["msim", "rerun", "-t", "rerun"]
-            if not options.get('rebuildCases', False): msim_command_parts.append("-so")
-            if options.get('includeWaveform'): msim_command_parts.append("-w")
-            # ... (other msim options) ...
-            sim_time_hours_str = options.get('simTimeHours', "0")
-            try:
-                sim_time_hours = int(sim_time_hours_str)
-                if sim_time_hours > 0: msim_command_parts.extend(["-rto", str(sim_time_hours * 60)])
-            except ValueError: pass # Ignore invalid simTimeHours
-
             user_specified_dir_option = options.get('dirOption', '').strip()
             # ... (final_msim_dir_option logic) ...
             full_branch_path_for_msim_dir_derivation = options.get('branchPath', '')
@@ -602,15 +1923,7 @@ def long_running_rerun_task(job_id, options, current_app_logger, actual_flask_ap
                     derived_dir_for_msim = os.path.normpath(path_after_work).split(os.sep)[0]
                     if derived_dir_for_msim and derived_dir_for_msim != '.' and derived_dir_for_msim != os.path.basename(path_after_work):
                         final_msim_dir_option = derived_dir_for_msim
-            if final_msim_dir_option: msim_command_parts.extend(["-dir", final_msim_dir_option])
-            # ... (elab, vlog, ro opts) ...
-            elab_opts_value = options.get('elabOpts', '').strip()
-            if elab_opts_value: msim_command_parts.extend(["-elab", elab_opts_value])
-            vlogan_opts_value = options.get('vloganOpts', '').strip()
-            if vlogan_opts_value: msim_command_parts.extend(["-vlog", vlogan_opts_value])
-            run_opts_value = options.get('runOpts', '').strip()
-            if run_opts_value: msim_command_parts.extend(["-ro", run_opts_value])
-
+            msim_command_parts = _build_msim_command_parts(options, "rerun", final_msim_dir_option, not options.get('rebuildCases', False), rerun_config_name)
             msim_executable_and_args = " ".join(msim_command_parts)
             icenv_script_path = "source /remote/public/scripts/icenv.csh"
             module_load_command = "module load msim/v3p0"
@@ -634,6 +1947,7 @@ def long_running_rerun_task(job_id, options, current_app_logger, actual_flask_ap
             
             # --- Stage 1: Git Pull ---
             update_job_status(job_id, "git_pulling", f"Pulling latest changes in {git_pull_dir}...")
+            begin_job_stage(job_id, "git_pull")
             git_pull_shell_command = (
                 f"source ~/.cshrc && "
                 f"{icenv_script_path} && "
@@ -650,6 +1964,8 @@ def long_running_rerun_task(job_id, options, current_app_logger, actual_flask_ap
                                                  stdout=subprocess.PIPE, stderr=subprocess.STDOUT, # Merge stderr to stdout
                                                  text=True, bufsize=1, universal_newlines=True,
                                                  shell=True, executable='tcsh', cwd=git_pull_dir)
+                git_pull_started_perf = time.perf_counter()
+                git_pull_usage_sampler = ChildUsageSampler(process_git_pull.pid, f"child-usage-{job_id[:8]}-git").start()
                 if process_git_pull.stdout:
                     for line in iter(process_git_pull.stdout.readline, ''):
                         stripped_line = line.strip()
@@ -657,7 +1973,8 @@ def long_running_rerun_task(job_id, options, current_app_logger, actual_flask_ap
                         if rerun_log_file_handle: rerun_log_file_handle.write(f"[GIT PULL] {stripped_line}\n")
                     process_git_pull.stdout.close()
 
-                git_pull_return_code = process_git_pull.wait()
+                git_pull_return_code, git_pull_rusage = wait_with_rusage(process_git_pull)
+                record_child_usage(job_id, "git_pull", child_usage_record(git_pull_rusage, git_pull_usage_sampler.stop(), time.perf_counter() - git_pull_started_perf))
                 # stderr is merged, so no separate stderr reading here.
                 
                 if git_pull_return_code == 0:
@@ -694,18 +2011,117 @@ def long_running_rerun_task(job_id, options, current_app_logger, actual_flask_ap
                 update_job_status(job_id, "failed", "Git pull reported as failed (safeguard), aborting task.")
                 return
 
+            # --- Result memo: cases already passed at this commit with this definition and options ---
+            begin_job_stage(job_id, "result_memo")
+            memoized_results = []; memo_keys_by_case_id = {}; memo_head_commit = None
+            memo_head_commit, memo_tree_clean = git_source_state(project_root_for_icenv)
+            source_hjson_path_for_memo = find_source_test_hjson(project_root_for_icenv, derived_ip_name)
+            if not memo_head_commit or not memo_tree_clean or not source_hjson_path_for_memo:
+                add_output_line_to_job(job_id, f"Result memo not used: {'no git HEAD' if not memo_head_commit else ('work tree has local changes' if not memo_tree_clean else 'source HJSON not found')}.")
+            else:
+                try: test_definition_hashes = load_test_definition_hashes(source_hjson_path_for_memo)
+                except Exception as e:
+                    test_definition_hashes = {}
+                    add_output_line_to_job(job_id, f"Result memo not used: could not read {source_hjson_path_for_memo}: {e}")
+                options_fingerprint = result_memo_options_fingerprint(options)
+                for case_id in options.get('selectedCases', []):
+                    test_definition_hash = test_definition_hashes.get(_split_case_id(case_id)[0])
+                    if test_definition_hash: memo_keys_by_case_id[case_id] = ResultMemo.key(memo_head_commit, test_definition_hash, options_fingerprint, case_id)
+                if options.get('force'):
+                    add_output_line_to_job(job_id, "Result memo bypassed ('force' set); all selected cases will be simulated.")
+                elif memo_keys_by_case_id:
+                    memo_hits = RESULT_MEMO.lookup(memo_keys_by_case_id)
+                    if memo_hits:
+                        memoized_results = [memo_hits[case_id] for case_id in options.get('selectedCases', []) if case_id in memo_hits]
+                        options['selectedCases'] = [case_id for case_id in options.get('selectedCases', []) if case_id not in memo_hits]
+                        add_output_line_to_job(job_id, f"Result memo: {len(memoized_results)} case(s) already PASSED at {memo_head_commit[:12]} with the same test definition and options; simulating {len(options['selectedCases'])}.")
+                        JOB_STATUS[job_id]['progress_summary']['processed_count'] += len(memoized_results)
+                        JOB_STATUS[job_id]['progress_summary']['passed_count'] += len(memoized_results)
+                        runtime_predictions = {case_id: runtime_predictions[case_id] for case_id in options['selectedCases']}
+                        JOB_RUNTIME_PLANS[job_id]['predictions'] = runtime_predictions
+                        JOB_STATUS[job_id]['progress_summary']['predicted_total_seconds'] = round(sum(runtime_predictions.values()), 1)
+                        msim_shard_case_groups = split_cases_into_shards(options['selectedCases'], choose_msim_shard_count(options.get('shards'), len(options['selectedCases'])), runtime_predictions)
+
+            # --- Build coordination: each needed build is compiled once across concurrent jobs and shards ---
+            begin_job_stage(job_id, "build_coordination")
+            build_source_fingerprint = None; compile_options_fingerprint = build_options_fingerprint(options)
+            auto_build_decision = options.get('autoBuild', AUTO_BUILD_DECISION_DEFAULT)
+            if auto_build_decision and options.get('selectedCases'):
+                with job_span(job_id, "compute_build_source_fingerprint"): build_source_fingerprint = compute_build_source_fingerprint(project_root_for_icenv) # Also recorded after forced rebuilds
+            case_build_modes = {}
+            try: case_build_modes = load_case_build_modes(source_hjson_path_for_memo, options.get('selectedCases', []))
+            except Exception as e: add_output_line_to_job(job_id, f"Warning: Could not read the build_mode of the selected tests from {source_hjson_path_for_memo}: {e}")
+            build_claim = None; coordinated_build_reason = None; build_stage_case_ids = []; post_build_case_groups = []
+            build_coordinated = bool(options.get('shareBuild', BUILD_COORDINATION_DEFAULT) and auto_build_decision and build_source_fingerprint
+                                     and final_msim_dir_option and options.get('selectedCases') and case_build_modes) # The build run needs the build_modes
+            if len(msim_shard_case_groups) > 1 and not build_coordinated:
+                # Shards only share a build through coordination; on their own each would need a work area of its
+                # own and compile into it, N compiles and N trees for one rerun
+                add_output_line_to_job(job_id, "Sharding needs build coordination (shareBuild and autoBuild, a known source fingerprint and build_modes, "
+                                               "and an msim -dir work area); running a single MSIM instead.")
+                msim_shard_case_groups = split_cases_into_shards(options['selectedCases'], 1, runtime_predictions)
+
+            # Admission: license tokens for the most msim processes running at once (a build run, if any, runs
+            # alone and its shards reuse the planned count), and host capacity. Taken before the build claim,
+            # so a job holding a build claim is never stuck behind others in the admission queue.
+            msim_tokens_needed = len(msim_shard_case_groups) if options.get('selectedCases') else 0
+            if msim_tokens_needed:
+                begin_job_stage(job_id, "admission")
+                def on_admission_wait(reason):
+                    admission_wait_msg = f"Waiting to start MSIM ({msim_tokens_needed} license token(s) needed): {reason}."
+                    update_job_status(job_id, "queued_for_resources", admission_wait_msg)
+                    add_output_line_to_job(job_id, admission_wait_msg)
+                    if rerun_log_file_handle: rerun_log_file_handle.write(f"INFO: {admission_wait_msg}\n")
+                JOB_RUNTIME_PLANS[job_id]['admission_requested'] = True # Released in the task's finally
+                admission_wait_started_at = time.time()
+                ADMISSION.acquire(job_id, msim_tokens_needed, on_admission_wait)
+                add_output_line_to_job(job_id, f"Admitted to run MSIM after {time.time() - admission_wait_started_at:.1f}s ({msim_tokens_needed} license token(s) leased).")
+
+            if build_coordinated:
+                begin_job_stage(job_id, "build_claim")
+                shared_work_area = os.path.join(project_root_for_icenv, "work", final_msim_dir_option)
+                needed_build_modes = set(case_build_modes.values()) or {""}
+                def on_build_wait(build_wait_msg):
+                    update_job_status(job_id, "waiting_for_build", build_wait_msg)
+                    add_output_line_to_job(job_id, build_wait_msg)
+                    if rerun_log_file_handle: rerun_log_file_handle.write(f"INFO: {build_wait_msg}\n")
+                try:
+                    with job_span(job_id, "build_claim", work_area=shared_work_area) as build_claim_span_args: # Includes any wait for another job's build
+                        build_claim, coordinated_build_reason = BUILD_COORDINATOR.claim(shared_work_area, needed_build_modes, build_source_fingerprint, compile_options_fingerprint,
+                                                                                        job_id, force=options.get('rebuildCases', False), on_wait=on_build_wait)
+                        build_claim_span_args['compiles'] = bool(build_claim)
+                except TimeoutError as e:
+                    err_msg_build_wait = f"Build coordination failed: {e}."
+                    update_job_status(job_id, "failed", err_msg_build_wait)
+                    add_output_line_to_job(job_id, err_msg_build_wait)
+                    if rerun_log_file_handle: rerun_log_file_handle.write(f"ERROR: {err_msg_build_wait}\n")
+                    return
+                JOB_RUNTIME_PLANS[job_id]['build_claim'] = build_claim # Released in the task's finally if never finished
+                JOB_RUNTIME_PLANS[job_id]['build_work_area'] = shared_work_area # Use released when msim ends, or in the task's finally
+                if build_claim:
+                    # Groups for a build run of its own, in case one is split off when msim starts (see Stage 3).
+                    # Without a build-only switch the build run simulates its cases.
+                    build_stage_case_ids = choose_build_case_ids(case_build_modes, runtime_predictions)
+                    remaining_case_ids = options['selectedCases'] if MSIM_BUILD_ONLY_ARGS else [case_id for case_id in options['selectedCases'] if case_id not in set(build_stage_case_ids)]
+                    post_build_case_groups = split_cases_into_shards(remaining_case_ids, len(msim_shard_case_groups), runtime_predictions) if remaining_case_ids else []
+                add_output_line_to_job(job_id, f"Build coordination for {shared_work_area} ({', '.join(_build_mode_label(build_mode) for build_mode in sorted(needed_build_modes))}): "
+                                               f"{'this job compiles' if build_claim else 'reusing the existing build'} - {coordinated_build_reason}.")
+
             # --- Stage 2: Prepare HJSON files (uses updated files from git pull) ---
             status_msg_hjson_prep_post_git = "Preparing HJSON files (post git pull)..."
             update_job_status(job_id, "preparing_hjson", status_msg_hjson_prep_post_git)
+            begin_job_stage(job_id, "prepare_hjson_post_pull")
             if rerun_log_file_handle: rerun_log_file_handle.write(f"INFO: {status_msg_hjson_prep_post_git}\n")
             logger_to_use_start.info(f"Job {job_id}: Starting HJSON preparation after successful git pull.")
             
             generated_hjson_paths_map_post_git = {} # Use a new map name to avoid confusion
             all_hjson_prepared_successfully_post_git = True
             for ip_name_hjson_prep_pg in ip_names_to_process: # ip_names_to_process is defined before git pull
-                hjson_path_pg = prepare_rerun_hjson_files(project_root_for_icenv, options, temp_rerun_dir, ip_name_hjson_prep_pg)
+                with job_span(job_id, "prepare_rerun_hjson_files", ip=ip_name_hjson_prep_pg):
+                    hjson_path_pg = prepare_rerun_hjson_files(project_root_for_icenv, options, temp_rerun_dir, ip_name_hjson_prep_pg,
+                                                              post_build_case_groups if build_claim else msim_shard_case_groups, runtime_predictions, build_stage_case_ids, rerun_config_name)
                 if hjson_path_pg:
-                    generated_hjson_paths_map_post_git[ip_name_hjson_prep_pg] = hjson_path_pg
+                    generated_hjson_paths_map_post_git[ip_name_hjson_prep_pg] = hjson_path_pg; generated_rerun_hjson_paths.add(hjson_path_pg)
                 else:
                     all_hjson_prepared_successfully_post_git = False
                     # prepare_rerun_hjson_files logs its own errors to job_id. We log to rerun.log here.
@@ -728,32 +2144,132 @@ def long_running_rerun_task(job_id, options, current_app_logger, actual_flask_ap
             # --- Stage 3: MSIM Execution ---
             status_msg_msim_start = "HJSON files prepared. Starting MSIM..."
             update_job_status(job_id, "hjson_prepared", status_msg_msim_start) # Status indicates HJSON is done, msim is next
+            begin_job_stage(job_id, "msim_setup")
             if rerun_log_file_handle: rerun_log_file_handle.write(f"INFO: {status_msg_msim_start}\n")
             logger_to_use_start.info(f"Job {job_id}: HJSON files prepared. Assembling MSIM command.")
+
+            # One entry per msim process; an unsharded rerun is a single shard running the 'rerun' group.
+            # Phase 0 is the coordinated build run, if any; phase 1 runs start once it has compiled. The build
+            # gets a run of its own only when that pays for the second msim start: the shards share its build,
+            # a build-only switch exists, or another job is waiting for the claim. Otherwise the one msim
+            # compiles and simulates, and the claim is released when it exits.
+            msim_shard_runs = []
+            split_build_run = bool(build_claim) and (len(msim_shard_case_groups) > 1 or bool(MSIM_BUILD_ONLY_ARGS) or BUILD_COORDINATOR.has_waiters(build_claim))
+            if split_build_run:
+                msim_shard_runs.append({'index': None, 'label': "BUILD", 'phase': 0, 'regression': "rerun_build", 'dir_option': final_msim_dir_option,
+                                        'case_ids': [] if MSIM_BUILD_ONLY_ARGS else build_stage_case_ids, 'compile_only': bool(MSIM_BUILD_ONLY_ARGS), 'compiles_claim': True})
+            shard_case_groups_to_run = post_build_case_groups if split_build_run else msim_shard_case_groups
+            if not options.get('selectedCases'):
+                add_output_line_to_job(job_id, "All selected cases were served from the result memo; MSIM is not run.")
+            elif (len(shard_case_groups_to_run) > 1 or split_build_run) and final_msim_dir_option:
+                for shard_index, shard_case_ids in enumerate(shard_case_groups_to_run):
+                    msim_shard_runs.append({'index': shard_index, 'label': f"S{shard_index}", 'phase': 1, 'regression': f"rerun_s{shard_index}",
+                                            'dir_option': final_msim_dir_option, 'case_ids': shard_case_ids})
+            else:
+                msim_shard_runs.append({'index': 0, 'label': "S0", 'phase': 1, 'regression': "rerun", 'dir_option': final_msim_dir_option,
+                                        'case_ids': options.get('selectedCases', []), 'compiles_claim': bool(build_claim)})
+            log_path_error = False
+            for shard_run in msim_shard_runs:
+                shard_run['sim_root'], shard_run['base_log_path_for_html'], vcs_context_basename, shard_run['log_path_error'] = derive_sim_log_roots(project_root_for_icenv, options, shard_run['dir_option'], job_id)
+                log_path_error = log_path_error or shard_run['log_path_error']
+
+            # -so per build work area: the coordinated decision when the job shares builds; otherwise explicit
+            # rebuildCases wins and the rest is decided from the source fingerprint
+            JOB_STATUS[job_id]['build_decision'] = []
+            for shard_run in msim_shard_runs:
+                shard_run['work_area'] = os.path.join(project_root_for_icenv, "work", shard_run['dir_option']) if shard_run['dir_option'] else \
+                    (os.path.join(project_root_for_icenv, shard_run['base_log_path_for_html']) if shard_run['base_log_path_for_html'] else None)
+                shard_run['build_modes'] = {case_build_modes.get(case_id, "") for case_id in (build_stage_case_ids if shard_run.get('compile_only') else shard_run['case_ids'])} or {""}
+                if build_coordinated:
+                    if not build_claim: shard_run['sim_only'], build_reason = True, coordinated_build_reason
+                    elif shard_run.get('compiles_claim'):
+                        shard_run['sim_only'], build_reason = False, coordinated_build_reason + ("; compiling in a build run before the simulations start" if shard_run['phase'] == 0 else "")
+                    else: shard_run['sim_only'], build_reason = True, "uses the build compiled by the BUILD run"
+                elif options.get('rebuildCases', False):
+                    shard_run['sim_only'], build_reason = False, "rebuild requested (rebuildCases)"
+                elif not auto_build_decision:
+                    shard_run['sim_only'], build_reason = True, "automatic build decision disabled; reusing the existing build (-so)"
+                elif not build_source_fingerprint or not shard_run['work_area']:
+                    shard_run['sim_only'], build_reason = True, "source fingerprint or work area unknown; reusing the existing build (-so)"
+                else:
+                    shard_run['sim_only'], build_reason = decide_sim_only(shard_run['work_area'], shard_run['build_modes'], build_source_fingerprint, compile_options_fingerprint)
+                shard_run['command'] = " ".join(_build_msim_command_parts(options, shard_run['regression'], shard_run['dir_option'], shard_run['sim_only'], rerun_config_name)
+                                                + (MSIM_BUILD_ONLY_ARGS if shard_run.get('compile_only') else []))
+                JOB_STATUS[job_id]['build_decision'].append({'shard': shard_run['label'], 'work_area': shard_run['work_area'], 'build_modes': sorted(shard_run['build_modes']),
+                                                             'sim_only': shard_run['sim_only'], 'reason': build_reason})
+                shard_label = f" ({shard_run['label']})" if len(msim_shard_runs) > 1 else ""
+                add_output_line_to_job(job_id, f"Build decision{shard_label}: {'-so (skip compile)' if shard_run['sim_only'] else 'compile'} - {build_reason}.")
+            for shard_run in msim_shard_runs:
+                shard_run['shell_command'] = (
+                    f"source ~/.cshrc && "
+                    f"{icenv_script_path} && "
+                    f"{module_load_command} && "
+                    f"echo 'DIAG_TRACE: Checking PRJ_ICDIR before msim execution.' && "
+                    f"echo 'DIAG_PRJ_ICDIR_VALUE: '$PRJ_ICDIR && "
+                    f"{shard_run['command']}"
+                )
+                shard_run['output_prefix'] = f"[{shard_run['label']}] " if len(msim_shard_runs) > 1 else ""
+            msim_commands_summary = " ; ".join(shard_run['command'] for shard_run in msim_shard_runs)
+            update_job_status(job_id, "running_msim", f"Executing MSIM command{'s' if len(msim_shard_runs) > 1 else ''} in {git_pull_dir}...", 
+                              command=f"{msim_commands_summary} (executed in {git_pull_dir} after icenv setup with PRJ_ICDIR diagnostic)")
             
-            msim_shell_command = (
-                f"source ~/.cshrc && "
-                f"{icenv_script_path} && "
-                f"{module_load_command} && "
-                f"echo 'DIAG_TRACE: Checking PRJ_ICDIR before msim execution.' && "
-                f"echo 'DIAG_PRJ_ICDIR_VALUE: '$PRJ_ICDIR && "
-                f"{msim_executable_and_args}" # msim_executable_and_args is defined before git pull stage
-            )
-            update_job_status(job_id, "running_msim", f"Executing MSIM command in {git_pull_dir}...", 
-                              command=f"{msim_executable_and_args} (executed in {git_pull_dir} after icenv setup with PRJ_ICDIR diagnostic)")
-            
-            msim_exec_log_msg1 = f"Executing MSIM (CWD: {git_pull_dir}): {msim_shell_command}"
+            for shard_run in msim_shard_runs:
+                msim_exec_log_msg1 = f"{shard_run['output_prefix']}Executing MSIM (CWD: {git_pull_dir}): {shard_run['shell_command']}"
+                add_output_line_to_job(job_id, msim_exec_log_msg1)
+                if rerun_log_file_handle: rerun_log_file_handle.write(f"INFO: {msim_exec_log_msg1}\n")
+                logger_to_use_start.info(f"Job {job_id}: Executing MSIM command: {shard_run['shell_command']} in CWD: {git_pull_dir}")
             msim_exec_log_msg2 = "This may take some time..."
-            add_output_line_to_job(job_id, msim_exec_log_msg1)
             add_output_line_to_job(job_id, msim_exec_log_msg2)
-            if rerun_log_file_handle: 
-                rerun_log_file_handle.write(f"INFO: {msim_exec_log_msg1}\n")
-                rerun_log_file_handle.write(f"INFO: {msim_exec_log_msg2}\n")
-            logger_to_use_start.info(f"Job {job_id}: Executing MSIM command: {msim_shell_command} in CWD: {git_pull_dir}")
+            if rerun_log_file_handle: rerun_log_file_handle.write(f"INFO: {msim_exec_log_msg2}\n")
 
             process_return_code = None 
             msim_stdout_start_index = len(JOB_STATUS[job_id].get("output_lines", [])) 
 
+            # Sim directories are known before msim runs, so finished cases can be picked up live
+            sim_dir_watchers = []; live_results_by_case_id = {}; report_publisher = None
+            try: publish_interval_seconds = float(options.get('publishIntervalSeconds', REPORT_PUBLISH_INTERVAL_SECONDS))
+            except (TypeError, ValueError): publish_interval_seconds = REPORT_PUBLISH_INTERVAL_SECONDS
+            if html_report_actual_path and publish_interval_seconds > 0 and os.path.exists(html_report_actual_path):
+                report_publisher = IncrementalReportPublisher(html_report_actual_path, job_id, publish_interval_seconds)
+            live_results_lock = threading.Lock() # Shard watchers report from their own threads
+            def on_live_case_result(case_id, result):
+                with live_results_lock:
+                    live_results_by_case_id[case_id] = result
+                    JOB_STATUS[job_id]['detailed_test_results'] = list(live_results_by_case_id.values()) # Swapped whole, readers never see a partial list
+                    JOB_STATUS[job_id]['live_results_updated_at'] = time.time()
+                    resolved_count = len(live_results_by_case_id)
+                if report_publisher: report_publisher.add(result)
+                note_case_finished(job_id, case_id)
+                add_output_line_to_job(job_id, f"[LIVE] {case_id}: {result['status']} ({resolved_count}/{num_selected_cases} case(s) resolved)")
+            if options.get('watchSimDir', SIM_WATCH_ENABLED_DEFAULT):
+                for shard_run in msim_shard_runs:
+                    if shard_run['log_path_error'] or not shard_run['sim_root'] or not shard_run['case_ids']: continue
+                    sim_dir_watchers.append(SimDirWatcher(shard_run['sim_root'], shard_run['case_ids'], shard_run['base_log_path_for_html'],
+                                                          on_live_case_result, time.time(), job_id).start())
+                    shard_run['watched'] = True
+                    add_output_line_to_job(job_id, f"{shard_run['output_prefix']}Watching {shard_run['sim_root']} for finished cases while MSIM runs.")
+
+            # Without a watcher, the report publisher is fed as msim reports [TEST_DONE] for each case
+            for shard_run in msim_shard_runs:
+                if report_publisher and not shard_run.get('watched') and not shard_run['log_path_error'] and shard_run['sim_root']:
+                    shard_run['test_done_case_ids'] = set(shard_run['case_ids'])
+
+            msim_processes = []; rerun_log_write_lock = threading.Lock()
+            def pump_msim_output(process_msim, shard_run):
+                output_prefix = shard_run['output_prefix']
+                for line in iter(process_msim.stdout.readline, ''):
+                    stripped_line = line.strip() 
+                    if 'msim_started_perf' not in shard_run and stripped_line.startswith("DIAG_PRJ_ICDIR_VALUE:"):
+                        shard_run['msim_started_perf'] = time.perf_counter() # Echoed right before msim: shell and module setup are done
+                    add_output_line_to_job(job_id, output_prefix + stripped_line) 
+                    if rerun_log_file_handle:
+                        with rerun_log_write_lock: rerun_log_file_handle.write(output_prefix + stripped_line + "\n")
+                    test_done_match = TEST_DONE_LINE_PATTERN.search(stripped_line) if shard_run.get('test_done_case_ids') else None
+                    if test_done_match and test_done_match.group(1) in shard_run['test_done_case_ids']:
+                        live_result = resolve_case_result_for_test_done(test_done_match.group(1), shard_run['sim_root'], shard_run['base_log_path_for_html'],
+                                                                        shard_run['started_at'] - SIM_WATCH_MTIME_SLACK_SECONDS)
+                        if live_result: on_live_case_result(test_done_match.group(1), live_result)
+                process_msim.stdout.close()
             try: 
                 add_output_line_to_job(job_id, "Using inherited environment for MSIM subprocess.") # This line will also go to rerun.log if handled by a wrapper
                 if rerun_log_file_handle: rerun_log_file_handle.write("INFO: Using inherited environment for MSIM subprocess.\n")
@@ -762,23 +2278,58 @@ def long_running_rerun_task(job_id, options, current_app_logger, actual_flask_ap
                 add_output_line_to_job(job_id, msim_attempt_msg)
                 if rerun_log_file_handle: rerun_log_file_handle.write(f"INFO: {msim_attempt_msg}\n")
 
-                process_msim = subprocess.Popen(msim_shell_command,
-                                             stdout=subprocess.PIPE, stderr=subprocess.STDOUT, # Merge stderr to stdout
-                                             text=True, bufsize=1, universal_newlines=True,
-                                             shell=True, executable='tcsh', cwd=git_pull_dir) 
-
-                if process_msim.stdout:
-                    for line in iter(process_msim.stdout.readline, ''):
-                        stripped_line = line.strip() 
-                        add_output_line_to_job(job_id, stripped_line) 
-                        if rerun_log_file_handle: rerun_log_file_handle.write(stripped_line + "\n")
-                    process_msim.stdout.close()
-
-                process_return_code = process_msim.wait()
-                # stderr is merged.
+                begin_job_stage(job_id, "msim")
+                JOB_RUNTIME_PLANS[job_id]['started_at'] = time.time()
+                for msim_phase in sorted({shard_run['phase'] for shard_run in msim_shard_runs}):
+                    phase_runs = [shard_run for shard_run in msim_shard_runs if shard_run['phase'] == msim_phase]
+                    if build_claim and build_claim['done'].is_set() and not build_claim['succeeded']:
+                        skipped_msg = f"Skipping {len(phase_runs)} MSIM run(s): the BUILD run did not produce a usable build."
+                        add_output_line_to_job(job_id, skipped_msg)
+                        if rerun_log_file_handle: rerun_log_file_handle.write(f"ERROR: {skipped_msg}\n")
+                        for shard_run in phase_runs: shard_run['returncode'] = -1
+                        continue
+                    phase_processes = []
+                    for shard_run in phase_runs:
+                        shard_run['started_at'] = time.time(); shard_run['started_perf'] = time.perf_counter()
+                        process_msim = subprocess.Popen(shard_run['shell_command'],
+                                                     stdout=subprocess.PIPE, stderr=subprocess.STDOUT, # Merge stderr to stdout
+                                                     text=True, bufsize=1, universal_newlines=True,
+                                                     shell=True, executable='tcsh', cwd=git_pull_dir) 
+                        output_reader = threading.Thread(target=pump_msim_output, args=(process_msim, shard_run), daemon=True, name=f"msim-output-{job_id[:8]}-{shard_run['label']}")
+                        output_reader.start()
+                        usage_sampler = ChildUsageSampler(process_msim.pid, f"child-usage-{job_id[:8]}-{shard_run['label']}").start()
+                        phase_processes.append((shard_run, process_msim, output_reader, usage_sampler))
+                    msim_processes.extend(phase_processes)
+
+                    for shard_run, process_msim, output_reader, usage_sampler in phase_processes:
+                        output_reader.join()
+                        shard_run['returncode'], msim_rusage = wait_with_rusage(process_msim)
+                        shard_run_usage = child_usage_record(msim_rusage, usage_sampler.stop(), time.perf_counter() - shard_run['started_perf'])
+                        record_child_usage(job_id, "msim", shard_run_usage, label=shard_run['label'] if len(msim_shard_runs) > 1 else None)
+                        add_output_line_to_job(job_id, f"{shard_run['output_prefix']}MSIM resource usage: {child_usage_text(shard_run_usage)}")
+                        # Shell setup (cshrc, icenv, module load) and msim itself as consecutive spans on the shard's own track
+                        msim_started_perf = shard_run.get('msim_started_perf', shard_run['started_perf']); finished_perf = time.perf_counter()
+                        record_job_span(job_id, "shell_setup", shard_run['started_at'], msim_started_perf - shard_run['started_perf'], lane=f"msim {shard_run['label']}")
+                        record_job_span(job_id, "msim", shard_run['started_at'] + (msim_started_perf - shard_run['started_perf']), finished_perf - msim_started_perf,
+                                        lane=f"msim {shard_run['label']}", args={'regression': shard_run['regression'], 'cases': len(shard_run['case_ids']),
+                                                                                  'sim_only': shard_run['sim_only'], 'returncode': shard_run['returncode'], **shard_run_usage})
+                        # stderr is merged.
+                        if len(msim_shard_runs) > 1:
+                            add_output_line_to_job(job_id, f"{shard_run['output_prefix']}MSIM {'build run' if shard_run['phase'] == 0 else ('shard' if len(msim_shard_runs) > 2 else 'run')} exited with return code {shard_run['returncode']}.")
+                        if shard_run.get('compiles_claim'): # Release waiting jobs as soon as the shared build exists
+                            build_run_succeeded = shard_run['returncode'] == 0 or any(case_id in JOB_RUNTIME_PLANS[job_id]['finished_at'] for case_id in shard_run['case_ids'])
+                            BUILD_COORDINATOR.finish(build_claim, build_run_succeeded, memo_head_commit)
+                process_return_code = next((shard_run['returncode'] for shard_run in msim_shard_runs if shard_run['returncode'] != 0), 0)
 
                 final_status_key_msim = "completed" if process_return_code == 0 else "failed"
-                final_status_message_msim = f"MSIM run {'completed successfully' if process_return_code == 0 else f'failed with return code {process_return_code}'}."
+                if not msim_shard_runs:
+                    final_status_message_msim = f"MSIM skipped: {len(memoized_results)} case(s) served from the result memo."
+                elif len(msim_shard_runs) > 1:
+                    failed_shard_codes = ", ".join(f"{shard_run['label']}={shard_run['returncode']}" for shard_run in msim_shard_runs if shard_run['returncode'] != 0)
+                    simulation_run_count = sum(1 for shard_run in msim_shard_runs if shard_run['phase'] > 0)
+                    final_status_message_msim = f"MSIM run ({f'{simulation_run_count} shards' if simulation_run_count > 1 else 'one simulation run'}{' after a build run' if split_build_run else ''}) {'completed successfully' if process_return_code == 0 else f'failed (return codes: {failed_shard_codes})'}."
+                else:
+                    final_status_message_msim = f"MSIM run {'completed successfully' if process_return_code == 0 else f'failed with return code {process_return_code}'}."
                 update_job_status(job_id, final_status_key_msim, final_status_message_msim, returncode=process_return_code)
                 add_output_line_to_job(job_id, final_status_message_msim)
                 if rerun_log_file_handle: rerun_log_file_handle.write(f"INFO: {final_status_message_msim}\n")
@@ -800,69 +2351,85 @@ def long_running_rerun_task(job_id, options, current_app_logger, actual_flask_ap
                 logger_to_use_start.error(f"Job {job_id}: {error_message_exc_msim}", exc_info=True)
                 update_job_status(job_id, "failed", error_message_exc_msim)
                 return # Exit task
+            finally:
+                for shard_run, process_msim, output_reader, usage_sampler in msim_processes:
+                    usage_sampler.stop()
+                    if process_msim.poll() is None: process_msim.kill() # Another shard failed to start; do not leave this one running
+                ADMISSION.release(job_id) # Licenses are free once msim has exited; parsing needs none
+                if JOB_RUNTIME_PLANS[job_id].get('build_work_area'): BUILD_COORDINATOR.release_use(JOB_RUNTIME_PLANS[job_id]['build_work_area'], job_id) # Its simv may be rebuilt now
+                for sim_dir_watcher in sim_dir_watchers: sim_dir_watcher.stop()
+                if sim_dir_watchers:
+                    add_output_line_to_job(job_id, f"Live sim-directory watcher ({', '.join(sorted({w.mode or 'not started' for w in sim_dir_watchers}))}) resolved {len(live_results_by_case_id)} case(s) before MSIM exited.")
+                if report_publisher: report_publisher.close()
 
             # --- Stage 4: Post MSIM processing ---
+            begin_job_stage(job_id, "parse_results")
             # Isolate MSIM-specific stdout for parsing
             msim_specific_output_lines = JOB_STATUS[job_id].get("output_lines", [])[msim_stdout_start_index:]
             full_msim_stdout_for_parsing = "\n".join(msim_specific_output_lines)
             
             proj_root_dir_for_logs = project_root_for_icenv # This is git_pull_dir
-            actual_sim_root_for_parsing = None; base_log_path_for_html = None; log_path_error = False
-
-            if not proj_root_dir_for_logs: # Should not happen if we reached here
-                add_output_line_to_job(job_id, "CRITICAL Error: Project root not available for log parsing (post-msim).")
-                log_path_error = True
-            else:
-                vcs_context_from_client_for_log_parsing = options.get('vcsContext', '')
-                vcs_context_basename = os.path.basename(vcs_context_from_client_for_log_parsing) if vcs_context_from_client_for_log_parsing else ""
-                if not vcs_context_basename: # Fallback to deriving from branchPath if vcsContext is empty
-                    current_full_branch_path_for_log_parsing = options.get('branchPath', '') # This is the original branchPath from client
-                    if current_full_branch_path_for_log_parsing:
-                        vcs_context_basename = os.path.basename(current_full_branch_path_for_log_parsing)
-                
-                if not vcs_context_basename: # If still no vcs_context_basename
-                    add_output_line_to_job(job_id, "Warning: Could not determine vcs_context_basename for log path construction.")
-                    log_path_error = True
+            # Sim roots / HTML log bases / vcs_context_basename were derived per shard before msim started
+            detailed_results = []; fresh_case_ids = set()
+            for shard_run in msim_shard_runs:
+                if shard_run.get('compile_only'):
+                    continue # Compiled only; its cases are simulated by the shards
+                if not shard_run['log_path_error']:
+                    add_output_line_to_job(job_id, f"  {shard_run['output_prefix']}Final calculated absolute sim root for parsing (post-msim): {shard_run['sim_root']}")
+                    add_output_line_to_job(job_id, f"  {shard_run['output_prefix']}Final calculated base relative path for HTML logs (post-msim): {shard_run['base_log_path_for_html']}")
+
+                # Use full_msim_stdout_for_parsing which contains only MSIM output
+                if shard_run['log_path_error'] or not shard_run['sim_root'] or not os.path.isdir(shard_run['sim_root']):
+                     add_output_line_to_job(job_id, f"{shard_run['output_prefix']}Warning: Log path error or invalid sim root. Parsing MSIM stdout without specific log file checks.")
+                     with job_span(job_id, "parse_msim_output_for_test_statuses", shard=shard_run['label'], cases=len(shard_run['case_ids'])):
+                         shard_results = parse_msim_output_for_test_statuses(full_msim_stdout_for_parsing, shard_run['case_ids'], None, None, job_id)
                 else:
-                    # final_msim_dir_option is determined earlier in the function
-                    if final_msim_dir_option:
-                        actual_sim_root_for_parsing = os.path.join(proj_root_dir_for_logs, "work", final_msim_dir_option, vcs_context_basename, "sim")
-                        base_log_path_for_html = os.path.join("work", final_msim_dir_option, vcs_context_basename)
-                    else: # Fallback if -dir was not used or derived
-                        current_full_branch_path_for_log_parsing = options.get('branchPath', '')
-                        extracted_branch_suffix = ""
-                        if "work/" in current_full_branch_path_for_log_parsing:
-                            extracted_branch_suffix = current_full_branch_path_for_log_parsing.split("work/", 1)[1]
-                        
-                        if not extracted_branch_suffix:
-                            add_output_line_to_job(job_id, "Warning: Could not extract branch suffix from branchPath for log path construction.")
-                            log_path_error = True
-                        else:
-                            actual_sim_root_for_parsing = os.path.join(proj_root_dir_for_logs, "work", extracted_branch_suffix, "sim")
-                            base_log_path_for_html = os.path.join("work", extracted_branch_suffix)
-
-            if not log_path_error:
-                add_output_line_to_job(job_id, f"  Final calculated absolute sim root for parsing (post-msim): {actual_sim_root_for_parsing}")
-                add_output_line_to_job(job_id, f"  Final calculated base relative path for HTML logs (post-msim): {base_log_path_for_html}")
-
-            # Use full_msim_stdout_for_parsing which contains only MSIM output
-            if log_path_error or not actual_sim_root_for_parsing or not os.path.isdir(actual_sim_root_for_parsing):
-                 add_output_line_to_job(job_id, "Warning: Log path error or invalid sim root. Parsing MSIM stdout without specific log file checks.")
-                 detailed_results = parse_msim_output_for_test_statuses(full_msim_stdout_for_parsing, options.get('selectedCases', []), None, None, job_id)
-            else:
-                detailed_results = parse_msim_output_for_test_statuses(full_msim_stdout_for_parsing, options.get('selectedCases', []), actual_sim_root_for_parsing, base_log_path_for_html, job_id)
+                    with job_span(job_id, "parse_msim_output_for_test_statuses", shard=shard_run['label'], cases=len(shard_run['case_ids'])):
+                        shard_results = parse_msim_output_for_test_statuses(full_msim_stdout_for_parsing, shard_run['case_ids'], shard_run['sim_root'], shard_run['base_log_path_for_html'], job_id)
+                detailed_results.extend(shard_results)
+                fresh_case_ids.update(result['id'] for result in shard_results
+                                      if result_is_from_run(result, shard_run.get('started_at'), JOB_RUNTIME_PLANS[job_id]['finished_at']))
+                # A compile that let cases of this run reach a verdict succeeded, even if msim exits non-zero for failing tests
+                shard_build_succeeded = shard_run.get('returncode') == 0 or any(result['status'] in ("PASSED", "FAILED") and result['id'] in fresh_case_ids for result in shard_results)
+                if not shard_run['sim_only'] and shard_build_succeeded and build_source_fingerprint and shard_run['work_area']:
+                    if build_claim: BUILD_COORDINATOR.finish(build_claim, True, memo_head_commit) # No-op if the BUILD run already released it
+                    else: BUILD_STATE.record(shard_run['work_area'], shard_run['build_modes'], build_source_fingerprint, compile_options_fingerprint, memo_head_commit)
+                    add_output_line_to_job(job_id, f"{shard_run['output_prefix']}Recorded build state for {shard_run['work_area']}.")
             
+            if memo_head_commit and memo_tree_clean and memo_keys_by_case_id: # Memoize passes of this run only (tree was clean at msim start)
+                RESULT_MEMO.store({memo_keys_by_case_id[result['id']]: result for result in detailed_results
+                                   if result.get('status') == "PASSED" and result['id'] in memo_keys_by_case_id and result['id'] in fresh_case_ids}, memo_head_commit)
+            detailed_results = memoized_results + detailed_results
             JOB_STATUS[job_id]['detailed_test_results'] = detailed_results
             add_output_line_to_job(job_id, f"Final detailed test results (post-msim): {detailed_results}")
 
+            # Feed the runtime history: run-directory timing where available, else [TEST_DONE] arrival
+            runtime_plan = JOB_RUNTIME_PLANS.get(job_id, {})
+            measured_seconds_by_case_id = {}
+            for result in detailed_results:
+                if result.get('status') not in ("PASSED", "FAILED") or result.get('memoized_from_commit'): continue
+                measured_seconds = None
+                if result.get('new_log_path') and project_root_for_icenv:
+                    measured_seconds = case_run_duration_seconds(os.path.join(project_root_for_icenv, os.path.dirname(result['new_log_path'])))
+                if measured_seconds is None and runtime_plan.get('started_at') and result['id'] in runtime_plan.get('finished_at', {}):
+                    measured_seconds = runtime_plan['finished_at'][result['id']] - runtime_plan['started_at'] # Upper bound: includes build and queueing
+                if measured_seconds is not None: measured_seconds_by_case_id[result['id']] = measured_seconds
+            RUNTIME_HISTORY.record(measured_seconds_by_case_id)
+            if measured_seconds_by_case_id: add_output_line_to_job(job_id, f"Recorded runtimes for {len(measured_seconds_by_case_id)} case(s) in the runtime history.")
+
             # Update HTML report on disk
+            begin_job_stage(job_id, "report_update")
             if detailed_results and (JOB_STATUS[job_id]['status'] == "completed" or JOB_STATUS[job_id]['status'] == "failed"):
                 # html_report_actual_path is already defined at the top of the function
                 if html_report_actual_path: # Use the path determined at the start
-                    msg_html_update = f"Attempting to update HTML report on disk at: {html_report_actual_path}"
+                    # Results already published live with the same values are not written again
+                    results_to_write = report_publisher.unpublished(detailed_results) if report_publisher else detailed_results
+                    msg_html_update = f"Attempting to update HTML report on disk at: {html_report_actual_path} ({len(results_to_write)} of {len(detailed_results)} result(s) not yet published)"
                     add_output_line_to_job(job_id, msg_html_update)
                     if rerun_log_file_handle: rerun_log_file_handle.write(f"INFO: {msg_html_update}\n")
-                    update_html_report_on_disk(html_report_actual_path, detailed_results, job_id, project_root_for_icenv, None, derived_ip_name, logger_to_use_start)
+                    if results_to_write:
+                        with job_span(job_id, "update_html_report_on_disk", results=len(results_to_write)):
+                            update_html_report_on_disk(html_report_actual_path, results_to_write, job_id, project_root_for_icenv, None, derived_ip_name, logger_to_use_start)
                 else:
                     # This block for fallback might be less relevant if html_report_actual_path is robustly obtained
                     msg_html_warn_fallback = "Warning: 'html_report_actual_path' was not available. Cannot update HTML report on disk."
@@ -871,6 +2438,7 @@ def long_running_rerun_task(job_id, options, current_app_logger, actual_flask_ap
                     logger_to_use_start.warning(f"Job {job_id}: {msg_html_warn_fallback}")
             
             # --- Requirement 2: Log total HTML stats to rerun.log ---
+            begin_job_stage(job_id, "report_stats")
             if rerun_log_file_handle and html_report_actual_path and os.path.exists(html_report_actual_path):
                 rerun_log_file_handle.write("\nINFO: Calculating total HTML report statistics...\n")
                 total_stats = calculate_total_stats_from_html(html_report_actual_path, job_id, logger_to_use_start)
@@ -886,12 +2454,13 @@ def long_running_rerun_task(job_id, options, current_app_logger, actual_flask_ap
                 else:
                     rerun_log_file_handle.write("ERROR: Failed to calculate total HTML report statistics.\n")
 
-            if not log_path_error and proj_root_dir_for_logs and final_msim_dir_option and vcs_context_basename:
-                rerun_output_base_abs = os.path.join(proj_root_dir_for_logs, "work", final_msim_dir_option, vcs_context_basename)
-                find_primary_log_for_rerun(rerun_output_base_abs) 
-            elif not log_path_error and proj_root_dir_for_logs and base_log_path_for_html and not final_msim_dir_option :
-                rerun_output_base_abs_fallback = os.path.join(proj_root_dir_for_logs, base_log_path_for_html)
-                find_primary_log_for_rerun(rerun_output_base_abs_fallback)
+            for shard_run in msim_shard_runs:
+                if not shard_run['log_path_error'] and proj_root_dir_for_logs and shard_run['dir_option'] and vcs_context_basename:
+                    rerun_output_base_abs = os.path.join(proj_root_dir_for_logs, "work", shard_run['dir_option'], vcs_context_basename)
+                    find_primary_log_for_rerun(rerun_output_base_abs) 
+                elif not shard_run['log_path_error'] and proj_root_dir_for_logs and shard_run['base_log_path_for_html'] and not shard_run['dir_option']:
+                    rerun_output_base_abs_fallback = os.path.join(proj_root_dir_for_logs, shard_run['base_log_path_for_html'])
+                    find_primary_log_for_rerun(rerun_output_base_abs_fallback)
 
     except Exception as e_very_outer:
         error_message_top = f"CRITICAL UNCAUGHT EXCEPTION IN TASK {job_id}: {str(e_very_outer)}"
@@ -919,10 +2488,19 @@ def long_running_rerun_task(job_id, options, current_app_logger, actual_flask_ap
             print(f"[THREAD_DEBUG] job_id: {job_id} - Failed to log final error using app logger: {str(e_log_final)}")
     finally:
         print(f"[THREAD_DEBUG] long_running_rerun_task finished or exited for job_id: {job_id} at {time.strftime('%Y-%m-%d %H:%M:%S')}")
+        unfinished_build_claim = JOB_RUNTIME_PLANS.get(job_id, {}).get('build_claim')
+        if unfinished_build_claim: BUILD_COORDINATOR.finish(unfinished_build_claim, False) # Waiting jobs must not wait on a job that is gone
+        if JOB_RUNTIME_PLANS.get(job_id, {}).get('build_work_area'): BUILD_COORDINATOR.release_use(JOB_RUNTIME_PLANS[job_id]['build_work_area'], job_id)
+        if JOB_RUNTIME_PLANS.get(job_id, {}).get('admission_requested'): ADMISSION.release(job_id)
+        JOB_RUNTIME_PLANS.pop(job_id, None)
+        for generated_rerun_hjson_path in generated_rerun_hjson_paths:
+            with contextlib.suppress(OSError): os.remove(generated_rerun_hjson_path)
+        end_job_stage(job_id)
         
         # --- Prepare Rerun Job Summary for HTML Terminal ---
         final_job_status_info = JOB_STATUS.get(job_id, {})
         overall_job_status_str = final_job_status_info.get('status', 'unknown').upper()
+        METRICS.inc('live_report_jobs_finished_total', status=final_job_status_info.get('status', 'unknown'))
         
         # Calculate stats for *rerun cases*
         rerun_stats = {'total': 0, 'passed': 0, 'failed': 0, 'killed': 0, 'other': 0}
@@ -946,6 +2524,10 @@ def long_running_rerun_task(job_id, options, current_app_logger, actual_flask_ap
         log_closed_successfully = False
         if rerun_log_file_handle:
             try:
+                stage_timings_text = job_stage_timings_text(job_id)
+                if stage_timings_text: rerun_log_file_handle.write(f"INFO: Stage timings: {stage_timings_text} (full trace: /rerun_trace/{job_id})\n")
+                for usage_key, usage in final_job_status_info.get('resource_usage', {}).items():
+                    rerun_log_file_handle.write(f"INFO: Resource usage, {usage_key}: {child_usage_text(usage)}\n")
                 rerun_log_file_handle.write(f"{'='*20} Rerun Job Log Ended: {job_id} at {time.strftime('%Y-%m-%d %H:%M:%S')} {'='*20}\n\n")
                 rerun_log_file_handle.close()
                 log_closed_successfully = True
@@ -968,6 +2550,10 @@ def long_running_rerun_task(job_id, options, current_app_logger, actual_flask_ap
         add_output_line_to_job(job_id, f"Failed        : {rerun_stats['failed']}")
         add_output_line_to_job(job_id, f"Killed        : {rerun_stats['killed']}") # Will be 0 if not explicitly set
         add_output_line_to_job(job_id, f"Other/Unknown : {rerun_stats['other']}")
+        msim_usages = [usage for usage_key, usage in final_job_status_info.get('resource_usage', {}).items() if usage_key.split(' ', 1)[0] == "msim"]
+        if any('cpu_user_seconds' in usage for usage in msim_usages):
+            add_output_line_to_job(job_id, f"MSIM CPU      : {sum(usage.get('cpu_user_seconds', 0) + usage.get('cpu_system_seconds', 0) for usage in msim_usages):.1f}s"
+                                            f" over {len(msim_usages)} process tree(s), largest max RSS {max(usage.get('max_rss_bytes', 0) for usage in msim_usages) / (1024 * 1024):.0f} MB")
 
         rerun_log_path_message = "Not generated (HTML report path likely missing or invalid)."
         if rerun_log_path:
@@ -990,8 +2576,578 @@ def long_running_rerun_task(job_id, options, current_app_logger, actual_flask_ap
             print(f"[THREAD_DEBUG] job_id: {job_id} - Failed to log task exit using app logger: {str(e_log_exit)}")
 
 
+# --- Streaming detailedStatusTable scanner / row patcher ---
+# Reports are generated HTML with one <tr> per case in table#detailedStatusTable. Rather than
+# building a DOM, the file is tokenized once: text outside the table's rows is copied through
+# untouched and only rows of interest are parsed (and optionally rewritten). Memory is bounded
+# by the read chunk plus the largest single row.
+REPORT_SCAN_CHUNK_CHARS = 1024 * 1024
+_DETAILED_TABLE_OPEN_RE = re.compile(r"""<table\b[^>]*\bid\s*=\s*["']?detailedStatusTable["'\s>/]""", re.IGNORECASE)
+_DETAILED_TABLE_OPEN_TAIL_CHARS = 512 # Enough to hold a partially read <table ...> start tag
+_TABLE_TOKEN_START_RE = re.compile(r"<!--|<tr\b|</table\s*>", re.IGNORECASE)
+_TR_CLOSE_RE = re.compile(r"</tr\s*>", re.IGNORECASE)
+_TD_CELL_RE = re.compile(r"(<td\b[^>]*>)(.*?)(</td\s*>)", re.IGNORECASE | re.DOTALL)
+_RERUN_CHECKBOX_RE = re.compile(r"""<input\b[^>]*\bclass\s*=\s*["'][^"']*\brerun-checkbox\b[^>]*>""", re.IGNORECASE)
+_DATA_CASENAME_RE = re.compile(r"""\bdata-casename\s*=\s*(?:"([^"]*)"|'([^']*)')""", re.IGNORECASE)
+_DATA_SEED_RE = re.compile(r"""\bdata-seed\s*=\s*(?:"([^"]*)"|'([^']*)')""", re.IGNORECASE)
+_CLASS_ATTR_RE = re.compile(r"""\bclass\s*=\s*(?:"[^"]*"|'[^']*'|[^\s>]+)""", re.IGNORECASE)
+_CLASS_ATTR_VALUE_RE = re.compile(r"""\bclass\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s>]+))""", re.IGNORECASE)
+_CODE_TAG_RE = re.compile(r"(<code\b[^>]*>)(.*?)(</code\s*>)", re.IGNORECASE | re.DOTALL)
+_HTML_TAG_RE = re.compile(r"<[^>]*>")
+_JOB_NAME_SEED_RE = re.compile(r"^(.*?)\s*\(\s*Seed\s*:\s*(\d+)\s*\)$")
+
+def _html_cell_text(cell_inner_html):
+    return html.unescape(_HTML_TAG_RE.sub("", cell_inner_html)).strip()
+
+def _report_row_case_id(row_html, td_matches):
+    # '<base>_seed<seed>' from the rerun-checkbox data attributes, else from the job-name cell
+    checkbox_match = _RERUN_CHECKBOX_RE.search(row_html)
+    if checkbox_match:
+        casename_match = _DATA_CASENAME_RE.search(checkbox_match.group(0)); seed_match = _DATA_SEED_RE.search(checkbox_match.group(0))
+        if casename_match and seed_match:
+            base_name = html.unescape(casename_match.group(1) if casename_match.group(1) is not None else casename_match.group(2)).strip()
+            seed = html.unescape(seed_match.group(1) if seed_match.group(1) is not None else seed_match.group(2)).strip()
+            return f"{base_name}_seed{seed}"
+    if td_matches:
+        match = _JOB_NAME_SEED_RE.match(_html_cell_text(td_matches[0].group(2)))
+        if match: return f"{match.group(1).strip()}_seed{match.group(2).strip()}"
+    return None
+
+def _status_code_for_result(result_status):
+    res_status_upper = (result_status or '').upper()
+    if res_status_upper == 'PASSED': return 'P'
+    if res_status_upper == 'FAILED': return 'F'
+    return res_status_upper[0] if res_status_upper else 'U'
+
+def _set_class_attr(start_tag, class_value):
+    if _CLASS_ATTR_RE.search(start_tag): return _CLASS_ATTR_RE.sub(lambda m: f'class="{class_value}"', start_tag, count=1)
+    return re.sub(r"\s*/?>$", lambda m: f' class="{class_value}"' + m.group(0).lstrip(), start_tag, count=1)
+
+def _row_values_for_result(result):
+    # Cell values a rerun result puts in its report row (also what the sidecar store records)
+    return {'status': _status_code_for_result(result.get('status')),
+            'pass_rate': '100%' if (result.get('status') or '').upper() == 'PASSED' else '0%',
+            'log_path': result.get('new_log_path') or '',
+            'error_hint': result.get('error_hint') or ''}
+
+def _patch_report_row(row_html, td_matches, result):
+    # Rewrites the status, pass-rate, log-path and error-hint cells; every other byte is kept.
+    row_values = _row_values_for_result(result)
+    replacements = {
+        1: (_set_class_attr(td_matches[1].group(1), f"status-{row_values['status'].upper()}"), row_values['status']),
+        2: (td_matches[2].group(1), row_values['pass_rate']),
+        4: (td_matches[4].group(1), html.escape(row_values['error_hint'], quote=False)),
+    }
+    new_log_path_escaped = html.escape(row_values['log_path'], quote=False)
+    log_cell_inner = td_matches[3].group(2)
+    if _CODE_TAG_RE.search(log_cell_inner):
+        log_cell_inner = _CODE_TAG_RE.sub(lambda m: m.group(1) + new_log_path_escaped + m.group(3), log_cell_inner, count=1)
+    else: log_cell_inner = new_log_path_escaped # Fallback
+    replacements[3] = (td_matches[3].group(1), log_cell_inner)
+    pieces = []; cursor = 0
+    for cell_index in sorted(replacements):
+        td_match = td_matches[cell_index]; new_start_tag, new_inner = replacements[cell_index]
+        pieces.append(row_html[cursor:td_match.start()])
+        pieces.append(new_start_tag + new_inner + td_match.group(3))
+        cursor = td_match.end()
+    pieces.append(row_html[cursor:])
+    return "".join(pieces)
+
+_KNOWN_STATUS_CLASS_VALUES = ['P', 'F', 'K', 'U', 'PASSED', 'FAILED', 'KILLED', 'UNKNOWN']
+
+def extract_report_row_record(row_html):
+    """
+    Returns {'case_id', 'status', 'pass_rate', 'log_path', 'error_hint'} for a case row of
+    detailedStatusTable, or None for header/summary rows. Status is the single-letter code.
+    """
+    td_matches = list(_TD_CELL_RE.finditer(row_html))
+    if len(td_matches) < 5: return None
+    case_id = _report_row_case_id(row_html, td_matches)
+    if case_id is None: return None # e.g. the 'Total Run Jobs' summary row
+    status_text = _html_cell_text(td_matches[1].group(2)).upper()
+    class_match = _CLASS_ATTR_VALUE_RE.search(td_matches[1].group(1))
+    if class_match:
+        class_value = next(group for group in class_match.groups() if group is not None)
+        for cls in class_value.split():
+            if cls.startswith('status-') and cls.split('-', 1)[1].upper() in _KNOWN_STATUS_CLASS_VALUES:
+                status_text = cls.split('-', 1)[1].upper(); break
+    log_cell_inner = td_matches[3].group(2)
+    code_match = _CODE_TAG_RE.search(log_cell_inner)
+    return {'case_id': case_id,
+            'status': _status_code_for_result(status_text) if status_text else 'U',
+            'pass_rate': _html_cell_text(td_matches[2].group(2)),
+            'log_path': _html_cell_text(code_match.group(2) if code_match else log_cell_inner),
+            'error_hint': _html_cell_text(td_matches[4].group(2))}
+
+def scan_detailed_status_table(read_chunk, write_text, row_callback):
+    """
+    Tokenizes a report once. read_chunk() returns the next text chunk ('' at EOF), write_text()
+    receives the (possibly patched) document in order, and row_callback(row_html) is invoked for
+    each <tr> of table#detailedStatusTable and returns replacement text or None to keep it.
+    """
+    buffer = ""; state = 'before_table'; at_eof = False
+    while True:
+        if not at_eof:
+            chunk = read_chunk()
+            if chunk: buffer += chunk
+            else: at_eof = True
+        if state == 'before_table':
+            table_match = _DETAILED_TABLE_OPEN_RE.search(buffer)
+            if table_match:
+                table_start_tag_end = buffer.find('>', table_match.start())
+                if table_start_tag_end != -1:
+                    write_text(buffer[:table_start_tag_end + 1]); buffer = buffer[table_start_tag_end + 1:]; state = 'in_table'
+            if state == 'before_table':
+                if at_eof: write_text(buffer); return
+                keep_from = max(0, len(buffer) - _DETAILED_TABLE_OPEN_TAIL_CHARS)
+                write_text(buffer[:keep_from]); buffer = buffer[keep_from:]
+                continue
+        if state == 'in_table':
+            position = 0; need_more_input = False
+            while True:
+                token_match = _TABLE_TOKEN_START_RE.search(buffer, position)
+                if not token_match:
+                    # Hold back a few chars in case a token start is split across chunks
+                    keep_from = len(buffer) if at_eof else max(position, len(buffer) - 16)
+                    write_text(buffer[position:keep_from]); position = keep_from; need_more_input = True
+                    break
+                token = token_match.group(0).lower()
+                if token == '<!--':
+                    comment_end = buffer.find('-->', token_match.end())
+                    if comment_end == -1: need_more_input = True; break
+                    write_text(buffer[position:comment_end + 3]); position = comment_end + 3
+                elif token.startswith('<tr'):
+                    row_close_match = _TR_CLOSE_RE.search(buffer, token_match.end())
+                    if not row_close_match: need_more_input = True; break
+                    write_text(buffer[position:token_match.start()])
+                    row_html = buffer[token_match.start():row_close_match.end()]
+                    replacement = row_callback(row_html)
+                    write_text(row_html if replacement is None else replacement)
+                    position = row_close_match.end()
+                else: # </table>
+                    write_text(buffer[position:token_match.end()]); position = token_match.end()
+                    state = 'after_table'
+                    break
+            if need_more_input and at_eof:
+                write_text(buffer[position:]); return # Unterminated row/comment: copy through as-is
+            if need_more_input:
+                buffer = buffer[position:]
+                continue
+            buffer = buffer[position:]
+        if state == 'after_table':
+            write_text(buffer); buffer = ""
+            while True:
+                chunk = read_chunk()
+                if not chunk: return
+                write_text(chunk)
+
+def patch_report_rows_streaming(html_file_path, results_by_case_id):
+    """
+    Rewrites only the rows whose case id is in results_by_case_id, copying everything else
+    byte-for-byte. Returns the set of case ids that were patched; the file is left untouched
+    when nothing matched.
+    """
+    patched_case_ids = set()
+    def row_callback(row_html):
+        td_matches = list(_TD_CELL_RE.finditer(row_html))
+        if len(td_matches) < 5: return None
+        case_id = _report_row_case_id(row_html, td_matches)
+        if case_id is None or case_id in patched_case_ids: return None # First matching row wins
+        result = results_by_case_id.get(case_id)
+        if result is None: return None
+        patched_case_ids.add(case_id)
+        return _patch_report_row(row_html, td_matches, result)
+
+    temp_fd, temp_output_path = tempfile.mkstemp(prefix=f".{os.path.basename(html_file_path)}.", suffix=".tmp", dir=os.path.dirname(os.path.abspath(html_file_path)))
+    try:
+        # surrogateescape + newline='' round-trips any bytes and line endings unchanged
+        with open(html_file_path, 'r', encoding='utf-8', errors='surrogateescape', newline='') as src, \
+             os.fdopen(temp_fd, 'w', encoding='utf-8', errors='surrogateescape', newline='') as dst:
+            scan_detailed_status_table(lambda: src.read(REPORT_SCAN_CHUNK_CHARS), dst.write, row_callback)
+            dst.flush(); os.fsync(dst.fileno()) # Data must be on disk before the rename makes it visible
+        if patched_case_ids:
+            shutil.copymode(html_file_path, temp_output_path)
+            os.replace(temp_output_path, html_file_path) # Readers see either the old or the new report, never a partial one
+    finally:
+        if os.path.exists(temp_output_path): os.remove(temp_output_path)
+    return patched_case_ids
+
+# --- Per-report writer: serialized, crash-safe and batched report mutations ---
+# All report rewrites go through one ReportWriter per report path. Batches submitted within
+# REPORT_WRITE_BATCH_WINDOW_SECONDS of each other are merged (later results for a case win) and
+# applied in a single rewrite, under an in-process lock plus an fcntl lock on '<report>.lock'
+# so other server processes updating the same report are serialized as well.
+REPORT_WRITE_BATCH_WINDOW_SECONDS = float(os.environ.get('LIVE_REPORT_WRITE_BATCH_WINDOW', '2.0'))
+_REPORT_WRITERS = {}
+_REPORT_WRITERS_LOCK = threading.Lock()
+
+@contextlib.contextmanager
+def _report_file_lock(html_file_path):
+    if fcntl is None: # Non-POSIX host: in-process serialization only
+        yield; return
+    with open(f"{html_file_path}.lock", 'a') as lock_file:
+        fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        try: yield
+        finally: fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+class ReportWriter:
+    def __init__(self, html_file_path):
+        self.html_file_path = html_file_path
+        self._pending_batches = []
+        self._pending_lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._flush_timer = None
+
+    def submit(self, results, job_id_for_logging=None, wait=True):
+        """
+        Queues results for the next batched rewrite. The returned batch dict carries a 'done'
+        Event, and once set, 'applied_case_ids' (cases present in the report) and 'error'
+        describe the outcome for these results.
+        """
+        batch = {'results': list(results), 'job_id': job_id_for_logging, 'done': threading.Event(), 'applied_case_ids': set(), 'error': None}
+        with self._pending_lock:
+            self._pending_batches.append(batch)
+            if self._flush_timer is None:
+                self._flush_timer = threading.Timer(REPORT_WRITE_BATCH_WINDOW_SECONDS, self._flush)
+                self._flush_timer.daemon = True; self._flush_timer.name = "report-write-flush"
+                self._flush_timer.start()
+        if wait: batch['done'].wait()
+        return batch
+
+    def _flush(self):
+        with self._pending_lock:
+            batches = self._pending_batches; self._pending_batches = []; self._flush_timer = None
+        if not batches: return
+        merged_results_by_case_id = {}
+        for batch in batches:
+            for result in batch['results']: merged_results_by_case_id[result['id']] = result
+        applied_case_ids = set(); flush_error = None; flush_started_perf = time.perf_counter()
+        with self._write_lock:
+            try:
+                with _report_file_lock(self.html_file_path):
+                    sidecar = ReportSidecar(self.html_file_path)
+                    with sidecar.connect() as conn:
+                        sidecar.ensure_synced(conn)
+                        conn.execute("BEGIN IMMEDIATE") # Keep sidecar readers from rebuilding while the HTML swap and counter deltas land
+                        # The sidecar says which cases exist and which rows would actually change
+                        existing_records = sidecar.fetch_records(conn, merged_results_by_case_id.keys())
+                        changed_results_by_case_id = {}
+                        for case_id, result in merged_results_by_case_id.items():
+                            if case_id not in existing_records: continue
+                            new_values = _row_values_for_result(result)
+                            if any(new_values[field] != existing_records[case_id][field] for field in new_values): changed_results_by_case_id[case_id] = result
+                        applied_case_ids = set(existing_records)
+                        if changed_results_by_case_id:
+                            patched_case_ids = patch_report_rows_streaming(self.html_file_path, changed_results_by_case_id)
+                            applied_case_ids -= set(changed_results_by_case_id) - patched_case_ids
+                            pre_write_stat_key = sidecar.synced_stat_key
+                            applied_results_by_case_id = {case_id: changed_results_by_case_id[case_id] for case_id in patched_case_ids}
+                            sidecar.apply_results(conn, applied_results_by_case_id, existing_records)
+                    if changed_results_by_case_id: # Committed: refresh the shared model so the next stats call is a lookup
+                        REPORT_MODEL_CACHE.refresh_after_write(self.html_file_path, pre_write_stat_key, applied_results_by_case_id, sidecar.synced_stat_key)
+            except Exception as e:
+                flush_error = e
+                print(f"Error writing report '{self.html_file_path}' ({len(batches)} batch(es), {len(merged_results_by_case_id)} case(s)): {e}")
+        METRICS.observe('live_report_report_write_seconds', time.perf_counter() - flush_started_perf)
+        for batch in batches:
+            batch['applied_case_ids'] = {result['id'] for result in batch['results'] if result['id'] in applied_case_ids}
+            batch['error'] = flush_error
+            batch['done'].set()
+
+def get_report_writer(html_file_path):
+    writer_key = os.path.realpath(html_file_path)
+    with _REPORT_WRITERS_LOCK:
+        writer = _REPORT_WRITERS.get(writer_key)
+        if writer is None:
+            writer = _REPORT_WRITERS[writer_key] = ReportWriter(writer_key)
+        return writer
+
+# --- Sidecar results store: one SQLite file next to each report ---
+# '<report>.results.sqlite' holds one record per case (status, pass rate, log path, hint) plus
+# per-status counters. It is rebuilt from the HTML with a single streaming scan whenever the
+# report's (inode, mtime, size) no longer matches what the sidecar was built from, and is
+# otherwise maintained in O(changed) by ReportWriter, so updates and stats never parse markup.
+# Failure-signature buckets (see failure_signature()) are kept the same way.
+REPORT_SIDECAR_SUFFIX = '.results.sqlite'
+_REPORT_SIDECAR_SCHEMA_VERSION = '2'
+_REPORT_SIDECAR_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS cases (case_id TEXT PRIMARY KEY, row_order INTEGER NOT NULL, status TEXT NOT NULL,"
+    " pass_rate TEXT, log_path TEXT, error_hint TEXT, signature TEXT NOT NULL DEFAULT '')",
+    "CREATE INDEX IF NOT EXISTS cases_by_signature ON cases (signature)",
+    "CREATE TABLE IF NOT EXISTS status_counters (status TEXT PRIMARY KEY, count INTEGER NOT NULL)",
+    "CREATE TABLE IF NOT EXISTS signature_counters (signature TEXT PRIMARY KEY, count INTEGER NOT NULL, sample_hint TEXT)",
+    "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)",
+)
+
+# --- Failure signatures: normalized error hints hashed into triage buckets ---
+_FAILURE_SIGNATURE_SCRUB_PATTERNS = [
+    (re.compile(r"\d{4}-\d{2}-\d{2}[ T_]\d{2}[:-]\d{2}[:-]\d{2}(?:[.-]\d+)?"), "<ts>"), # 2025-05-21_16-52-27-549608
+    (re.compile(r"\b\d{1,2}:\d{2}:\d{2}(?:\.\d+)?\b"), "<ts>"),
+    (re.compile(r"\b\d+(?:\.\d+)?\s*[fpnum]s\b", re.IGNORECASE), "<time>"), # @ 1234 ns
+    (re.compile(r"\b0x[0-9a-f_]+\b", re.IGNORECASE), "<hex>"),
+    (re.compile(r"\b\d*'[sS]?[hH][0-9a-fA-F_xXzZ]+"), "<hex>"), # Verilog 32'hdead_beef
+    (re.compile(r"\bseed\s*[:=]?\s*\d+", re.IGNORECASE), "seed=<seed>"),
+    (re.compile(r"[\w.-]*/[\w./-]+"), "<path>"),
+    (re.compile(r"\d+"), "<n>"),
+    (re.compile(r"\s+"), " "),
+]
+
+def normalize_failure_hint(error_hint):
+    normalized_hint = error_hint or ''
+    for pattern, replacement in _FAILURE_SIGNATURE_SCRUB_PATTERNS: normalized_hint = pattern.sub(replacement, normalized_hint)
+    return normalized_hint.strip()
+
+def failure_signature(status_code, error_hint):
+    # '' for passed cases and cases without a hint; otherwise a short hash of the normalized hint
+    if status_code == 'P' or not (error_hint or '').strip(): return ''
+    return hashlib.sha1(normalize_failure_hint(error_hint).encode('utf-8')).hexdigest()[:12]
+
+def _report_file_stat_key(html_file_path):
+    file_stat = os.stat(html_file_path)
+    return f"{file_stat.st_ino}:{file_stat.st_mtime_ns}:{file_stat.st_size}"
+
+class ReportSidecar:
+    def __init__(self, html_file_path):
+        self.html_file_path = html_file_path
+        self.sidecar_path = f"{html_file_path}{REPORT_SIDECAR_SUFFIX}"
+        self.synced_stat_key = None # Report stat key the store matched at the last sync/apply
+
+    @contextlib.contextmanager
+    def connect(self):
+        try: conn = sqlite3.connect(self.sidecar_path, timeout=300) # A writer may hold the lock for a whole report rewrite
+        except sqlite3.OperationalError as e: # Report directory not writable: keep a throwaway in-memory store
+            print(f"Warning: Cannot open sidecar store '{self.sidecar_path}' ({e}). Using an in-memory store.")
+            conn = sqlite3.connect(':memory:')
+        try:
+            schema_row = None
+            try: schema_row = conn.execute("SELECT value FROM meta WHERE key = 'schema_version'").fetchone()
+            except sqlite3.OperationalError: pass # New file
+            if not schema_row or schema_row[0] != _REPORT_SIDECAR_SCHEMA_VERSION: # Older layout: start over, it is rebuilt from the HTML
+                for table_name in ('cases', 'status_counters', 'signature_counters', 'meta'): conn.execute(f"DROP TABLE IF EXISTS {table_name}")
+                for statement in _REPORT_SIDECAR_SCHEMA: conn.execute(statement)
+                conn.execute("INSERT INTO meta VALUES ('schema_version', ?)", (_REPORT_SIDECAR_SCHEMA_VERSION,))
+                conn.commit()
+            yield conn
+            conn.commit()
+        except Exception:
+            conn.rollback(); raise
+        finally:
+            conn.close()
+
+    def ensure_synced(self, conn):
+        # Rebuilds from the HTML when the report changed behind our back (or on first use).
+        current_stat_key = _report_file_stat_key(self.html_file_path)
+        self.synced_stat_key = current_stat_key
+        stored = conn.execute("SELECT value FROM meta WHERE key = 'html_stat'").fetchone()
+        if stored and stored[0] == current_stat_key: return False
+        conn.execute("BEGIN IMMEDIATE")
+        stored = conn.execute("SELECT value FROM meta WHERE key = 'html_stat'").fetchone() # Another process may have rebuilt it
+        if stored and stored[0] == current_stat_key:
+            conn.commit(); return False
+        conn.execute("DELETE FROM cases"); conn.execute("DELETE FROM status_counters"); conn.execute("DELETE FROM signature_counters")
+        row_order = [0]; scan_started_perf = time.perf_counter()
+        def row_callback(row_html):
+            record = extract_report_row_record(row_html)
+            if record:
+                conn.execute("INSERT OR IGNORE INTO cases VALUES (?, ?, ?, ?, ?, ?, ?)", # First row for a case wins, as in the patcher
+                             (record['case_id'], row_order[0], record['status'], record['pass_rate'], record['log_path'], record['error_hint'],
+                              failure_signature(record['status'], record['error_hint'])))
+                row_order[0] += 1
+            return None
+        with open(self.html_file_path, 'r', encoding='utf-8', errors='surrogateescape', newline='') as src:
+            scan_detailed_status_table(lambda: src.read(REPORT_SCAN_CHUNK_CHARS), lambda text: None, row_callback)
+        conn.execute("INSERT INTO status_counters SELECT status, COUNT(*) FROM cases GROUP BY status")
+        conn.execute("INSERT INTO signature_counters SELECT signature, COUNT(*), MIN(error_hint) FROM cases WHERE signature != '' GROUP BY signature")
+        conn.execute("INSERT OR REPLACE INTO meta VALUES ('html_stat', ?)", (current_stat_key,))
+        conn.commit()
+        METRICS.observe('live_report_report_parse_seconds', time.perf_counter() - scan_started_perf, kind="html_scan")
+        return True
+
+    def fetch_records(self, conn, case_ids):
+        records = {}; case_ids = list(case_ids)
+        for batch_start in range(0, len(case_ids), 500): # Stay under SQLite's bound-parameter limit
+            id_batch = case_ids[batch_start:batch_start + 500]
+            placeholders = ",".join("?" * len(id_batch))
+            for case_id, status, pass_rate, log_path, error_hint, signature in conn.execute(
+                    f"SELECT case_id, status, pass_rate, log_path, error_hint, signature FROM cases WHERE case_id IN ({placeholders})", id_batch):
+                records[case_id] = {'status': status, 'pass_rate': pass_rate, 'log_path': log_path, 'error_hint': error_hint, 'signature': signature}
+        return records
+
+    def apply_results(self, conn, results_by_case_id, existing_records):
+        # Called after the HTML rewrite: updates changed records and adjusts counters by delta.
+        counter_deltas = {}; signature_deltas = {}; signature_samples = {}
+        for case_id, result in results_by_case_id.items():
+            new_values = _row_values_for_result(result); old_record = existing_records[case_id]
+            new_signature = failure_signature(new_values['status'], new_values['error_hint'])
+            conn.execute("UPDATE cases SET status = ?, pass_rate = ?, log_path = ?, error_hint = ?, signature = ? WHERE case_id = ?",
+                         (new_values['status'], new_values['pass_rate'], new_values['log_path'], new_values['error_hint'], new_signature, case_id))
+            if new_values['status'] != old_record['status']:
+                counter_deltas[old_record['status']] = counter_deltas.get(old_record['status'], 0) - 1
+                counter_deltas[new_values['status']] = counter_deltas.get(new_values['status'], 0) + 1
+            if new_signature != old_record['signature']:
+                if old_record['signature']: signature_deltas[old_record['signature']] = signature_deltas.get(old_record['signature'], 0) - 1
+                if new_signature:
+                    signature_deltas[new_signature] = signature_deltas.get(new_signature, 0) + 1
+                    signature_samples.setdefault(new_signature, new_values['error_hint'])
+        for status, delta in counter_deltas.items():
+            conn.execute("INSERT OR IGNORE INTO status_counters VALUES (?, 0)", (status,))
+            conn.execute("UPDATE status_counters SET count = count + ? WHERE status = ?", (delta, status))
+        for signature, delta in signature_deltas.items():
+            conn.execute("INSERT OR IGNORE INTO signature_counters VALUES (?, 0, ?)", (signature, signature_samples.get(signature)))
+            conn.execute("UPDATE signature_counters SET count = count + ? WHERE signature = ?", (delta, signature))
+        conn.execute("DELETE FROM signature_counters WHERE count <= 0")
+        self.synced_stat_key = _report_file_stat_key(self.html_file_path)
+        conn.execute("INSERT OR REPLACE INTO meta VALUES ('html_stat', ?)", (self.synced_stat_key,))
+
+    def get_status_counts(self):
+        with self.connect() as conn:
+            self.ensure_synced(conn)
+            return {status: count for status, count in conn.execute("SELECT status, count FROM status_counters") if count}
+
+    def load_model(self):
+        load_started_perf = time.perf_counter()
+        with self.connect() as conn:
+            self.ensure_synced(conn)
+            records = {}
+            for case_id, row_order, status, pass_rate, log_path, error_hint, signature in conn.execute(
+                    "SELECT case_id, row_order, status, pass_rate, log_path, error_hint, signature FROM cases ORDER BY row_order"):
+                records[case_id] = {'row_order': row_order, 'status': status, 'pass_rate': pass_rate, 'log_path': log_path,
+                                    'error_hint': error_hint, 'signature': signature}
+            status_counts = {status: count for status, count in conn.execute("SELECT status, count FROM status_counters") if count}
+            signature_buckets = {signature: {'count': count, 'sample_hint': sample_hint}
+                                 for signature, count, sample_hint in conn.execute("SELECT signature, count, sample_hint FROM signature_counters")}
+            report_model = ReportModel(self.html_file_path, self.synced_stat_key, records, status_counts, signature_buckets)
+        METRICS.observe('live_report_report_parse_seconds', time.perf_counter() - load_started_perf, kind="model_load")
+        return report_model
+
+# --- Process-wide cache of parsed report models ---
+# A ReportModel is the in-memory form of a report's sidecar (records by case id + status counts).
+# Models are cached per report path and valid only for the (inode, mtime, size) they were loaded
+# at; least-recently-used models are evicted once the estimated footprint exceeds the cap.
+REPORT_MODEL_CACHE_MAX_BYTES = int(os.environ.get('LIVE_REPORT_MODEL_CACHE_MAX_BYTES', str(256 * 1024 * 1024)))
+_REPORT_MODEL_RECORD_OVERHEAD_BYTES = 700 # Rough per-record cost of the dict, keys, str headers and row index slots
+
+class ReportModel:
+    def __init__(self, html_file_path, stat_key, records, status_counts, signature_buckets):
+        self.html_file_path = html_file_path
+        self.stat_key = stat_key
+        self.records = records # case_id -> {'row_order', 'status', 'pass_rate', 'log_path', 'error_hint', 'signature'}
+        self.status_counts = status_counts
+        self.signature_buckets = signature_buckets # signature -> {'count', 'sample_hint'}
+        self.approx_bytes = sum(len(case_id) + len(record['log_path'] or '') + len(record['error_hint'] or '') + _REPORT_MODEL_RECORD_OVERHEAD_BYTES
+                                for case_id, record in records.items())
+        self._row_index = None
+        self._row_index_lock = threading.Lock()
+
+    def stats(self):
+        return report_stats_from_status_counts(self.status_counts)
+
+    def row_index(self):
+        # Built lazily once per model: case ids in report order, per-status and per-signature
+        # buckets (report order) and a lowercase-sorted name list for prefix search.
+        with self._row_index_lock:
+            if self._row_index is None:
+                ordered_case_ids = sorted(self.records, key=lambda case_id: self.records[case_id]['row_order'])
+                status_buckets = {}; signature_buckets = {}
+                for case_id in ordered_case_ids:
+                    record = self.records[case_id]
+                    status_buckets.setdefault(record['status'], []).append(case_id)
+                    if record['signature']: signature_buckets.setdefault(record['signature'], []).append(case_id)
+                sorted_names = sorted((case_id.lower(), case_id) for case_id in ordered_case_ids)
+                self._row_index = {'ordered': ordered_case_ids, 'by_status': status_buckets, 'by_signature': signature_buckets,
+                                   'sorted_keys': [key for key, _ in sorted_names], 'sorted_ids': [case_id for _, case_id in sorted_names]}
+            return self._row_index
+
+    def query_rows(self, statuses=None, name_prefix=None, offset=0, limit=100):
+        """
+        Returns (matched_count, [case ids]) for one page. With a name prefix the matches are in
+        name order, otherwise in report order; statuses is a set of status codes or None.
+        """
+        row_index = self.row_index()
+        if name_prefix:
+            prefix_key = name_prefix.lower()
+            start = bisect.bisect_left(row_index['sorted_keys'], prefix_key)
+            end = bisect.bisect_left(row_index['sorted_keys'], prefix_key + '\uffff', start)
+            matched_case_ids = row_index['sorted_ids'][start:end]
+            if statuses: matched_case_ids = [case_id for case_id in matched_case_ids if self.records[case_id]['status'] in statuses]
+        elif statuses:
+            buckets = [row_index['by_status'].get(status, []) for status in statuses]
+            if len(buckets) == 1: matched_case_ids = buckets[0]
+            else: matched_case_ids = sorted((case_id for bucket in buckets for case_id in bucket), key=lambda case_id: self.records[case_id]['row_order'])
+        else:
+            matched_case_ids = row_index['ordered']
+        return len(matched_case_ids), matched_case_ids[offset:offset + limit]
+
+    def with_results(self, results_by_case_id, new_stat_key):
+        # New model with results applied; the cached one stays immutable for concurrent readers.
+        records = dict(self.records); status_counts = dict(self.status_counts)
+        signature_buckets = {signature: dict(bucket) for signature, bucket in self.signature_buckets.items()}
+        for case_id, result in results_by_case_id.items():
+            old_record = records.get(case_id)
+            if old_record is None: continue
+            new_record = dict(old_record, **_row_values_for_result(result))
+            new_record['signature'] = failure_signature(new_record['status'], new_record['error_hint'])
+            records[case_id] = new_record
+            status_counts[old_record['status']] = status_counts.get(old_record['status'], 0) - 1
+            status_counts[new_record['status']] = status_counts.get(new_record['status'], 0) + 1
+            if old_record['signature'] and old_record['signature'] in signature_buckets:
+                signature_buckets[old_record['signature']]['count'] -= 1
+            if new_record['signature']:
+                signature_buckets.setdefault(new_record['signature'], {'count': 0, 'sample_hint': new_record['error_hint']})['count'] += 1
+        return ReportModel(self.html_file_path, new_stat_key, records, {status: count for status, count in status_counts.items() if count},
+                           {signature: bucket for signature, bucket in signature_buckets.items() if bucket['count'] > 0})
+
+class ReportModelCache:
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._models = collections.OrderedDict() # realpath -> ReportModel, least recently used first
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, html_file_path, stat_key):
+        cache_key = os.path.realpath(html_file_path)
+        with self._lock:
+            model = self._models.get(cache_key)
+            if model is None or model.stat_key != stat_key: return None
+            self._models.move_to_end(cache_key)
+            return model
+
+    def put(self, model):
+        cache_key = os.path.realpath(model.html_file_path)
+        with self._lock:
+            old_model = self._models.pop(cache_key, None)
+            if old_model is not None: self._total_bytes -= old_model.approx_bytes
+            self._models[cache_key] = model; self._total_bytes += model.approx_bytes
+            while self._total_bytes > self.max_bytes and len(self._models) > 1:
+                _, evicted_model = self._models.popitem(last=False)
+                self._total_bytes -= evicted_model.approx_bytes
+
+    def refresh_after_write(self, html_file_path, pre_write_stat_key, applied_results_by_case_id, new_stat_key):
+        cached_model = self.get(html_file_path, pre_write_stat_key)
+        if cached_model is not None: self.put(cached_model.with_results(applied_results_by_case_id, new_stat_key))
+        else: self.put(ReportSidecar(html_file_path).load_model())
+
+REPORT_MODEL_CACHE = ReportModelCache(REPORT_MODEL_CACHE_MAX_BYTES)
+
+def get_report_model(html_file_path):
+    cached_model = REPORT_MODEL_CACHE.get(html_file_path, _report_file_stat_key(html_file_path))
+    if cached_model is not None: return cached_model
+    model = ReportSidecar(html_file_path).load_model()
+    REPORT_MODEL_CACHE.put(model)
+    return model
+
+def report_stats_from_status_counts(status_counts):
+    stats = {'total': 0, 'passed': 0, 'failed': 0, 'killed': 0, 'other': 0, 'pass_rate': 0.0}
+    for status, count in status_counts.items():
+        stats['total'] += count
+        if status == 'P': stats['passed'] += count
+        elif status == 'F': stats['failed'] += count
+        elif status == 'K': stats['killed'] += count
+        else: stats['other'] += count # Includes U and any other code
+    if stats['total'] > 0: stats['pass_rate'] = (stats['passed'] / stats['total']) * 100
+    return stats
+
 def update_html_report_on_disk(original_html_file_path, detailed_results, job_id_for_logging, project_root, original_dir, ip_name_for_report_path, logger_for_internal_errors):
-    # ... (function content as before) ...
     constructed_path = False
     if not original_html_file_path:
         if project_root and original_dir and ip_name_for_report_path:
@@ -1001,55 +3157,153 @@ def update_html_report_on_disk(original_html_file_path, detailed_results, job_id
         else: return False
     if not os.path.exists(original_html_file_path): return False
     try:
-        with open(original_html_file_path, 'r', encoding='utf-8') as f: soup = BeautifulSoup(f, 'html.parser')
-        table_body = soup.find('table', id='detailedStatusTable').find('tbody')
-        if not table_body: return False
-        rows_updated_count = 0
-        job_name_parse_regex_for_row = re.compile(r"^(.*?)\s*\(\s*Seed\s*:\s*(\d+)\s*\)$")
-        for result in detailed_results:
-            # ... (HTML row update logic as before) ...
-            result_id_from_server = result['id']
-            found_row_for_result = False
-            for row in table_body.find_all('tr'):
-                cells = row.find_all('td')
-                if not cells: continue
-                current_row_id = None
-                checkbox = row.find('input', class_='rerun-checkbox')
-                if checkbox and checkbox.has_attr('data-casename') and checkbox.has_attr('data-seed'):
-                    base_name = checkbox['data-casename'].strip(); seed = checkbox['data-seed'].strip()
-                    current_row_id = f"{base_name}_seed{seed}"
-                else:
-                    job_name_cell_text = cells[0].get_text(strip=True) if len(cells) > 0 else None
-                    if job_name_cell_text:
-                        match = job_name_parse_regex_for_row.match(job_name_cell_text)
-                        if match: base_name = match.group(1).strip(); seed = match.group(2).strip(); current_row_id = f"{base_name}_seed{seed}"
-                if current_row_id == result_id_from_server:
-                    if len(cells) >= 5:
-                        # ... (update status_cell, pass_rate_cell, log_path_cell, error_hint_cell) ...
-                        status_cell = cells[1]; res_status_upper = result['status'].upper()
-                        if res_status_upper == 'PASSED': status_cell.string = 'P'; status_cell['class'] = ['status-P']
-                        elif res_status_upper == 'FAILED': status_cell.string = 'F'; status_cell['class'] = ['status-F']
-                        # ... other statuses ...
-                        else: status_cell.string = res_status_upper[0] if res_status_upper else 'U'; status_cell['class'] = [f'status-{status_cell.string.upper()}']
-                        cells[2].string = '100%' if res_status_upper == 'PASSED' else '0%'
-                        code_tag = cells[3].find('code')
-                        if code_tag: code_tag.string = result['new_log_path']
-                        else: cells[3].string = result['new_log_path'] # Fallback
-                        cells[4].string = result['error_hint'] or ''
-                        rows_updated_count += 1; found_row_for_result = True; break
-            if not found_row_for_result: add_output_line_to_job(job_id_for_logging, f"Warning: Could not find matching row in HTML for test: {result_id_from_server}")
-        if rows_updated_count > 0:
-            with open(original_html_file_path, 'w', encoding='utf-8') as f: f.write(soup.prettify())
-            return True
-        return False
-    except ImportError: # ... (BeautifulSoup error handling) ...
-        return False
-    except Exception as e: # ... (generic error handling) ...
+        batch = get_report_writer(original_html_file_path).submit(detailed_results, job_id_for_logging)
+        if batch['error']: raise batch['error']
+        applied_case_ids = batch['applied_case_ids']
+        unmatched_result_ids = list(dict.fromkeys(result['id'] for result in detailed_results if result['id'] not in applied_case_ids))
+        if unmatched_result_ids:
+            add_output_line_to_job(job_id_for_logging, f"Warning: Could not find matching rows in HTML for {len(unmatched_result_ids)} test(s): {', '.join(unmatched_result_ids)}")
+        return len(applied_case_ids) > 0
+    except Exception as e:
+        error_msg = f"Error updating HTML report '{original_html_file_path}': {e}"
+        add_output_line_to_job(job_id_for_logging, error_msg)
+        if logger_for_internal_errors: logger_for_internal_errors.error(error_msg)
+        else: print(error_msg)
         return False
 
+# --- Incremental report publishing while a rerun is still running ---
+REPORT_PUBLISH_INTERVAL_SECONDS = float(os.environ.get('LIVE_REPORT_PUBLISH_INTERVAL', 30.0)) # <= 0 disables live publishing
+
+class IncrementalReportPublisher:
+    """
+    Applies per-case results to a report during a rerun, at most once per interval_seconds,
+    through the report's ReportWriter. add() only queues; close() stops publishing and waits
+    for a write in flight, after which unpublished() tells the final update what is left.
+    """
+    def __init__(self, html_file_path, job_id_for_logging, interval_seconds):
+        self.html_file_path = html_file_path
+        self.job_id = job_id_for_logging
+        self.interval_seconds = interval_seconds
+        self.published_count = 0
+        self._pending_results_by_case_id = {}
+        self._published_row_values = {} # case_id -> row values last written by this publisher
+        self._lock = threading.Lock()
+        self._publish_lock = threading.Lock()
+        self._timer = None
+        self._last_publish_time = 0.0
+        self._closed = False
+
+    def add(self, result):
+        with self._lock:
+            if self._closed: return
+            self._pending_results_by_case_id[result['id']] = result
+            if self._timer is None:
+                delay = max(0.0, self._last_publish_time + self.interval_seconds - time.time())
+                self._timer = threading.Timer(delay, self._publish)
+                self._timer.daemon = True; self._timer.name = f"report-publish-{str(self.job_id)[:8]}"
+                self._timer.start()
+
+    def _publish(self):
+        with self._publish_lock:
+            with self._lock:
+                results = list(self._pending_results_by_case_id.values()); self._pending_results_by_case_id = {}
+                self._timer = None; self._last_publish_time = time.time()
+                if self._closed or not results: return
+            with job_span(self.job_id, "publish_live_results", results=len(results)):
+                batch = get_report_writer(self.html_file_path).submit(results, self.job_id)
+            if batch['error']: # Left unpublished; the end-of-job update retries them
+                add_output_line_to_job(self.job_id, f"Warning: live report update failed for {len(results)} case(s): {batch['error']}")
+                return
+            with self._lock:
+                for result in results:
+                    if result['id'] in batch['applied_case_ids']: self._published_row_values[result['id']] = _row_values_for_result(result)
+                self.published_count = len(self._published_row_values)
+            add_output_line_to_job(self.job_id, f"[LIVE] Report updated with {len(batch['applied_case_ids'])} case(s) ({self.published_count} published so far).")
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+            if self._timer: self._timer.cancel(); self._timer = None
+        with self._publish_lock: pass # A publish already running finishes first
+
+    def unpublished(self, results):
+        with self._lock:
+            return [result for result in results if self._published_row_values.get(result['id']) != _row_values_for_result(result)]
+
+
+# --- Rerun request helpers: compressed bodies and server-side case selection ---
+REQUEST_BODY_MAX_DECOMPRESSED_BYTES = 64 * 1024 * 1024
+_SELECTION_KEYS = {'status', 'name', 'hint', 'seed_min', 'seed_max', 'signature', 'one_per_signature'}
+
+def read_request_json_body():
+    # JSON body of the current request; 'Content-Encoding: gzip' bodies are inflated (bounded).
+    if request.headers.get('Content-Encoding', '').strip().lower() != 'gzip':
+        return request.get_json()
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    try:
+        raw_body = decompressor.decompress(request.get_data(cache=False), REQUEST_BODY_MAX_DECOMPRESSED_BYTES + 1)
+    except zlib.error as e:
+        raise ValueError(f"Request body is not valid gzip: {e}")
+    if len(raw_body) > REQUEST_BODY_MAX_DECOMPRESSED_BYTES or decompressor.unconsumed_tail:
+        raise ValueError(f"Decompressed request body exceeds {REQUEST_BODY_MAX_DECOMPRESSED_BYTES} bytes.")
+    try: return json.loads(raw_body.decode('utf-8'))
+    except (UnicodeDecodeError, json.JSONDecodeError) as e:
+        raise ValueError(f"Request body is not valid JSON: {e}")
+
+def select_cases_from_report(model, selection):
+    """
+    Evaluates a selection expression against a report model and returns matching case ids in
+    report order. All given fields must match:
+      status   - status code(s), e.g. "F" or ["F", "K"] (PASSED/FAILED/... are accepted too)
+      name     - glob on the test name or full case id, e.g. "mtu_*write*"
+      hint     - case-insensitive substring of the error hint
+      seed_min / seed_max - inclusive seed range
+      signature - failure signature(s) from /report/<repo_id>/signatures
+      one_per_signature - keep only the first matching case of each failure signature
+    """
+    if not isinstance(selection, dict): raise ValueError("selection must be an object.")
+    unknown_keys = set(selection) - _SELECTION_KEYS
+    if unknown_keys: raise ValueError(f"unknown field(s): {', '.join(sorted(unknown_keys))}")
+    statuses = selection.get('status')
+    if isinstance(statuses, str): statuses = [statuses]
+    statuses = {_status_code_for_result(str(status)) for status in statuses} if statuses else None
+    name_glob = selection.get('name') or None
+    hint_substring = (selection.get('hint') or '').lower() or None
+    try:
+        seed_min = int(selection['seed_min']) if selection.get('seed_min') not in (None, '') else None
+        seed_max = int(selection['seed_max']) if selection.get('seed_max') not in (None, '') else None
+    except (TypeError, ValueError): raise ValueError("seed_min/seed_max must be integers.")
+    signatures = selection.get('signature')
+    if isinstance(signatures, str): signatures = [signatures]
+    signatures = set(signatures) if signatures else None
+    one_per_signature = bool(selection.get('one_per_signature'))
+    row_index = model.row_index()
+    if signatures:
+        candidate_case_ids = sorted((case_id for signature in signatures for case_id in row_index['by_signature'].get(signature, [])),
+                                    key=lambda case_id: model.records[case_id]['row_order'])
+        if statuses: candidate_case_ids = [case_id for case_id in candidate_case_ids if model.records[case_id]['status'] in statuses]
+    elif statuses:
+        candidate_case_ids = sorted((case_id for status in statuses for case_id in row_index['by_status'].get(status, [])),
+                                    key=lambda case_id: model.records[case_id]['row_order'])
+    else: candidate_case_ids = row_index['ordered']
+    selected_case_ids = []; signatures_taken = set()
+    for case_id in candidate_case_ids:
+        base_name, seed = _split_case_id(case_id)
+        if name_glob and not (fnmatch.fnmatchcase(base_name, name_glob) or fnmatch.fnmatchcase(case_id, name_glob)): continue
+        if hint_substring and hint_substring not in (model.records[case_id]['error_hint'] or '').lower(): continue
+        if seed_min is not None or seed_max is not None:
+            if not seed.isdigit(): continue
+            if seed_min is not None and int(seed) < seed_min: continue
+            if seed_max is not None and int(seed) > seed_max: continue
+        if one_per_signature:
+            case_signature = model.records[case_id]['signature']
+            if not case_signature or case_signature in signatures_taken: continue
+            signatures_taken.add(case_signature)
+        selected_case_ids.append(case_id)
+    return selected_case_ids
 
 @bp.route('/rerun/<repo_id>', methods=['POST'])
-def rerun_cases(repo_id):
+def rerun_cases(repo_id, selection_override=None):
     _logger_instance = getattr(bp, 'logger', None)
     if hasattr(request, 'getBluePrintAppLogger'): _logger_instance = request.getBluePrintAppLogger()
     elif current_app: _logger_instance = current_app.logger
@@ -1066,42 +3320,57 @@ def rerun_cases(repo_id):
         print(f"[DEBUG_PRINT] rerun_cases for repo_id: {repo_id} at {time.strftime('%Y-%m-%d %H:%M:%S')} - TRY block entered.")
         current_op_logger.info(f"--- /rerun endpoint hit for repo_id: {repo_id} ---")
         project_base_path_from_db = None
+        try: data = read_request_json_body()
+        except ValueError as e: return jsonify({"status": "error", "message": str(e)}), 400
+        if not data: data = {} # Ensure data is a dict
+        if selection_override: data['selection'] = dict(data.get('selection') or {}, **selection_override)
         if Repo and db:
-            repo_obj = Repo.query.get(repo_id)
-            if repo_obj:
-                project_base_path_from_db = getattr(repo_obj, 'data_path', None)
-                # Extract the actual HTML report path from the latest test record
-                if repo_obj.test_records and isinstance(repo_obj.test_records, list) and len(repo_obj.test_records) > 0:
-                    latest_record = repo_obj.test_records[0]
-                    html_report_path_from_db = latest_record.get('rpt')
-                    if html_report_path_from_db and os.path.exists(html_report_path_from_db):
+            repo_context = _get_repo_report_context(repo_id)
+            if repo_context:
+                project_base_path_from_db = repo_context['data_path']
+                # The actual HTML report path from the latest test record
+                if repo_context['has_test_records']:
+                    html_report_path_from_db = repo_context['rpt']
+                    if html_report_path_from_db and repo_context['rpt_exists']:
                         # Add this path to the data to be passed to the thread
-                        data = request.get_json() # Get data first
-                        if not data: data = {} # Ensure data is a dict
                         data['html_report_actual_path'] = html_report_path_from_db
                         current_op_logger.info(f"Extracted actual HTML report path for update: {html_report_path_from_db}")
                     else:
                         # Path not found in DB or doesn't exist, log warning, proceed without it
                         # The fallback in long_running_rerun_task will be used.
-                        data = request.get_json() # Still need to get data
-                        if not data: data = {}
                         current_op_logger.warning(f"Could not get valid 'rpt' path from DB for repo {repo_id} for HTML update.")
                 else: # No test records
-                    data = request.get_json()
-                    if not data: data = {}
                     current_op_logger.warning(f"No test records found for repo {repo_id} to determine HTML report path for update.")
             else: # Repo object not found
-                data = request.get_json()
-                if not data: data = {}
                 current_op_logger.warning(f"Repo object not found for id {repo_id}.")
         else: # Repo or db not available
-            data = request.get_json()
-            if not data: data = {}
             current_op_logger.warning("Database (Repo/db) not available. Cannot fetch HTML report path from DB.")
 
+        if data.get('selection'):
+            # Server-side selection over the report index, merged with any explicit selectedCases
+            if not data.get('html_report_actual_path'):
+                return jsonify({"status": "error", "message": "A 'selection' needs the repo's HTML report, which could not be resolved."}), 400
+            try:
+                selected_from_report = select_cases_from_report(get_report_model(data['html_report_actual_path']), data['selection'])
+            except ValueError as e:
+                return jsonify({"status": "error", "message": f"Invalid selection: {e}"}), 400
+            explicit_cases = data.get('selectedCases') or []
+            data['selectedCases'] = list(dict.fromkeys(list(explicit_cases) + selected_from_report))
+            current_op_logger.info(f"Selection {data['selection']} matched {len(selected_from_report)} case(s) in the report; {len(data['selectedCases'])} case(s) selected in total.")
+            if not data['selectedCases']:
+                return jsonify({"status": "error", "message": "Selection matched no cases in the report."}), 400
+
         if not data or 'selectedCases' not in data: # data might have been initialized to {}
             return jsonify({"status": "error", "message": "Invalid request or missing selectedCases"}), 400
         
+        # Checked once the request is known to be valid, right before the job would be queued. Result memo
+        # hits are only known after the job's git pull, so a rerun the memo would answer is refused too.
+        retry_after_seconds = ADMISSION.overload_retry_after()
+        if retry_after_seconds is not None: # Queueing more would only make jobs fail or wait longer
+            current_op_logger.warning(f"Rerun for repo {repo_id} refused: admission overloaded, retry after {retry_after_seconds}s.")
+            return jsonify({"status": "error", "message": f"Simulation resources are saturated; retry in {retry_after_seconds} seconds.",
+                            "admission": ADMISSION.snapshot()}), 429, {'Retry-After': str(retry_after_seconds)}
+
         data['url_repo_id'] = repo_id # Ensure repo_id is in data
         if project_base_path_from_db: # This might be None if repo_obj was not found
             data['db_project_base_path'] = project_base_path_from_db
@@ -1112,7 +3381,7 @@ def rerun_cases(repo_id):
         job_id = str(uuid.uuid4())
         JOB_STATUS[job_id] = {"status": "queued", "message": "Rerun job queued.", "output_lines": []}
         # Pass the actual app instance to the thread
-        thread = threading.Thread(target=long_running_rerun_task, args=(job_id, data, current_op_logger, passed_app_instance))
+        thread = threading.Thread(target=long_running_rerun_task, args=(job_id, data, current_op_logger, passed_app_instance), name=f"rerun-{job_id[:8]}")
         thread.start()
         return jsonify({"status": "queued", "message": "Rerun job initiated.", "job_id": job_id})
     except Exception as e:
@@ -1124,22 +3393,78 @@ def rerun_cases(repo_id):
         else: update_job_status(error_ref_id, "failed", f"Server error: {str(e)}")
         return jsonify({"status": "error", "message": f"Internal server error. Ref: {error_ref_id}.", "job_id": error_ref_id }), 500
 
+def _estimated_job_status_bytes(job_status):
+    # Shallow sizes, with long lists extrapolated from up to 64 evenly spaced items; a scrape must
+    # not walk millions of output lines
+    def item_bytes(item):
+        if isinstance(item, dict): return sys.getsizeof(item) + sum(sys.getsizeof(value) for value in item.values())
+        return sys.getsizeof(item)
+    total_bytes = sys.getsizeof(job_status)
+    for value in list(job_status.values()):
+        total_bytes += sys.getsizeof(value)
+        if isinstance(value, list) and value:
+            sample_step = max(1, len(value) // 64)
+            sampled_items = value[::sample_step][:64]
+            total_bytes += int(sum(item_bytes(item) for item in sampled_items) * len(value) / len(sampled_items))
+        elif isinstance(value, dict): total_bytes += item_bytes(value)
+    return total_bytes
+
+@bp.route('/metrics', methods=['GET'])
+def metrics():
+    jobs_by_state = collections.Counter(job_status.get('status', 'unknown') for job_status in list(JOB_STATUS.values()))
+    job_status_bytes = sum(_estimated_job_status_bytes(job_status) for job_status in list(JOB_STATUS.values()))
+    admission_snapshot = ADMISSION.snapshot()
+    gauges = [
+        ('live_report_jobs', "Jobs held in JOB_STATUS, by state.", {(('state', state),): count for state, count in jobs_by_state.items()}),
+        ('live_report_admission_queue_depth', "Jobs waiting for license tokens or host capacity.", {(): len(admission_snapshot['queued'])}),
+        ('live_report_admission_jobs_running', "Jobs admitted and holding license tokens.", {(): len(admission_snapshot['admitted'])}),
+        ('live_report_license_tokens_in_use', "License tokens leased, by all server processes sharing the pool.", {(): admission_snapshot['tokens_in_use'] or 0}),
+        ('live_report_license_tokens_capacity', "License token pool size (0: unlimited, -1: token file unreadable).",
+         {(): -1 if admission_snapshot['token_capacity'] is None else admission_snapshot['token_capacity']}),
+        ('live_report_job_status_bytes', "Estimated memory held by JOB_STATUS.", {(): job_status_bytes}),
+        ('live_report_job_status_output_lines', "Output lines held in JOB_STATUS.", {(): sum(len(job_status.get('output_lines', [])) for job_status in list(JOB_STATUS.values()))}),
+    ]
+    return Response(METRICS.render(gauges), mimetype='text/plain; version=0.0.4')
+
+@bp.route('/profiler', methods=['GET', 'POST'])
+def profiler_control():
+    # POST {"enabled": true, "sampleHz": 50} starts sampling, {"enabled": false} stops and writes the profile
+    if request.method == 'POST':
+        data = request.get_json(silent=True) or {}
+        if data.get('enabled', True):
+            try: sample_hz = float(data.get('sampleHz') or PROFILER_SAMPLE_HZ)
+            except (TypeError, ValueError): return jsonify({"status": "error", "message": "'sampleHz' must be a number."}), 400
+            SAMPLING_PROFILER.start(sample_hz)
+        else: SAMPLING_PROFILER.stop()
+    return jsonify(SAMPLING_PROFILER.status())
+
+@bp.route('/admission_status', methods=['GET'])
+def admission_status():
+    return jsonify(ADMISSION.snapshot())
+
 @bp.route('/rerun_status/<job_id>', methods=['GET'])
 def get_rerun_status_route(job_id):
     return jsonify(get_job_status(job_id))
 
+@bp.route('/rerun_trace/<job_id>', methods=['GET'])
+def get_rerun_trace_route(job_id):
+    # Chrome trace-event file of the job's spans; load it in chrome://tracing or ui.perfetto.dev
+    if job_id not in JOB_STATUS: return jsonify({"status": "not_found", "message": "Job ID not found."}), 404
+    return Response(json.dumps(chrome_trace_for_job(job_id)), mimetype='application/json',
+                    headers={'Content-Disposition': f'attachment; filename="rerun_trace_{job_id}.json"'})
+
 @bp.route('/<repo_id>')
 def index(repo_id):
     if not Repo or not db: return "Database support is not configured.", 500
-    repo = Repo.query.get_or_404(repo_id)
+    repo_context = _get_repo_report_context(repo_id)
+    if repo_context is None: abort(404)
     html_rpt_abs_path = None  # Initialize path variable
     attempted_source_info = "database (repo.result['html_rpt'])" # Default source info for error message
 
     # Try to get the path from the latest test record
-    if repo.test_records and isinstance(repo.test_records, list) and len(repo.test_records) > 0:
+    if repo_context['has_test_records']:
         # Assuming test_records is sorted with the latest first
-        latest_record = repo.test_records[0]
-        html_rpt_abs_path = latest_record.get('rpt')
+        html_rpt_abs_path = repo_context['rpt']
         attempted_source_info = "latest test record ('rpt' field)"
 
         logger_instance = getattr(bp, 'logger', getattr(current_app, 'logger', None))
@@ -1158,7 +3483,7 @@ def index(repo_id):
             print(f"WARNING: {log_message_no_records}")
 
     # Validate the path
-    if not html_rpt_abs_path or not os.path.isabs(html_rpt_abs_path) or not os.path.exists(html_rpt_abs_path):
+    if not html_rpt_abs_path or not os.path.isabs(html_rpt_abs_path) or not repo_context['rpt_exists']:
         error_msg = f"HTML report not found or invalid for repo {repo_id}. Attempted path from {attempted_source_info}: '{html_rpt_abs_path}'"
         logger_instance = getattr(bp, 'logger', getattr(current_app, 'logger', None))
         if logger_instance:
@@ -1174,7 +3499,285 @@ def index(repo_id):
     else:
         print(f"INFO: {success_msg}")
 
-    return send_from_directory(os.path.dirname(html_rpt_abs_path), os.path.basename(html_rpt_abs_path))
+    # Strong validators from the file's stat: a repeat view with a matching ETag costs a 304.
+    try: report_stat = os.stat(html_rpt_abs_path)
+    except FileNotFoundError: # Removed right after the existence check
+        invalidate_repo_report_cache(repo_id)
+        return f"HTML report not found or invalid for repo {repo_id}: '{html_rpt_abs_path}'", 404
+    identity_etag = f"{report_stat.st_ino:x}-{report_stat.st_mtime_ns:x}-{report_stat.st_size:x}"
+    serve_gzip = request.accept_encodings['gzip'] > 0
+    response_etag = f"{identity_etag}-gz" if serve_gzip else identity_etag # Each encoding needs its own strong tag
+    if request.if_none_match:
+        not_modified = request.if_none_match.contains(response_etag)
+    else:
+        not_modified = bool(request.if_modified_since and int(report_stat.st_mtime) <= request.if_modified_since.timestamp())
+    if not_modified:
+        response = Response(status=304)
+    elif serve_gzip:
+        gzip_file = open_gzip_report_variant(html_rpt_abs_path, identity_etag) # Closed with the response
+        response = send_file(gzip_file, mimetype='text/html', conditional=False, etag=False, max_age=0)
+        response.headers['Content-Encoding'] = 'gzip'
+    else:
+        response = send_file(html_rpt_abs_path, mimetype='text/html', conditional=False, etag=False, max_age=0)
+    response.set_etag(response_etag)
+    response.last_modified = report_stat.st_mtime
+    response.headers['Vary'] = 'Accept-Encoding'
+    response.headers['Cache-Control'] = 'no-cache' # Always revalidate: the report changes as reruns land
+    return response
+
+# --- Precompressed report variants for the index route ---
+# '<hash of report path>-<identity etag>.html.gz' files are generated lazily on the first gzip
+# request after the report changes; older variants of the same report are removed then. The
+# variant is returned open, so removing it while a response is still sending it is harmless.
+REPORT_GZIP_CACHE_DIR = os.environ.get('LIVE_REPORT_GZIP_CACHE_DIR', os.path.join(script_dir, '.report_gzip_cache'))
+REPORT_GZIP_COMPRESS_LEVEL = 6
+_REPORT_GZIP_LOCKS = [threading.Lock() for _ in range(64)] # Striped by report path hash; one lock per report would never be freed
+
+def open_gzip_report_variant(html_file_path, identity_etag):
+    # Binary file object of the gzip variant of this report version, compressed on first use
+    os.makedirs(REPORT_GZIP_CACHE_DIR, exist_ok=True)
+    path_hash = hashlib.sha1(os.path.realpath(html_file_path).encode('utf-8')).hexdigest()[:16]
+    gzip_path = os.path.join(REPORT_GZIP_CACHE_DIR, f"{path_hash}-{identity_etag}.html.gz")
+    with contextlib.suppress(FileNotFoundError): return open(gzip_path, 'rb') # Removed meanwhile: the report changed again
+    with _REPORT_GZIP_LOCKS[int(path_hash, 16) % len(_REPORT_GZIP_LOCKS)]: # One compression per report version, even under concurrent views
+        with contextlib.suppress(FileNotFoundError): return open(gzip_path, 'rb')
+        temp_fd, temp_gzip_path = tempfile.mkstemp(prefix=f".{path_hash}.", suffix=".gz.tmp", dir=REPORT_GZIP_CACHE_DIR)
+        try:
+            with open(html_file_path, 'rb') as src, os.fdopen(temp_fd, 'wb') as raw_dst:
+                with gzip.GzipFile(fileobj=raw_dst, mode='wb', compresslevel=REPORT_GZIP_COMPRESS_LEVEL, mtime=0) as gz_dst:
+                    shutil.copyfileobj(src, gz_dst, 1024 * 1024)
+            os.replace(temp_gzip_path, gzip_path)
+        finally:
+            if os.path.exists(temp_gzip_path): os.remove(temp_gzip_path)
+        gzip_file = open(gzip_path, 'rb') # Under the lock: once it is released, a newer version's cleanup may remove the file
+        for stale_name in os.listdir(REPORT_GZIP_CACHE_DIR):
+            if stale_name.startswith(f"{path_hash}-") and stale_name != os.path.basename(gzip_path):
+                try: os.remove(os.path.join(REPORT_GZIP_CACHE_DIR, stale_name))
+                except OSError: pass
+    return gzip_file
+
+# --- Read-through cache: repo_id -> resolved report path / data_path ---
+# Report viewing and reruns need only the latest record's 'rpt' and the repo's data_path, so
+# they are cached per repo (TTL + LRU) instead of querying the DB per request. Whether the report
+# exists is checked per request: a cached "missing" would 404 a report written after the lookup.
+# invalidate_repo_report_cache() must be called when a new test record is written; when the
+# Repo model is available this is wired to its SQLAlchemy events. Records written by another
+# process are picked up when the entry expires.
+REPO_REPORT_CACHE_TTL_SECONDS = float(os.environ.get('LIVE_REPORT_REPO_CACHE_TTL', '60'))
+REPO_REPORT_CACHE_MAX_ENTRIES = int(os.environ.get('LIVE_REPORT_REPO_CACHE_MAX_ENTRIES', '1024'))
+
+class RepoReportCache:
+    def __init__(self, ttl_seconds, max_entries):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries = collections.OrderedDict() # repo_id -> (expires_at, context)
+        self._generations = {} # repo_id -> invalidations so far; a load that saw an older count is not stored
+        self._generation_all = 0 # Invalidations of every repo
+        self._lock = threading.Lock()
+
+    def get_or_load(self, repo_id, loader):
+        cache_key = str(repo_id); now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(cache_key)
+            if entry and entry[0] > now:
+                self._entries.move_to_end(cache_key)
+                return entry[1]
+            load_generation = (self._generation_all, self._generations.get(cache_key, 0))
+        context = loader(repo_id) # Outside the lock: a slow DB query must not block other repos
+        with self._lock:
+            if (self._generation_all, self._generations.get(cache_key, 0)) != load_generation: return context # Invalidated while loading: may be stale
+            self._entries[cache_key] = (now + self.ttl_seconds, context)
+            self._entries.move_to_end(cache_key)
+            while len(self._entries) > self.max_entries: self._entries.popitem(last=False)
+        return context
+
+    def invalidate(self, repo_id=None):
+        with self._lock:
+            if repo_id is None:
+                self._entries.clear(); self._generations.clear(); self._generation_all += 1
+            else:
+                self._entries.pop(str(repo_id), None)
+                self._generations[str(repo_id)] = self._generations.get(str(repo_id), 0) + 1
+
+REPO_REPORT_CACHE = RepoReportCache(REPO_REPORT_CACHE_TTL_SECONDS, REPO_REPORT_CACHE_MAX_ENTRIES)
+
+def invalidate_repo_report_cache(repo_id=None):
+    """Drops the cached report context of one repo (or all repos). Call after writing a test record."""
+    REPO_REPORT_CACHE.invalidate(repo_id)
+
+if Repo is not None:
+    try:
+        from sqlalchemy import event as sqlalchemy_event
+        for _repo_event_name in ('after_insert', 'after_update', 'after_delete'):
+            sqlalchemy_event.listen(Repo, _repo_event_name, lambda mapper, connection, target: invalidate_repo_report_cache(getattr(target, 'id', None)))
+        # test_records is a JSON list and is usually appended to in place, which no row event sees until
+        # it is flushed: also watch the attribute, 'set' when it is reassigned and 'modified' when an
+        # in-place change is flagged with flag_modified() (an unflagged one is never written back)
+        for _records_event_name in ('set', 'modified'):
+            sqlalchemy_event.listen(Repo.test_records, _records_event_name, lambda target, *event_args: invalidate_repo_report_cache(getattr(target, 'id', None)))
+    except Exception as e:
+        print(f"Warning: Could not register Repo change listeners for report cache invalidation ({e}). Relying on TTL only.")
+
+def _load_repo_report_context(repo_id):
+    repo = Repo.query.get(repo_id)
+    if not repo: return None
+    html_rpt_path = None
+    has_test_records = bool(repo.test_records and isinstance(repo.test_records, list) and len(repo.test_records) > 0)
+    if has_test_records: html_rpt_path = repo.test_records[0].get('rpt')
+    data_path = getattr(repo, 'data_path', None)
+    project_root = get_project_root_from_branch_path(html_rpt_path) if html_rpt_path else None
+    return {'rpt': html_rpt_path, 'has_test_records': has_test_records, 'data_path': data_path, 'project_root': project_root or data_path}
+
+def _get_repo_report_context(repo_id):
+    # Latest report path ('rpt' of the newest test record) and whether it exists, the repo's
+    # data_path, and the project root, which is the part of the report path before '/work/'
+    # (reports live under <project_root>/work/...) or data_path when that is not possible.
+    # None if the repo is unknown. Existence is not cached, see RepoReportCache.
+    repo_context = REPO_REPORT_CACHE.get_or_load(repo_id, _load_repo_report_context)
+    if repo_context is None: return None
+    return dict(repo_context, rpt_exists=bool(repo_context['rpt'] and os.path.exists(repo_context['rpt'])))
+
+def _resolve_log_request(repo_id):
+    # Shared validation for the /log endpoints. Returns (log_file_path, error_response).
+    if not Repo or not db: return None, ("Database support is not configured.", 500)
+    requested_log_path = request.args.get('path', '')
+    if not requested_log_path: return None, ("Missing 'path' query parameter.", 400)
+    repo_context = _get_repo_report_context(repo_id)
+    project_root = repo_context['project_root'] if repo_context else None
+    if not project_root: return None, (f"Project root could not be determined for repo {repo_id}.", 404)
+    log_file_path = resolve_confined_log_path(project_root, requested_log_path)
+    if not log_file_path:
+        logger_instance = getattr(bp, 'logger', getattr(current_app, 'logger', None))
+        error_msg = f"Log '{requested_log_path}' not found inside the work tree of repo {repo_id}."
+        if logger_instance: logger_instance.warning(error_msg)
+        else: print(f"WARNING: {error_msg}")
+        return None, (error_msg, 404)
+    return log_file_path, None
+
+@bp.route('/log/<repo_id>')
+def serve_sim_log(repo_id):
+    # Whole-file or ranged download; Range/If-Range are handled by send_file(conditional=True),
+    # and the file object is handed to the WSGI server's file wrapper (sendfile where supported).
+    log_file_path, error_response = _resolve_log_request(repo_id)
+    if error_response: return error_response
+    return send_file(log_file_path, mimetype='text/plain', conditional=True, max_age=0)
+
+@bp.route('/log/<repo_id>/tail')
+def tail_sim_log(repo_id):
+    log_file_path, error_response = _resolve_log_request(repo_id)
+    if error_response: return error_response
+    try: num_lines = int(request.args.get('lines', LOG_TAIL_DEFAULT_LINES))
+    except ValueError: return "Invalid 'lines' query parameter.", 400
+    num_lines = max(1, min(num_lines, LOG_TAIL_MAX_LINES))
+    tail_bytes, start_offset = tail_log_file_mmap(log_file_path, num_lines)
+    response = Response(tail_bytes, mimetype='text/plain')
+    response.headers['X-Log-Start-Offset'] = str(start_offset)
+    response.headers['X-Log-End-Offset'] = str(start_offset + len(tail_bytes)) # Pass as ?offset= to /follow
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+@bp.route('/log/<repo_id>/follow')
+def follow_sim_log(repo_id):
+    # Streams a running case's log. Without ?offset= it starts from the last ?lines= lines.
+    log_file_path, error_response = _resolve_log_request(repo_id)
+    if error_response: return error_response
+    try:
+        idle_timeout = int(request.args.get('timeout', LOG_FOLLOW_DEFAULT_IDLE_TIMEOUT))
+        start_offset = request.args.get('offset')
+        if start_offset is not None: start_offset = max(0, int(start_offset))
+        else:
+            num_lines = max(1, min(int(request.args.get('lines', LOG_TAIL_DEFAULT_LINES)), LOG_TAIL_MAX_LINES))
+            _, start_offset = tail_log_file_mmap(log_file_path, num_lines)
+    except ValueError: return "Invalid 'offset', 'lines' or 'timeout' query parameter.", 400
+    idle_timeout = max(1, min(idle_timeout, LOG_FOLLOW_MAX_IDLE_TIMEOUT))
+    response = Response(_follow_log_file_generator(log_file_path, start_offset, idle_timeout), mimetype='text/plain')
+    response.headers['X-Log-Start-Offset'] = str(start_offset)
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no' # Do not let a reverse proxy buffer the stream
+    return response
+
+@bp.route('/stats/<repo_id>')
+def report_stats(repo_id):
+    # Totals for the repo's current report, read from the sidecar counters (no HTML parsing).
+    if not Repo or not db: return jsonify({"status": "error", "message": "Database support is not configured."}), 500
+    repo_context = _get_repo_report_context(repo_id)
+    html_rpt_abs_path = repo_context['rpt'] if repo_context else None
+    if not html_rpt_abs_path or not repo_context['rpt_exists']:
+        return jsonify({"status": "error", "message": f"HTML report not found for repo {repo_id}."}), 404
+    try:
+        stats = get_report_model(html_rpt_abs_path).stats()
+    except Exception as e:
+        logger_instance = getattr(bp, 'logger', getattr(current_app, 'logger', None))
+        error_msg = f"Error reading report stats for repo {repo_id} from '{html_rpt_abs_path}': {e}"
+        if logger_instance: logger_instance.error(error_msg)
+        else: print(f"ERROR: {error_msg}")
+        return jsonify({"status": "error", "message": error_msg}), 500
+    return jsonify({"status": "ok", "repo_id": repo_id, "stats": stats})
+
+REPORT_ROWS_DEFAULT_LIMIT = 100
+REPORT_ROWS_MAX_LIMIT = 2000
+
+def _split_case_id(case_id):
+    base_name, _, seed = case_id.rpartition('_seed')
+    return (base_name, seed) if base_name else (case_id, '')
+
+@bp.route('/report/<repo_id>/rows')
+def report_rows(repo_id):
+    # One page of detailedStatusTable rows as JSON, for a virtualized table:
+    # ?offset=&limit=&status=F[,K]&q=<case name prefix>
+    if not Repo or not db: return jsonify({"status": "error", "message": "Database support is not configured."}), 500
+    repo_context = _get_repo_report_context(repo_id)
+    html_rpt_abs_path = repo_context['rpt'] if repo_context else None
+    if not html_rpt_abs_path or not repo_context['rpt_exists']:
+        return jsonify({"status": "error", "message": f"HTML report not found for repo {repo_id}."}), 404
+    try:
+        offset = max(0, int(request.args.get('offset', 0)))
+        limit = max(1, min(int(request.args.get('limit', REPORT_ROWS_DEFAULT_LIMIT)), REPORT_ROWS_MAX_LIMIT))
+    except ValueError:
+        return jsonify({"status": "error", "message": "Invalid 'offset' or 'limit'."}), 400
+    statuses = {_status_code_for_result(status.strip()) for status in request.args.get('status', '').split(',') if status.strip()} or None
+    name_prefix = request.args.get('q', '').strip() or None
+    try:
+        model = get_report_model(html_rpt_abs_path)
+        matched_count, page_case_ids = model.query_rows(statuses, name_prefix, offset, limit)
+    except Exception as e:
+        error_msg = f"Error querying report rows for repo {repo_id} from '{html_rpt_abs_path}': {e}"
+        logger_instance = getattr(bp, 'logger', getattr(current_app, 'logger', None))
+        if logger_instance: logger_instance.error(error_msg)
+        else: print(f"ERROR: {error_msg}")
+        return jsonify({"status": "error", "message": error_msg}), 500
+    rows = []
+    for case_id in page_case_ids:
+        record = model.records[case_id]; base_name, seed = _split_case_id(case_id)
+        rows.append({'id': case_id, 'name': base_name, 'seed': seed, 'row_order': record['row_order'], 'status': record['status'],
+                     'pass_rate': record['pass_rate'], 'log_path': record['log_path'], 'error_hint': record['error_hint']})
+    return jsonify({"status": "ok", "repo_id": repo_id, "total": sum(model.status_counts.values()),
+                    "total_by_status": model.status_counts, "matched": matched_count,
+                    "offset": offset, "limit": limit, "rows": rows})
+
+@bp.route('/report/<repo_id>/signatures')
+def report_failure_signatures(repo_id):
+    # Failure buckets of the repo's report, largest first: signature, case count, sample hint,
+    # normalized hint and the first few case ids of each bucket.
+    if not Repo or not db: return jsonify({"status": "error", "message": "Database support is not configured."}), 500
+    repo_context = _get_repo_report_context(repo_id)
+    html_rpt_abs_path = repo_context['rpt'] if repo_context else None
+    if not html_rpt_abs_path or not repo_context['rpt_exists']:
+        return jsonify({"status": "error", "message": f"HTML report not found for repo {repo_id}."}), 404
+    try: sample_size = max(0, min(int(request.args.get('samples', 5)), 100))
+    except ValueError: return jsonify({"status": "error", "message": "Invalid 'samples'."}), 400
+    model = get_report_model(html_rpt_abs_path)
+    cases_by_signature = model.row_index()['by_signature']
+    buckets = [{'signature': signature, 'count': bucket['count'], 'sample_hint': bucket['sample_hint'],
+                'normalized_hint': normalize_failure_hint(bucket['sample_hint']), 'case_ids': cases_by_signature.get(signature, [])[:sample_size]}
+               for signature, bucket in sorted(model.signature_buckets.items(), key=lambda item: -item[1]['count'])]
+    return jsonify({"status": "ok", "repo_id": repo_id, "signature_count": len(buckets), "buckets": buckets})
+
+@bp.route('/rerun_signature/<repo_id>/<signature>', methods=['POST'])
+def rerun_failure_signature(repo_id, signature):
+    # Reruns one failure bucket. The body carries the usual rerun options (branchPath etc.);
+    # a 'selection' in it narrows the bucket further, e.g. {"one_per_signature": true}.
+    return rerun_cases(repo_id, selection_override={'signature': signature})
 
 if __name__ == '__main__':
     app = Flask(__name__)
@@ -0,0 +1,31 @@
+# Imports live_report_server_v1p0 from the repo root with its SQLite stores, profiles and gzip
+# cache redirected to a scratch directory, so tests never touch the server's real state.
+import contextlib
+import os
+import sys
+import tempfile
+
+import pytest
+from flask import Flask
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_STATE_DIR = tempfile.mkdtemp(prefix='live_report_tests_')
+for env_name, file_name in (('LIVE_REPORT_RUNTIME_HISTORY_DB', 'runtime_history.sqlite'), ('LIVE_REPORT_RESULT_MEMO_DB', 'result_memo.sqlite'),
+                            ('LIVE_REPORT_BUILD_STATE_DB', 'build_state.sqlite'), ('LIVE_REPORT_PROFILE_DIR', 'profiles'),
+                            ('LIVE_REPORT_GZIP_CACHE_DIR', 'gzip_cache')):
+    os.environ.setdefault(env_name, os.path.join(_STATE_DIR, file_name))
+sys.path.insert(0, REPO_ROOT)
+
+with contextlib.redirect_stdout(sys.stderr): # Import-time notices
+    import live_report_server_v1p0
+
+@pytest.fixture
+def server():
+    return live_report_server_v1p0
+
+@pytest.fixture
+def client(server):
+    # The blueprint mounted as in the standalone server; Repo/db lookups are unavailable here
+    app = Flask(__name__)
+    app.register_blueprint(server.bp, url_prefix='/live_reporter')
+    return app.test_client()
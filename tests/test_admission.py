@@ -0,0 +1,144 @@
+# Admission control: the license token pool (token file, leases, dead-PID cleanup), the FIFO
+# admission queue, and 429 + Retry-After from /rerun/<repo_id> under sustained overload.
+import json
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+@pytest.fixture(autouse=True)
+def no_host_pressure(server, monkeypatch):
+    # Admission must not depend on the load of the machine running the tests
+    monkeypatch.setattr(server, 'ADMISSION_MAX_LOAD_PER_CPU', 0.0)
+    monkeypatch.setattr(server, 'ADMISSION_MIN_AVAILABLE_MB', 0)
+    monkeypatch.setattr(server, 'ADMISSION_POLL_SECONDS', 0.01)
+
+@pytest.fixture
+def token_file(tmp_path):
+    path = tmp_path / 'msim_tokens'
+    path.write_text("pool size: 4\n")
+    return path
+
+def _read_leases(token_file):
+    return json.loads((token_file.parent / f"{token_file.name}.leases").read_text())
+
+def _dead_pid():
+    child = subprocess.Popen([sys.executable, '-c', 'pass']); child.wait()
+    return child.pid
+
+def test_token_file_pool(server, token_file):
+    pool = server.LicenseTokenPool(str(token_file), 0)
+    assert pool.try_acquire('job1', 3) == (True, None)
+    assert pool.try_acquire('job2', 2) == (False, "1 of 4 license token(s) free, 2 needed")
+    assert pool.usage() == (3, 4)
+    token_file.write_text("6") # Resized by a license monitor: re-read on every check
+    assert pool.try_acquire('job2', 2) == (True, None)
+    pool.release('job1'); pool.release('job1') # Idempotent
+    assert pool.usage() == (2, 6)
+    assert [lease['job_id'] for lease in _read_leases(token_file).values()] == ['job2']
+
+def test_failed_acquire_leaves_lease_file_alone(server, token_file):
+    pool = server.LicenseTokenPool(str(token_file), 0)
+    assert pool.try_acquire('job1', 4) == (True, None)
+    leases_path = token_file.parent / f"{token_file.name}.leases"; leases_inode = leases_path.stat().st_ino
+    assert pool.try_acquire('job2', 1)[0] is False
+    assert leases_path.stat().st_ino == leases_inode # Not replaced by an identical copy
+
+def test_shard_count_is_capped_by_the_token_pool(server, token_file, monkeypatch):
+    monkeypatch.setattr(server, 'ADMISSION', server.AdmissionController(server.LicenseTokenPool(str(token_file), 0)))
+    monkeypatch.setattr(server, 'MSIM_MAX_SHARDS', 8)
+    token_file.write_text("2")
+    assert server.choose_msim_shard_count(4, 20) == 2
+    token_file.write_text("0") # Unlimited pool
+    assert server.choose_msim_shard_count(4, 20) == 4
+
+def test_oversized_request_waits_for_the_whole_pool(server, token_file):
+    pool = server.LicenseTokenPool(str(token_file), 0)
+    assert pool.try_acquire('big', 10) == (True, None)
+    assert pool.usage() == (4, 4)
+
+def test_leases_of_dead_processes_are_dropped(server, token_file):
+    dead_pid = _dead_pid()
+    (token_file.parent / f"{token_file.name}.leases").write_text(json.dumps({
+        f"{server._HOST_NAME}:{dead_pid}:crashed": {'host': server._HOST_NAME, 'pid': dead_pid, 'job_id': 'crashed', 'tokens': 4, 'leased_at': 0},
+        f"other-host:{dead_pid}:remote": {'host': 'other-host', 'pid': dead_pid, 'job_id': 'remote', 'tokens': 1, 'leased_at': 0}}))
+    pool = server.LicenseTokenPool(str(token_file), 0)
+    assert pool.try_acquire('job1', 3) == (True, None) # The crashed server's 4 tokens are free again
+    assert sorted(lease['job_id'] for lease in _read_leases(token_file).values()) == ['job1', 'remote'] # PIDs of other hosts cannot be checked
+
+def test_missing_token_file_admits_nothing(server, tmp_path):
+    pool = server.LicenseTokenPool(str(tmp_path / 'no_such_file'), 0)
+    acquired, reason = pool.try_acquire('job1', 1)
+    assert not acquired and "is missing or unreadable" in reason
+
+def test_in_process_pool(server):
+    unlimited_pool = server.LicenseTokenPool('', 0)
+    assert all(unlimited_pool.try_acquire(f"job{index}", 8)[0] for index in range(5))
+    pool = server.LicenseTokenPool('', 2)
+    assert pool.try_acquire('job1', 2) == (True, None)
+    assert pool.try_acquire('job2', 1)[0] is False
+    pool.release('job1')
+    assert pool.try_acquire('job2', 1) == (True, None)
+
+def _acquire_in_thread(admission, job_id, tokens):
+    wait_reasons = []; admitted = threading.Event()
+    thread = threading.Thread(target=lambda: (admission.acquire(job_id, tokens, wait_reasons.append), admitted.set()), daemon=True)
+    thread.start()
+    return thread, admitted, wait_reasons
+
+def _wait_until_queued(admission, job_id, reason=None):
+    for _ in range(500):
+        if any(entry['job_id'] == job_id and entry['reason'] and reason in (None, entry['reason']) for entry in admission.snapshot()['queued']): return
+        time.sleep(0.01)
+    raise AssertionError(f"{job_id} never queued")
+
+def test_jobs_wait_in_arrival_order(server, token_file):
+    admission = server.AdmissionController(server.LicenseTokenPool(str(token_file), 0))
+    admission.acquire('running', 3)
+    large_thread, large_admitted, large_reasons = _acquire_in_thread(admission, 'large', 4)
+    _wait_until_queued(admission, 'large')
+    small_thread, small_admitted, small_reasons = _acquire_in_thread(admission, 'small', 1) # Fits, but must not overtake 'large'
+    _wait_until_queued(admission, 'small')
+    assert not small_admitted.is_set()
+    assert large_reasons == ["1 of 4 license token(s) free, 4 needed"] and small_reasons == ["queued behind job large in the admission queue"]
+    admission.release('running')
+    large_thread.join(5); assert large_admitted.is_set()
+    _wait_until_queued(admission, 'small', "0 of 4 license token(s) free, 1 needed") # Now at the head, waiting for 'large'
+    admission.release('large')
+    small_thread.join(5); assert small_admitted.is_set()
+    assert admission.snapshot()['admitted'] == {'small': 1}
+
+@pytest.fixture
+def overloaded_admission(server, token_file, monkeypatch):
+    # One admitted job holding the whole pool and one job queued behind it
+    admission = server.AdmissionController(server.LicenseTokenPool(str(token_file), 0))
+    monkeypatch.setattr(server, 'ADMISSION', admission)
+    monkeypatch.setattr(server, 'ADMISSION_MAX_QUEUED_JOBS', 1)
+    admission.acquire('running', 4)
+    waiter_thread, _, _ = _acquire_in_thread(admission, 'waiting', 1)
+    _wait_until_queued(admission, 'waiting')
+    yield admission
+    admission.release('running'); waiter_thread.join(5); admission.release('waiting')
+
+def test_rerun_answers_429_with_retry_after_from_running_eta(server, client, overloaded_admission, monkeypatch):
+    monkeypatch.setitem(server.JOB_STATUS, 'running', {'status': 'running', 'output_lines': [], 'progress_summary': {'eta_seconds': 42.7}})
+    response = client.post('/live_reporter/rerun/repo1', json={'selectedCases': ['t_seed1']})
+    assert response.status_code == 429
+    assert response.headers['Retry-After'] == '42'
+    assert [entry['job_id'] for entry in response.get_json()['admission']['queued']] == ['waiting']
+
+def test_retry_after_defaults_without_an_eta(server, client, overloaded_admission):
+    response = client.post('/live_reporter/rerun/repo1', json={'selectedCases': ['t_seed1']})
+    assert (response.status_code, response.headers['Retry-After']) == (429, str(server.ADMISSION_RETRY_AFTER_DEFAULT_SECONDS))
+
+def test_long_wait_at_queue_head_is_overload(server, token_file, monkeypatch):
+    admission = server.AdmissionController(server.LicenseTokenPool(str(token_file), 0))
+    admission.acquire('running', 4)
+    waiter_thread, _, _ = _acquire_in_thread(admission, 'waiting', 1)
+    _wait_until_queued(admission, 'waiting')
+    assert admission.overload_retry_after() is None # One queued job, waiting briefly: not overloaded
+    monkeypatch.setattr(server, 'ADMISSION_OVERLOAD_SECONDS', 0.05); time.sleep(0.1)
+    assert admission.overload_retry_after() == server.ADMISSION_RETRY_AFTER_DEFAULT_SECONDS
+    admission.release('running'); waiter_thread.join(5); admission.release('waiting')
@@ -0,0 +1,104 @@
+# BuildCoordinator: one job compiles a work area while the others wait and then reuse its build,
+# a leader that recompiles waits for the jobs still simulating on the old build, and a job that
+# gives up waiting fails instead of compiling the same work area.
+import threading
+import time
+
+import pytest
+
+_SOURCES, _OPTIONS = 'src-fingerprint', 'opts-fingerprint'
+
+@pytest.fixture
+def coordinator(server, tmp_path, monkeypatch):
+    monkeypatch.setattr(server, 'BUILD_STATE', server.BuildStateStore(str(tmp_path / 'build_state.sqlite')))
+    return server.BuildCoordinator()
+
+@pytest.fixture
+def work_area(tmp_path):
+    path = tmp_path / 'work' / 'd1'; path.mkdir(parents=True)
+    return str(path)
+
+def _claim_in_thread(coordinator, work_area, job_id, **claim_kwargs):
+    outcome = {'wait_messages': []}
+    def run():
+        try: outcome['claim'], outcome['reason'] = coordinator.claim(work_area, {'default'}, _SOURCES, _OPTIONS, job_id, on_wait=outcome['wait_messages'].append, **claim_kwargs)
+        except TimeoutError as e: outcome['error'] = e
+    thread = threading.Thread(target=run, daemon=True); thread.start()
+    return thread, outcome
+
+def _wait_for(condition):
+    for _ in range(500):
+        if condition(): return
+        time.sleep(0.01)
+    raise AssertionError("condition never became true")
+
+def test_first_job_compiles_and_waiters_reuse_its_build(server, coordinator, work_area):
+    build_claim, reason = coordinator.claim(work_area, {'default'}, _SOURCES, _OPTIONS, 'leader')
+    assert build_claim and reason == "no successful build of build_mode 'default' recorded for this work area"
+    waiter_thread, waiter = _claim_in_thread(coordinator, work_area, 'waiter')
+    _wait_for(lambda: coordinator.has_waiters(build_claim))
+    assert waiter['wait_messages'] == [f"Waiting for job leader to finish compiling build_mode 'default' in {work_area}..."]
+    coordinator.finish(build_claim, True, 'c0ffee')
+    waiter_thread.join(5)
+    assert waiter['claim'] is None and waiter['reason'].startswith("sources and compile options unchanged since the build of")
+    assert not coordinator.has_waiters(build_claim)
+
+def test_failed_build_is_retried_by_a_waiter(server, coordinator, work_area):
+    build_claim, _ = coordinator.claim(work_area, {'default'}, _SOURCES, _OPTIONS, 'leader')
+    waiter_thread, waiter = _claim_in_thread(coordinator, work_area, 'waiter')
+    _wait_for(lambda: coordinator.has_waiters(build_claim))
+    coordinator.finish(build_claim, False); coordinator.release_use(work_area, 'leader')
+    waiter_thread.join(5)
+    assert waiter['claim'] is not None and waiter['claim']['job_id'] == 'waiter'
+    coordinator.finish(build_claim, True) # Idempotent: a finished claim stays failed
+    assert build_claim['succeeded'] is False
+
+def test_current_build_is_reused_without_a_claim(server, coordinator, work_area):
+    server.BUILD_STATE.record(work_area, {'default'}, _SOURCES, _OPTIONS, 'c0ffee')
+    assert coordinator.claim(work_area, {'default'}, _SOURCES, _OPTIONS, 'job1')[0] is None
+    coordinator.release_use(work_area, 'job1')
+    build_claim, reason = coordinator.claim(work_area, {'default'}, 'new-sources', _OPTIONS, 'job2')
+    assert build_claim and reason.startswith("RTL/TB sources changed since the build of build_mode 'default'")
+
+def test_recompile_waits_for_users_of_the_old_build(server, coordinator, work_area):
+    server.BUILD_STATE.record(work_area, {'default'}, _SOURCES, _OPTIONS, 'c0ffee')
+    assert coordinator.claim(work_area, {'default'}, _SOURCES, _OPTIONS, 'simulating')[0] is None
+    leader_thread, leader = _claim_in_thread(coordinator, work_area, 'rebuilding', force=True)
+    _wait_for(lambda: leader['wait_messages'])
+    assert leader['wait_messages'] == [f"Waiting for job(s) simulating to finish simulating on the build in {work_area} before recompiling it..."]
+    assert 'claim' not in leader
+    coordinator.release_use(work_area, 'simulating')
+    leader_thread.join(5)
+    assert leader['claim'] and leader['reason'] == "rebuild requested (rebuildCases)"
+
+def test_forced_rebuild_is_satisfied_by_an_identical_build_in_flight(server, coordinator, work_area):
+    build_claim, _ = coordinator.claim(work_area, {'default'}, _SOURCES, _OPTIONS, 'leader')
+    waiter_thread, waiter = _claim_in_thread(coordinator, work_area, 'waiter', force=True)
+    _wait_for(lambda: coordinator.has_waiters(build_claim))
+    coordinator.finish(build_claim, True, 'c0ffee')
+    waiter_thread.join(5)
+    assert waiter['claim'] is None
+
+def test_giving_up_on_a_build_fails_instead_of_compiling(server, coordinator, work_area, monkeypatch):
+    monkeypatch.setattr(server, 'BUILD_COORDINATION_MAX_WAIT_SECONDS', 0.05)
+    build_claim, _ = coordinator.claim(work_area, {'default'}, _SOURCES, _OPTIONS, 'leader')
+    with pytest.raises(TimeoutError, match="waiting for job leader to finish compiling"):
+        coordinator.claim(work_area, {'default'}, _SOURCES, _OPTIONS, 'waiter')
+    assert not coordinator.has_waiters(build_claim)
+    assert coordinator._builds_in_flight == {work_area: build_claim} # The leader's claim is untouched
+
+def test_decision_made_while_another_job_claimed_is_redone(server, coordinator, work_area, monkeypatch):
+    # decide_sim_only runs outside the lock; a claim registered meanwhile voids its answer
+    decide_calls = []; original_decide = server.decide_sim_only
+    def decide_while_another_job_claims(*decide_args):
+        decide_calls.append(decide_args)
+        if len(decide_calls) == 1:
+            monkeypatch.setattr(server, 'decide_sim_only', original_decide)
+            other_claim, _ = coordinator.claim(work_area, {'default'}, _SOURCES, _OPTIONS, 'other')
+            coordinator.finish(other_claim, True, 'c0ffee'); coordinator.release_use(work_area, 'other')
+            monkeypatch.setattr(server, 'decide_sim_only', decide_while_another_job_claims)
+        return original_decide(*decide_args)
+    monkeypatch.setattr(server, 'decide_sim_only', decide_while_another_job_claims)
+    build_claim, reason = coordinator.claim(work_area, {'default'}, _SOURCES, _OPTIONS, 'late')
+    assert len(decide_calls) == 2 # The first "no build recorded" answer was dropped
+    assert build_claim is None and reason.startswith("sources and compile options unchanged")
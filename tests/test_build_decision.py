@@ -0,0 +1,86 @@
+# Automatic compile-skip decision: -so only when every build_mode the cases need was built in the
+# work area from the same RTL/TB sources and compile options; the source fingerprint follows the
+# tracked files under rtl/ and dv/ as the work tree has them, not the commit.
+import subprocess
+
+import pytest
+
+_SOURCES, _OPTIONS = 'src-fingerprint', 'opts-fingerprint'
+
+@pytest.fixture
+def build_state(server, tmp_path, monkeypatch):
+    store = server.BuildStateStore(str(tmp_path / 'build_state.sqlite'))
+    monkeypatch.setattr(server, 'BUILD_STATE', store)
+    return store
+
+@pytest.fixture
+def work_area(tmp_path):
+    path = tmp_path / 'work' / 'd1'; path.mkdir(parents=True)
+    return str(path)
+
+def test_missing_work_area_compiles(server, build_state, tmp_path):
+    assert server.decide_sim_only(str(tmp_path / 'work' / 'nope'), {'default'}, _SOURCES, _OPTIONS) == (False, "work area does not exist yet")
+
+def test_unrecorded_build_mode_compiles(server, build_state, work_area):
+    build_state.record(work_area, {'default'}, _SOURCES, _OPTIONS, 'c0ffee')
+    sim_only, reason = server.decide_sim_only(work_area, {'default', 'cov'}, _SOURCES, _OPTIONS)
+    assert not sim_only and reason == "no successful build of build_mode 'cov' recorded for this work area"
+
+def test_current_build_is_reused(server, build_state, work_area):
+    build_state.record(work_area, {'default', 'cov'}, _SOURCES, _OPTIONS, 'c0ffee1234567890')
+    sim_only, reason = server.decide_sim_only(work_area, {'cov'}, _SOURCES, _OPTIONS)
+    assert sim_only and reason.startswith("sources and compile options unchanged since the build of") and reason.endswith("(c0ffee123456)")
+
+@pytest.mark.parametrize('sources, options, reason_start', [
+    ('new-sources', _OPTIONS, "RTL/TB sources changed since the build of build_mode 'default'"),
+    (_SOURCES, 'new-options', "compile options (elab/vlog/waveform) changed since the build of build_mode 'default'"),
+])
+def test_changed_inputs_compile(server, build_state, work_area, sources, options, reason_start):
+    build_state.record(work_area, {'default'}, _SOURCES, _OPTIONS, 'c0ffee')
+    sim_only, reason = server.decide_sim_only(work_area, {'default'}, sources, options)
+    assert not sim_only and reason.startswith(reason_start)
+
+def test_build_state_is_per_work_area(server, build_state, work_area, tmp_path):
+    other_work_area = tmp_path / 'work' / 'd2'; other_work_area.mkdir()
+    build_state.record(work_area, {'default'}, _SOURCES, _OPTIONS, 'c0ffee')
+    assert server.decide_sim_only(str(other_work_area), {'default'}, _SOURCES, _OPTIONS)[0] is False
+
+def test_build_options_fingerprint(server):
+    fingerprint = server.build_options_fingerprint
+    assert fingerprint({'elabOpts': ' -debug  -lca '}) == fingerprint({'elabOpts': '-debug -lca'})
+    assert fingerprint({'includeWaveform': True}) != fingerprint({}) # Waveform dumping adds debug access
+    assert fingerprint({'runOpts': '+verbose'}) == fingerprint({}) # Run-time only
+
+def _git(repo_path, *git_args):
+    subprocess.run(["git", "-c", "user.name=t", "-c", "user.email=t@t", *git_args], cwd=repo_path, check=True, capture_output=True)
+
+@pytest.fixture
+def project_root(tmp_path):
+    root = tmp_path / 'proj'
+    for relative_path, content in (('rtl/top.sv', "module top; endmodule\n"), ('dv/tb/tb.sv', "module tb; endmodule\n"), ('docs/notes.md', "notes\n")):
+        (root / relative_path).parent.mkdir(parents=True, exist_ok=True); (root / relative_path).write_text(content)
+    _git(root, "init", "-q"); _git(root, "add", "."); _git(root, "commit", "-q", "-m", "initial")
+    return root
+
+def test_source_fingerprint_follows_rtl_and_tb_only(server, project_root):
+    fingerprint = server.compute_build_source_fingerprint(str(project_root))
+    assert fingerprint and len(fingerprint) == 64
+    (project_root / 'docs' / 'notes.md').write_text("more notes\n"); _git(project_root, "commit", "-q", "-am", "docs only")
+    assert server.compute_build_source_fingerprint(str(project_root)) == fingerprint # New commit, same build inputs
+    (project_root / 'dv' / 'sim_ctrl' / 'ts' / 'temp').mkdir(parents=True)
+    (project_root / 'dv' / 'sim_ctrl' / 'ts' / 'temp' / 'rerun.hjson').write_text("{}")
+    _git(project_root, "add", "-f", "dv/sim_ctrl/ts/temp/rerun.hjson"); _git(project_root, "commit", "-q", "-m", "temp hjson")
+    assert server.compute_build_source_fingerprint(str(project_root)) == fingerprint # Excluded path
+
+def test_source_fingerprint_sees_local_changes(server, project_root):
+    fingerprint = server.compute_build_source_fingerprint(str(project_root))
+    (project_root / 'rtl' / 'top.sv').write_text("module top(input clk); endmodule\n") # Not committed
+    modified_fingerprint = server.compute_build_source_fingerprint(str(project_root))
+    assert modified_fingerprint not in (None, fingerprint)
+    _git(project_root, "commit", "-q", "-am", "rtl change")
+    assert server.compute_build_source_fingerprint(str(project_root)) not in (None, fingerprint)
+    (project_root / 'dv' / 'tb' / 'tb.sv').unlink() # Deleted, not committed
+    assert server.compute_build_source_fingerprint(str(project_root)) not in (None, fingerprint, modified_fingerprint)
+
+def test_source_fingerprint_outside_git(server, tmp_path):
+    assert server.compute_build_source_fingerprint(str(tmp_path)) is None
@@ -0,0 +1,81 @@
+# Server-side rerun selection: select_cases_from_report over a report model, and gzip request
+# bodies for /rerun/<repo_id>.
+import gzip
+import json
+
+import pytest
+
+# (test name, seed, status, error hint), in report order
+_CASES = [('mtu_basic_write', '5', 'F', 'UVM_ERROR @ 1200 ns: [SCB] timeout waiting for rsp 0x1f'),
+          ('mtu_basic_read', '7', 'P', ''),
+          ('mtu_burst_write', '12', 'K', 'Job killed most likely because its dependent job failed.'),
+          ('mtu_basic_write', '30', 'F', 'UVM_ERROR @ 99 ns: [SCB] timeout waiting for rsp 0x2a'),
+          ('dma_chain', '8', 'F', 'UVM_FATAL [CFG] missing config'),
+          ('dma_chain', 'abc', 'U', '')]
+
+@pytest.fixture
+def report_model(server, tmp_path, monkeypatch):
+    monkeypatch.setattr(server, 'REPORT_MODEL_CACHE', server.ReportModelCache(server.REPORT_MODEL_CACHE_MAX_BYTES))
+    rows = "".join(f'<tr><td>{name} (Seed: {seed})</td><td class="status-{status}">{status}</td><td>0%</td><td><code>sim/{name}/run.log</code></td>'
+                   f'<td>{hint}</td><td><input type="checkbox" class="rerun-checkbox" data-casename="{name}" data-seed="{seed}"></td></tr>\n'
+                   for name, seed, status, hint in _CASES)
+    html_file_path = tmp_path / 'live_report.html'
+    html_file_path.write_text(f'<table id="detailedStatusTable"><tbody>\n{rows}</tbody></table>\n')
+    return server.get_report_model(str(html_file_path))
+
+@pytest.mark.parametrize('selection, expected', [
+    ({}, ['mtu_basic_write_seed5', 'mtu_basic_read_seed7', 'mtu_burst_write_seed12', 'mtu_basic_write_seed30', 'dma_chain_seed8', 'dma_chain_seedabc']),
+    ({'status': 'F'}, ['mtu_basic_write_seed5', 'mtu_basic_write_seed30', 'dma_chain_seed8']),
+    ({'status': ['FAILED', 'killed']}, ['mtu_basic_write_seed5', 'mtu_burst_write_seed12', 'mtu_basic_write_seed30', 'dma_chain_seed8']),
+    ({'name': 'mtu_*write'}, ['mtu_basic_write_seed5', 'mtu_burst_write_seed12', 'mtu_basic_write_seed30']),
+    ({'name': 'mtu_basic_?rite_seed3*'}, ['mtu_basic_write_seed30']), # Globs also match the full case id
+    ({'name': 'MTU_*'}, []), # Case-sensitive, like test names
+    ({'hint': 'TIMEOUT'}, ['mtu_basic_write_seed5', 'mtu_basic_write_seed30']),
+    ({'seed_min': 8, 'seed_max': '12'}, ['mtu_burst_write_seed12', 'dma_chain_seed8']), # Non-numeric seeds never match a range
+    ({'status': 'F', 'name': 'mtu_*', 'hint': 'rsp', 'seed_max': 10}, ['mtu_basic_write_seed5']),
+    ({'status': ['F', 'K'], 'one_per_signature': True}, ['mtu_basic_write_seed5', 'mtu_burst_write_seed12', 'dma_chain_seed8']),
+])
+def test_selection_fields(server, report_model, selection, expected):
+    assert server.select_cases_from_report(report_model, selection) == expected
+
+def test_signature_selection_keeps_report_order(server, report_model):
+    signature = report_model.records['mtu_basic_write_seed30']['signature']
+    assert server.select_cases_from_report(report_model, {'signature': [signature]}) == ['mtu_basic_write_seed5', 'mtu_basic_write_seed30']
+    assert server.select_cases_from_report(report_model, {'signature': signature, 'status': 'K'}) == []
+
+@pytest.mark.parametrize('selection, message', [
+    ({'status': 'F', 'colour': 'red'}, "unknown field(s): colour"),
+    ({'seed_min': 'ten'}, "seed_min/seed_max must be integers."),
+    (['F'], "selection must be an object."),
+])
+def test_invalid_selections(server, report_model, selection, message):
+    with pytest.raises(ValueError) as excinfo: server.select_cases_from_report(report_model, selection)
+    assert str(excinfo.value) == message
+
+def _post_rerun(client, body_bytes, content_encoding=None):
+    headers = {'Content-Type': 'application/json'}
+    if content_encoding: headers['Content-Encoding'] = content_encoding
+    return client.post('/live_reporter/rerun/repo1', data=body_bytes, headers=headers)
+
+def test_rerun_accepts_gzip_body(client, report_model):
+    # A selection matching nothing is refused before any job starts, after the body was read
+    body = {'html_report_actual_path': report_model.html_file_path, 'selection': {'status': 'F', 'name': 'no_such_test*'}}
+    for body_bytes, content_encoding in ((json.dumps(body).encode('utf-8'), None), (gzip.compress(json.dumps(body).encode('utf-8')), 'gzip')):
+        response = _post_rerun(client, body_bytes, content_encoding)
+        assert (response.status_code, response.get_json()['message']) == (400, "Selection matched no cases in the report.")
+
+def test_rerun_reports_invalid_selection(client, report_model):
+    body = {'html_report_actual_path': report_model.html_file_path, 'selection': {'seed_min': 'ten'}}
+    response = _post_rerun(client, gzip.compress(json.dumps(body).encode('utf-8')), 'gzip')
+    assert (response.status_code, response.get_json()['message']) == (400, "Invalid selection: seed_min/seed_max must be integers.")
+
+@pytest.mark.parametrize('body_bytes, message_start', [
+    (b'{"selection": {"status": "F"}}', "Request body is not valid gzip"),
+    (gzip.compress(b'{"selection": '), "Request body is not valid JSON"),
+    (gzip.compress(b' ' * 2048 + b'{}'), "Decompressed request body exceeds 1024 bytes."),
+])
+def test_rerun_rejects_bad_gzip_bodies(server, client, monkeypatch, body_bytes, message_start):
+    monkeypatch.setattr(server, 'REQUEST_BODY_MAX_DECOMPRESSED_BYTES', 1024)
+    response = _post_rerun(client, body_bytes, 'gzip')
+    assert response.status_code == 400
+    assert response.get_json()['message'].startswith(message_start)
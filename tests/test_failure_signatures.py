@@ -0,0 +1,80 @@
+# Failure signatures: hint normalization, hashing into buckets, and the per-report bucket index
+# kept by the sidecar store and the cached report model as reruns update rows.
+import json
+import logging
+import os
+
+import pytest
+
+@pytest.mark.parametrize('error_hint, normalized', [
+    ("UVM_ERROR tb_scoreboard.sv(812) @ 123450 ns: [SCB] data mismatch exp 0xDEADBEEF got 32'hdead_beef",
+     "UVM_ERROR tb_scoreboard.sv(<n>) @ <time>: [SCB] data mismatch exp <hex> got <hex>"),
+    ("UVM_FATAL @ 1.5us: [TIMEOUT] watchdog expired after 5000 cycles", "UVM_FATAL @ <time>: [TIMEOUT] watchdog expired after <n> cycles"),
+    ("Error at 2025-05-21_16-52-27-549608 (12:01:33.25): seed=12345 see /proj/work/d1/sim/run.log", "Error at <ts> (<ts>): seed=<seed> see <path>"),
+    ("Seed: 991 failed", "seed=<seed> failed"),
+    ("  Job killed   most likely\tbecause its dependent job failed. ", "Job killed most likely because its dependent job failed."),
+    (None, ""),
+])
+def test_normalize_failure_hint(server, error_hint, normalized):
+    assert server.normalize_failure_hint(error_hint) == normalized
+
+def test_signatures_ignore_run_specific_details(server):
+    first = server.failure_signature('F', "UVM_ERROR @ 1200 ns: [SCB] mismatch at 0x1f00, seed 7, see /a/sim/t.0/run.log")
+    assert first == server.failure_signature('K', "UVM_ERROR @ 88 ns: [SCB] mismatch at 0xbeef, seed 4242, see /b/sim/t.3/run.log")
+    assert first != server.failure_signature('F', "UVM_ERROR @ 1200 ns: [DRV] mismatch at 0x1f00, seed 7, see /a/sim/t.0/run.log")
+    assert len(first) == 12 and set(first) <= set('0123456789abcdef')
+
+@pytest.mark.parametrize('status_code, error_hint', [('P', "UVM_ERROR stale hint"), ('F', ""), ('F', "   "), ('U', None)])
+def test_no_signature_for_passes_and_empty_hints(server, status_code, error_hint):
+    assert server.failure_signature(status_code, error_hint) == ''
+
+_HINT_SCB = "UVM_ERROR @ {n} ns: [SCB] data mismatch exp 0x{n:x}"
+_HINT_TIMEOUT = "UVM_FATAL @ {n} ns: [TIMEOUT] watchdog expired after {n} cycles"
+
+def _write_report(path, cases):
+    rows = "".join(f'<tr><td>{name} (Seed: {seed})</td><td class="status-{status}">{status}</td><td>0%</td><td><code>run.log</code></td>'
+                   f'<td>{hint}</td><td></td></tr>\n' for name, seed, status, hint in cases)
+    path.write_text(f'<table id="detailedStatusTable"><tbody>\n{rows}</tbody></table>\n')
+    return str(path)
+
+@pytest.fixture
+def report_path(server, tmp_path, monkeypatch):
+    monkeypatch.setattr(server, 'REPORT_MODEL_CACHE', server.ReportModelCache(server.REPORT_MODEL_CACHE_MAX_BYTES))
+    monkeypatch.setattr(server, 'REPORT_WRITE_BATCH_WINDOW_SECONDS', 0.0)
+    return _write_report(tmp_path / 'live_report.html', [
+        ('t_a', '1', 'F', _HINT_SCB.format(n=10)), ('t_b', '2', 'P', ''), ('t_a', '3', 'F', _HINT_SCB.format(n=977)),
+        ('t_c', '4', 'K', _HINT_TIMEOUT.format(n=5)), ('t_d', '5', 'F', _HINT_SCB.format(n=31337)), ('t_e', '6', 'U', '')])
+
+def _buckets(model):
+    return {signature: (bucket['count'], model.row_index()['by_signature'][signature]) for signature, bucket in model.signature_buckets.items()}
+
+def test_buckets_after_first_scan(server, report_path):
+    model = server.get_report_model(report_path)
+    scb_signature = server.failure_signature('F', _HINT_SCB.format(n=0)); timeout_signature = server.failure_signature('K', _HINT_TIMEOUT.format(n=0))
+    assert _buckets(model) == {scb_signature: (3, ['t_a_seed1', 't_a_seed3', 't_d_seed5']), timeout_signature: (1, ['t_c_seed4'])}
+    assert model.signature_buckets[scb_signature]['sample_hint'] in {_HINT_SCB.format(n=n) for n in (10, 977, 31337)}
+
+def test_buckets_follow_reruns(server, report_path, monkeypatch):
+    server.get_report_model(report_path) # Cached, so the update below goes through ReportModel.with_results
+    timeout_signature = server.failure_signature('K', _HINT_TIMEOUT.format(n=0))
+    results = [{'id': 't_c_seed4', 'status': 'PASSED', 'error_hint': '', 'new_log_path': 'rerun.log'}, # Its bucket empties and disappears
+               {'id': 't_a_seed1', 'status': 'FAILED', 'error_hint': _HINT_TIMEOUT.format(n=12), 'new_log_path': 'rerun.log'}, # Moves buckets
+               {'id': 't_b_seed2', 'status': 'FAILED', 'error_hint': "Error: new failure in /x/y.sv", 'new_log_path': 'rerun.log'}] # New bucket
+    assert server.update_html_report_on_disk(report_path, results, None, None, None, None, logging.getLogger('tests'))
+    incremental_buckets = _buckets(server.get_report_model(report_path))
+    assert incremental_buckets[timeout_signature] == (1, ['t_a_seed1'])
+    assert incremental_buckets[server.failure_signature('F', "Error: new failure in /z.sv")] == (1, ['t_b_seed2'])
+    assert len(incremental_buckets) == 3
+    # The sidecar counters, and a full rescan of the rewritten HTML, agree with the cached model
+    monkeypatch.setattr(server, 'REPORT_MODEL_CACHE', server.ReportModelCache(server.REPORT_MODEL_CACHE_MAX_BYTES))
+    assert _buckets(server.get_report_model(report_path)) == incremental_buckets
+    os.remove(f"{report_path}{server.REPORT_SIDECAR_SUFFIX}")
+    monkeypatch.setattr(server, 'REPORT_MODEL_CACHE', server.ReportModelCache(server.REPORT_MODEL_CACHE_MAX_BYTES))
+    assert _buckets(server.get_report_model(report_path)) == incremental_buckets
+
+def test_rerun_signature_narrows_the_selection_to_the_bucket(server, client, report_path):
+    # A bucket with no case of the requested name is refused before any job starts
+    scb_signature = server.failure_signature('F', _HINT_SCB.format(n=0))
+    body = json.dumps({'html_report_actual_path': report_path, 'selection': {'name': 't_c'}})
+    response = client.post(f'/live_reporter/rerun_signature/repo1/{scb_signature}', data=body, headers={'Content-Type': 'application/json'})
+    assert (response.status_code, response.get_json()['message']) == (400, "Selection matched no cases in the report.")
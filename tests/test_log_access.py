@@ -0,0 +1,77 @@
+# /log/<repo_id> helpers: resolve_confined_log_path keeps report log paths inside the project's
+# work tree, and tail_log_file_mmap returns the last lines of a log without reading it whole.
+import os
+
+import pytest
+
+@pytest.fixture
+def project_root(tmp_path):
+    run_dir = tmp_path / 'proj' / 'work' / 'd1' / 'ipx-main' / 'sim' / 'ipx_t0_seed1' / 'ts1'
+    run_dir.mkdir(parents=True)
+    (run_dir / 'run.log').write_text("UVM_INFO start\n")
+    (tmp_path / 'secret.txt').write_text("not a log\n")
+    return tmp_path / 'proj'
+
+@pytest.mark.parametrize('requested_log_path', [
+    'work/d1/ipx-main/sim/ipx_t0_seed1/ts1/run.log',
+    'sim/ipx_t0_seed1/ts1/run.log', # Relative to work/<dir>/<vcs_context>, as msim reports store it
+    'work\\d1\\ipx-main\\sim\\ipx_t0_seed1\\ts1\\run.log',
+    '  work/d1/ipx-main/sim/ipx_t0_seed1/ts1/run.log  ',
+])
+def test_resolves_report_paths(server, project_root, requested_log_path):
+    expected = os.path.realpath(project_root / 'work' / 'd1' / 'ipx-main' / 'sim' / 'ipx_t0_seed1' / 'ts1' / 'run.log')
+    assert server.resolve_confined_log_path(str(project_root), requested_log_path) == expected
+
+def test_absolute_path_inside_work_tree(server, project_root):
+    log_path = project_root / 'work' / 'd1' / 'ipx-main' / 'sim' / 'ipx_t0_seed1' / 'ts1' / 'run.log'
+    assert server.resolve_confined_log_path(str(project_root), str(log_path)) == os.path.realpath(log_path)
+
+@pytest.mark.parametrize('requested_log_path', [
+    '../secret.txt', 'work/../../secret.txt', 'sim/../../../../../secret.txt', 'work/d1/../../../secret.txt',
+    '/etc/passwd', 'work/d1/ipx-main/sim/ipx_t0_seed1', # A directory, not a file
+    'work/d1/ipx-main/sim/no_such_case/run.log', '',
+])
+def test_rejects_paths_outside_the_work_tree(server, project_root, requested_log_path):
+    assert server.resolve_confined_log_path(str(project_root), requested_log_path) is None
+
+def test_rejects_symlinks_leaving_the_work_tree(server, project_root, tmp_path):
+    run_dir = project_root / 'work' / 'd1' / 'ipx-main' / 'sim' / 'ipx_t0_seed1' / 'ts1'
+    os.symlink(tmp_path / 'secret.txt', run_dir / 'escape.log')
+    os.symlink(tmp_path, project_root / 'work' / 'd1' / 'outside')
+    assert server.resolve_confined_log_path(str(project_root), 'work/d1/ipx-main/sim/ipx_t0_seed1/ts1/escape.log') is None
+    assert server.resolve_confined_log_path(str(project_root), 'work/d1/outside/secret.txt') is None
+
+def test_follows_symlinks_within_the_work_tree(server, project_root):
+    case_dir = project_root / 'work' / 'd1' / 'ipx-main' / 'sim' / 'ipx_t0_seed1'
+    os.symlink('ts1', case_dir / 'latest')
+    assert server.resolve_confined_log_path(str(project_root), 'sim/ipx_t0_seed1/latest/run.log') == os.path.realpath(case_dir / 'ts1' / 'run.log')
+
+def test_no_project_root(server):
+    assert server.resolve_confined_log_path(None, 'work/d1/run.log') is None
+
+def _tail(server, path, content, num_lines, max_bytes=None):
+    path.write_bytes(content)
+    tail_bytes, start_offset = server.tail_log_file_mmap(str(path), num_lines, *([max_bytes] if max_bytes is not None else []))
+    assert content[start_offset:] == tail_bytes
+    return tail_bytes
+
+@pytest.mark.parametrize('content, num_lines, expected', [
+    (b"a\nb\nc\n", 2, b"b\nc\n"),
+    (b"a\nb\nc", 2, b"b\nc"), # No trailing newline
+    (b"a\nb\nc\n", 3, b"a\nb\nc\n"),
+    (b"a\nb\nc\n", 10, b"a\nb\nc\n"), # Fewer lines than asked for
+    (b"single line", 1, b"single line"),
+    (b"\n\n\n", 2, b"\n\n"), # Empty lines count
+    (b"a\nb\n", 0, b""),
+])
+def test_tail_lines(server, tmp_path, content, num_lines, expected):
+    assert _tail(server, tmp_path / 'run.log', content, num_lines) == expected
+
+def test_tail_of_empty_file(server, tmp_path):
+    (tmp_path / 'run.log').write_bytes(b"")
+    assert server.tail_log_file_mmap(str(tmp_path / 'run.log'), 5) == (b"", 0)
+
+def test_tail_stops_at_max_bytes(server, tmp_path):
+    content = b"".join(b"line %04d\n" % index for index in range(1000))
+    tail_bytes = _tail(server, tmp_path / 'run.log', content, 1000, max_bytes=95)
+    assert len(tail_bytes) <= 95 and tail_bytes.endswith(b"line 0999\n")
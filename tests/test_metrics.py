@@ -0,0 +1,53 @@
+# Metrics registry: per-thread shards summed at scrape time, shards of finished threads folded
+# into the retired shard exactly once, and the Prometheus text served by /metrics.
+import threading
+
+import pytest
+
+@pytest.fixture
+def registry(server):
+    registry = server.MetricsRegistry()
+    registry.counter('lines_total', "Lines.")
+    registry.histogram('latency_seconds', "Latency.", (1, 0.1))
+    return registry
+
+def _in_thread(work):
+    thread = threading.Thread(target=work); thread.start(); thread.join(5)
+
+def test_finished_threads_are_merged_once(registry):
+    registry.inc('lines_total', 2)
+    for _ in range(3): _in_thread(lambda: registry.inc('lines_total', 5))
+    _in_thread(lambda: registry.inc('lines_total', 1, job='a'))
+    expected = {('lines_total', ()): 17, ('lines_total', (('job', 'a'),)): 1}
+    assert registry.collect() == expected
+    assert len(registry._thread_shards) == 1 # Only this thread's shard is still live
+    assert registry.collect() == expected # Retired counts are not added again on the next scrape
+    registry.inc('lines_total')
+    assert registry.collect()[('lines_total', ())] == 18
+
+def test_histograms_merge_across_threads(registry):
+    registry.observe('latency_seconds', 0.05, endpoint='index')
+    _in_thread(lambda: (registry.observe('latency_seconds', 0.5, endpoint='index'), registry.observe('latency_seconds', 30, endpoint='index')))
+    registry.collect() # Retires the worker's shard
+    _in_thread(lambda: registry.observe('latency_seconds', 1, endpoint='index')) # Bounds are inclusive, as in Prometheus
+    assert registry.collect() == {('latency_seconds', (('endpoint', 'index'),)): [1, 2, 1, 31.55]}
+
+def test_render_prometheus_text(registry):
+    registry.inc('lines_total', 3, job='x"y')
+    registry.observe('latency_seconds', 0.5)
+    assert registry.render([('jobs', "Jobs by state.", {(('state', 'running'),): 2})]).splitlines() == [
+        '# HELP lines_total Lines.', '# TYPE lines_total counter', 'lines_total{job="x\\"y"} 3',
+        '# HELP latency_seconds Latency.', '# TYPE latency_seconds histogram',
+        'latency_seconds_bucket{le="0.1"} 0', 'latency_seconds_bucket{le="1.0"} 1', 'latency_seconds_bucket{le="+Inf"} 1',
+        'latency_seconds_sum 0.5', 'latency_seconds_count 1',
+        '# HELP jobs Jobs by state.', '# TYPE jobs gauge', 'jobs{state="running"} 2']
+
+def test_metrics_endpoint(server, client, monkeypatch):
+    monkeypatch.setattr(server, 'ADMISSION', server.AdmissionController(server.LicenseTokenPool('', 0)))
+    monkeypatch.setitem(server.JOB_STATUS, 'job1', {'status': 'running_msim', 'output_lines': ['a', 'b']})
+    response = client.get('/live_reporter/metrics')
+    assert response.status_code == 200 and response.mimetype == 'text/plain'
+    metric_lines = response.get_data(as_text=True).splitlines()
+    assert 'live_report_jobs{state="running_msim"} 1' in metric_lines
+    assert 'live_report_license_tokens_capacity 0' in metric_lines
+    assert '# TYPE live_report_request_duration_seconds histogram' in metric_lines
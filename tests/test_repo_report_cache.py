@@ -0,0 +1,75 @@
+# Read-through repo_id -> report context cache: TTL expiry, LRU eviction, invalidation (including
+# one that lands while a load is running) and the per-request report existence check.
+import threading
+
+import pytest
+
+@pytest.fixture
+def clock(server, monkeypatch):
+    clock = {'now': 1000.0}
+    monkeypatch.setattr(server.time, 'monotonic', lambda: clock['now'])
+    return clock
+
+class _Loader:
+    # Counts loads per repo and returns a context naming the load
+    def __init__(self): self.loads = []
+    def __call__(self, repo_id):
+        self.loads.append(repo_id)
+        return {'rpt': f"/proj/work/{repo_id}/live_report.html", 'load': len(self.loads)}
+
+def test_entries_expire_after_the_ttl(server, clock):
+    cache, loader = server.RepoReportCache(60, 8), _Loader()
+    assert cache.get_or_load(1, loader)['load'] == 1
+    clock['now'] += 59
+    assert cache.get_or_load('1', loader)['load'] == 1 # Keys are strings: route and event ids agree
+    clock['now'] += 1
+    assert cache.get_or_load(1, loader)['load'] == 2
+
+def test_least_recently_used_entry_is_evicted(server, clock):
+    cache, loader = server.RepoReportCache(60, 2), _Loader()
+    cache.get_or_load(1, loader); cache.get_or_load(2, loader)
+    cache.get_or_load(1, loader) # Repo 2 is now the least recently used
+    cache.get_or_load(3, loader)
+    assert loader.loads == [1, 2, 3]
+    cache.get_or_load(1, loader); cache.get_or_load(2, loader)
+    assert loader.loads == [1, 2, 3, 2]
+
+def test_unknown_repos_are_cached_too(server, clock):
+    cache, loads = server.RepoReportCache(60, 8), []
+    assert cache.get_or_load(7, lambda repo_id: loads.append(repo_id)) is None
+    assert cache.get_or_load(7, lambda repo_id: loads.append(repo_id)) is None
+    assert loads == [7]
+
+def test_invalidate_one_repo_or_all(server, clock):
+    cache, loader = server.RepoReportCache(60, 8), _Loader()
+    cache.get_or_load(1, loader); cache.get_or_load(2, loader)
+    cache.invalidate(1)
+    cache.get_or_load(1, loader); cache.get_or_load(2, loader)
+    assert loader.loads == [1, 2, 1]
+    cache.invalidate()
+    cache.get_or_load(1, loader); cache.get_or_load(2, loader)
+    assert loader.loads == [1, 2, 1, 1, 2]
+
+@pytest.mark.parametrize('invalidated_repo_id', ['1', None])
+def test_invalidation_during_a_load_is_not_lost(server, clock, invalidated_repo_id):
+    # The loader read the DB before the new record was written: its result is returned, not stored
+    cache, loader = server.RepoReportCache(60, 8), _Loader()
+    load_started, invalidated = threading.Event(), threading.Event()
+    def slow_loader(repo_id):
+        context = loader(repo_id); load_started.set(); invalidated.wait(5)
+        return context
+    load_thread = threading.Thread(target=lambda: cache.get_or_load(1, slow_loader)); load_thread.start()
+    load_started.wait(5); cache.invalidate(invalidated_repo_id); invalidated.set(); load_thread.join(5)
+    assert cache.get_or_load(1, loader)['load'] == 2
+    assert cache.get_or_load(1, loader)['load'] == 2 # Loads after the invalidation are stored again
+
+def test_report_existence_is_checked_per_request(server, tmp_path, monkeypatch):
+    report_path = tmp_path / 'work' / 'live_report.html'
+    monkeypatch.setattr(server, 'REPO_REPORT_CACHE', server.RepoReportCache(60, 8))
+    monkeypatch.setattr(server, '_load_repo_report_context', lambda repo_id: {'rpt': str(report_path), 'has_test_records': True,
+                                                                              'data_path': None, 'project_root': str(tmp_path)})
+    assert server._get_repo_report_context(1)['rpt_exists'] is False
+    report_path.parent.mkdir(); report_path.write_text("<html></html>") # Written after the context was cached
+    assert server._get_repo_report_context(1)['rpt_exists'] is True
+    monkeypatch.setattr(server, '_load_repo_report_context', lambda repo_id: None)
+    assert server._get_repo_report_context(2) is None
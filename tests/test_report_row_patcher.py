@@ -0,0 +1,67 @@
+# patch_report_rows_streaming: only the four result cells of targeted rows change; every other
+# byte of the report (line endings, indentation, comments, undecodable bytes) is copied as-is.
+import os
+
+import pytest
+
+def _row(test_name, seed, status, log_path, error_hint, indent="  "):
+    return (f'<tr>\r\n{indent}<td align="left">{test_name} (Seed: {seed})</td>\r\n'
+            f'{indent}<td align="center" class="status-{status}">{status}</td>\r\n'
+            f'{indent}<td align="center">{100 if status == "P" else 0}%</td>\r\n'
+            f'{indent}<td align="left"><code>{log_path}</code></td>\r\n'
+            f'{indent}<td align="left">{error_hint}</td>\r\n'
+            f'{indent}<td align="center"><input type="checkbox" class="rerun-checkbox" data-casename="{test_name}" data-seed="{seed}"></td>\r\n'
+            f'</tr>\r\n')
+
+_SUMMARY_ROW = ('<tr>\r\n<td align="left"><strong>Total Run Jobs</strong></td>\r\n<td align="center">Completed: 3</td>\r\n'
+                '<td align="center"><strong>33.33%</strong></td>\r\n<td align="left">(3 total logs)</td>\r\n<td align="left">Failed/Killed: 2</td>\r\n'
+                '<td align="center"></td>\r\n</tr>\r\n')
+
+def _report(rows):
+    # Odd spacing, a comment inside the table and a latin-1 byte outside it must all survive
+    return (b'<html>\r\n<head><title>R\xe9gression</title></head>\r\n<body>\r\n'
+            b'<table   id="detailedStatusTable" class="results">\r\n<tbody>\r\n<!-- <tr><td>not a row</td></tr> -->\r\n'
+            + "".join(rows).encode('utf-8') + _SUMMARY_ROW.encode('utf-8') +
+            b'</tbody>\r\n</table>\r\n<p>after   the table</p>\r\n</body>\r\n</html>\r\n')
+
+@pytest.fixture
+def report_path(tmp_path):
+    path = tmp_path / 'live_report.html'
+    path.write_bytes(_report([_row('ipx_t0', '11', 'F', 'sim/ipx_t0.0/old/run.log', 'UVM_ERROR old', indent="\t"),
+                              _row('ipx_t1', '22', 'P', 'sim/ipx_t1.0/old/run.log', ''),
+                              _row('ipx_t2', '33', 'K', 'sim/ipx_t2.0/old/run.log', 'killed')]))
+    return path
+
+def test_patches_only_the_result_cells_of_targeted_rows(server, report_path):
+    patched = server.patch_report_rows_streaming(str(report_path), {
+        'ipx_t0_seed11': {'status': 'PASSED', 'new_log_path': 'rerun/sim/ipx_t0.0/new/run.log', 'error_hint': ''}})
+    assert patched == {'ipx_t0_seed11'}
+    assert report_path.read_bytes() == _report([_row('ipx_t0', '11', 'P', 'rerun/sim/ipx_t0.0/new/run.log', '', indent="\t"),
+                                                _row('ipx_t1', '22', 'P', 'sim/ipx_t1.0/old/run.log', ''),
+                                                _row('ipx_t2', '33', 'K', 'sim/ipx_t2.0/old/run.log', 'killed')])
+
+def test_escapes_error_hint_and_log_path(server, report_path):
+    result = {'status': 'FAILED', 'new_log_path': 'sim/a&b/<x>/run.log', 'error_hint': 'UVM_ERROR <SCB> got 0x1 & expected 0x2'}
+    server.patch_report_rows_streaming(str(report_path), {'ipx_t1_seed22': result})
+    report_text = report_path.read_bytes().decode('utf-8', errors='surrogateescape')
+    assert '<td align="left">UVM_ERROR &lt;SCB&gt; got 0x1 &amp; expected 0x2</td>' in report_text
+    assert '<code>sim/a&amp;b/&lt;x&gt;/run.log</code>' in report_text
+    row_html = report_text[report_text.index('<tr>', report_text.index('ipx_t0 (Seed')):]
+    row_html = row_html[:row_html.index('</tr>') + 5]
+    assert server.extract_report_row_record(row_html) == {'case_id': 'ipx_t1_seed22', 'status': 'F', 'pass_rate': '0%',
+                                                          'log_path': result['new_log_path'], 'error_hint': result['error_hint']}
+
+def test_leaves_file_untouched_when_no_row_matches(server, report_path):
+    original_bytes = report_path.read_bytes(); original_inode = os.stat(report_path).st_ino
+    assert server.patch_report_rows_streaming(str(report_path), {'ipx_t9_seed99': {'status': 'PASSED'}}) == set()
+    assert report_path.read_bytes() == original_bytes
+    assert os.stat(report_path).st_ino == original_inode # Not even replaced by an identical copy
+    assert [name for name in os.listdir(report_path.parent) if name != report_path.name] == [] # No temp file left behind
+
+def test_output_does_not_depend_on_chunk_boundaries(server, report_path, tmp_path, monkeypatch):
+    results = {'ipx_t2_seed33': {'status': 'FAILED', 'new_log_path': 'new.log', 'error_hint': 'hint'}}
+    small_chunk_path = tmp_path / 'small_chunks.html'; small_chunk_path.write_bytes(report_path.read_bytes())
+    server.patch_report_rows_streaming(str(report_path), results)
+    monkeypatch.setattr(server, 'REPORT_SCAN_CHUNK_CHARS', 7) # Splits tags, comments and rows across reads
+    server.patch_report_rows_streaming(str(small_chunk_path), results)
+    assert small_chunk_path.read_bytes() == report_path.read_bytes()
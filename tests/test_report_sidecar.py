@@ -0,0 +1,88 @@
+# The sidecar store's per-status counters must give the same /stats as the BeautifulSoup
+# heuristic they replaced, both right after the first scan and after incremental updates.
+import logging
+import os
+
+import pytest
+from bs4 import BeautifulSoup
+
+def legacy_stats(html_file_path):
+    # calculate_total_stats_from_html before the sidecar store: every tbody row but the last
+    # (the summary row), status from a known 'status-*' class, else from the cell text
+    stats = {'total': 0, 'passed': 0, 'failed': 0, 'killed': 0, 'other': 0, 'pass_rate': 0.0}
+    with open(html_file_path, 'r', encoding='utf-8') as f:
+        soup = BeautifulSoup(f, 'html.parser')
+    all_rows_in_tbody = soup.find('table', id='detailedStatusTable').find('tbody').find_all('tr', recursive=False)
+    for row in (all_rows_in_tbody if len(all_rows_in_tbody) == 1 else all_rows_in_tbody[:-1]):
+        td_cells = row.find_all('td')
+        if len(td_cells) <= 1: continue
+        final_status_text = td_cells[1].get_text(strip=True).upper()
+        for cls in td_cells[1].get('class', []):
+            if cls.startswith('status-') and cls.split('-', 1)[1].upper() in ['P', 'F', 'K', 'U', 'PASSED', 'FAILED', 'KILLED', 'UNKNOWN']:
+                final_status_text = cls.split('-', 1)[1].upper(); break
+        stats['total'] += 1
+        if final_status_text in ('P', 'PASSED'): stats['passed'] += 1
+        elif final_status_text in ('F', 'FAILED'): stats['failed'] += 1
+        elif final_status_text in ('K', 'KILLED'): stats['killed'] += 1
+        else: stats['other'] += 1
+    if stats['total'] > 0: stats['pass_rate'] = (stats['passed'] / stats['total']) * 100
+    return stats
+
+# (status cell start tag, status cell text) variants the report generators have produced
+_STATUS_CELLS = [('<td align="center" class="status-P">', 'P'), ('<td align="center" class="status-F">', 'F'),
+                 ('<td class="status-passed">', 'PASSED'), ('<td class="cell status-K">', 'K'),
+                 ('<td align="center">', 'FAILED'), ('<td align="center">', 'P'), ('<td class="status-U">', 'U'),
+                 ('<td class="status-FAILED">', 'P'), ('<td align="center">', 'ERROR')]
+
+def write_report(path, case_count):
+    rows = []
+    for index in range(case_count):
+        start_tag, text = _STATUS_CELLS[index % len(_STATUS_CELLS)]
+        test_name, seed = f"ipx_t{index % 5}", str(1000 + index)
+        checkbox = f'<input type="checkbox" class="rerun-checkbox" data-casename="{test_name}" data-seed="{seed}">' if index % 4 else ''
+        rows.append(f'<tr>\n<td align="left">{test_name} (Seed: {seed})</td>\n{start_tag}{text}</td>\n<td>0%</td>\n'
+                    f'<td><code>sim/{test_name}.0/run.log</code></td>\n<td>hint {index}</td>\n<td>{checkbox}</td>\n</tr>\n')
+    rows.append('<tr>\n<td><strong>Total Run Jobs</strong></td>\n<td>Completed: 0</td>\n<td>0%</td>\n<td></td>\n<td>Failed/Killed: 0</td>\n<td></td>\n</tr>\n')
+    with open(path, 'w', encoding='utf-8') as report_file:
+        report_file.write('<html><body>\n<table id="detailedStatusTable">\n<thead><tr><th>Job</th><th>Status</th></tr></thead>\n<tbody>\n'
+                          + "".join(rows) + '</tbody>\n</table>\n</body></html>\n')
+    return str(path)
+
+@pytest.fixture(autouse=True)
+def fresh_model_cache(server, monkeypatch):
+    monkeypatch.setattr(server, 'REPORT_MODEL_CACHE', server.ReportModelCache(server.REPORT_MODEL_CACHE_MAX_BYTES))
+    monkeypatch.setattr(server, 'REPORT_WRITE_BATCH_WINDOW_SECONDS', 0.0)
+
+def _sidecar_stats(server, html_file_path):
+    return server.report_stats_from_status_counts(server.ReportSidecar(html_file_path).get_status_counts())
+
+@pytest.mark.parametrize('case_count', [1, 2, 37])
+def test_counters_match_legacy_heuristic(server, tmp_path, case_count):
+    html_file_path = write_report(tmp_path / 'live_report.html', case_count)
+    assert _sidecar_stats(server, html_file_path) == legacy_stats(html_file_path)
+    assert server.calculate_total_stats_from_html(html_file_path, logger_for_internal_errors=logging.getLogger('tests')) == legacy_stats(html_file_path)
+
+def test_summary_row_alone_is_not_a_case(server, tmp_path):
+    # The one intended difference: the heuristic counted a lone summary row as an 'other' case
+    html_file_path = write_report(tmp_path / 'live_report.html', 0)
+    assert legacy_stats(html_file_path)['total'] == 1
+    assert _sidecar_stats(server, html_file_path) == server.report_stats_from_status_counts({})
+
+def test_counters_follow_incremental_updates(server, tmp_path):
+    html_file_path = write_report(tmp_path / 'live_report.html', 37)
+    _sidecar_stats(server, html_file_path) # First scan
+    results = [{'id': f"ipx_t{index % 5}_seed{1000 + index}", 'status': ('PASSED', 'FAILED', 'KILLED', 'UNKNOWN')[index % 4],
+                'error_hint': f"new hint {index}", 'new_log_path': f"rerun/{index}/run.log"} for index in range(0, 37, 3)]
+    assert server.update_html_report_on_disk(html_file_path, results, None, None, None, None, logging.getLogger('tests'))
+    expected = legacy_stats(html_file_path)
+    sidecar = server.ReportSidecar(html_file_path)
+    with sidecar.connect() as conn: assert not sidecar.ensure_synced(conn) # Adjusted by delta; no rescan needed
+    assert _sidecar_stats(server, html_file_path) == expected
+    os.remove(f"{html_file_path}{server.REPORT_SIDECAR_SUFFIX}")
+    assert _sidecar_stats(server, html_file_path) == expected # Same as a full rescan of the new HTML
+
+def test_store_is_rebuilt_when_report_changes_behind_its_back(server, tmp_path):
+    html_file_path = write_report(tmp_path / 'live_report.html', 10)
+    _sidecar_stats(server, html_file_path)
+    write_report(tmp_path / 'live_report.html', 23) # e.g. a new regression wrote a fresh report
+    assert _sidecar_stats(server, html_file_path) == legacy_stats(html_file_path)
@@ -0,0 +1,59 @@
+# Result memo: keys cover the commit, the test's definition, the simulator options, test name and
+# seed, so changing any of them misses; lookups and stores go through the SQLite memo table.
+import json
+
+import pytest
+
+_BASE_KEY = ('c0ffee', 'def-hash', 'opts', 'ipx_t0_seed7')
+
+@pytest.fixture
+def memo(server, tmp_path):
+    return server.ResultMemo(str(tmp_path / 'result_memo.sqlite'))
+
+@pytest.mark.parametrize('changed_key', [
+    ('deadbeef', 'def-hash', 'opts', 'ipx_t0_seed7'), # New commit
+    ('c0ffee', 'other-def-hash', 'opts', 'ipx_t0_seed7'), # Test definition edited
+    ('c0ffee', 'def-hash', 'other-opts', 'ipx_t0_seed7'), # Different runOpts/elabOpts/...
+    ('c0ffee', 'def-hash', 'opts', 'ipx_t0_seed8'), # Other seed
+    ('c0ffee', 'def-hash', 'opts', 'ipx_t1_seed7'), # Other test
+])
+def test_any_input_change_changes_the_key(server, changed_key):
+    assert server.ResultMemo.key(*changed_key) != server.ResultMemo.key(*_BASE_KEY)
+
+def test_key_is_stable(server):
+    assert server.ResultMemo.key(*_BASE_KEY) == server.ResultMemo.key(*_BASE_KEY)
+
+def test_options_fingerprint_ignores_whitespace_but_not_order(server):
+    fingerprint = server.result_memo_options_fingerprint
+    assert fingerprint({'runOpts': ' +a  +b '}) == fingerprint({'runOpts': '+a +b', 'simTimeHours': '0'})
+    assert fingerprint({'runOpts': '+a +b'}) != fingerprint({'runOpts': '+b +a'})
+    assert fingerprint({'includeWaveform': True}) == fingerprint({}) # Waveforms do not change a verdict
+    assert fingerprint({'simTimeHours': '2'}) != fingerprint({})
+
+def test_definition_hashes_follow_the_hjson(server, tmp_path):
+    hjson_path = tmp_path / 'ipx.hjson'
+    hjson_path.write_text(json.dumps({'tests': [{'name': 'ipx_t0', 'uvm_test_seq': 'seq_a'}, {'name': 'ipx_t1', 'uvm_test_seq': 'seq_b'}]}))
+    before = server.load_test_definition_hashes(str(hjson_path))
+    hjson_path.write_text(json.dumps({'tests': {'ipx_t0': {'uvm_test_seq': 'seq_a', 'name': 'ipx_t0'}, 'ipx_t1': {'uvm_test_seq': 'seq_c', 'name': 'ipx_t1'}}}))
+    after = server.load_test_definition_hashes(str(hjson_path))
+    assert before['ipx_t0'] == after['ipx_t0'] # Same definition, list or dict form
+    assert before['ipx_t1'] != after['ipx_t1']
+
+def test_store_and_lookup(server, memo):
+    keys_by_case_id = {case_id: server.ResultMemo.key('c0ffee', 'def-hash', 'opts', case_id) for case_id in ('ipx_t0_seed1', 'ipx_t0_seed2', 'ipx_t0_seed3')}
+    memo.store({keys_by_case_id['ipx_t0_seed1']: {'id': 'ipx_t0_seed1', 'status': 'PASSED', 'new_log_path': 'sim/ipx_t0_seed1/ts/run.log'},
+                keys_by_case_id['ipx_t0_seed3']: {'id': 'ipx_t0_seed3', 'status': 'PASSED', 'new_log_path': 'sim/ipx_t0_seed3/ts/run.log'}}, 'c0ffee')
+    hits = memo.lookup(keys_by_case_id)
+    assert sorted(hits) == ['ipx_t0_seed1', 'ipx_t0_seed3']
+    assert hits['ipx_t0_seed1'] == {'id': 'ipx_t0_seed1', 'status': 'PASSED', 'error_hint': '', 'new_log_path': 'sim/ipx_t0_seed1/ts/run.log', 'memoized_from_commit': 'c0ffee'}
+    assert memo.lookup({'ipx_t0_seed1': server.ResultMemo.key('deadbeef', 'def-hash', 'opts', 'ipx_t0_seed1')}) == {} # Next commit: miss
+
+def test_lookup_batches_many_keys(server, memo):
+    keys_by_case_id = {f"ipx_t0_seed{seed}": server.ResultMemo.key('c0ffee', 'def-hash', 'opts', f"ipx_t0_seed{seed}") for seed in range(1200)}
+    memo.store({key: {'id': case_id, 'status': 'PASSED'} for case_id, key in keys_by_case_id.items()}, 'c0ffee')
+    assert len(memo.lookup(keys_by_case_id)) == 1200
+
+def test_unavailable_memo_is_a_miss(server, tmp_path):
+    memo = server.ResultMemo(str(tmp_path / 'no_such_dir' / 'memo.sqlite'))
+    memo.store({'k': {'id': 'ipx_t0_seed1', 'status': 'PASSED'}}, 'c0ffee') # Logged, not raised
+    assert memo.lookup({'ipx_t0_seed1': 'k'}) == {}
@@ -0,0 +1,47 @@
+# Error hints from run.log: the first real UVM_ERROR/UVM_FATAL/Error- line (summary count lines
+# skipped), the report summary counts from the tail, and the head/tail scan bounds.
+import pytest
+
+_SUMMARY = ("--- UVM Report Summary ---\n\n** Report counts by severity\nUVM_INFO :  120\nUVM_WARNING :    2\n"
+            "UVM_ERROR :    3\nUVM_FATAL :    0\n** Report counts by id\n[SCB]     3\n")
+
+def _write_log(tmp_path, text, name='run.log'):
+    path = tmp_path / name; path.write_bytes(text.encode('utf-8') if isinstance(text, str) else text)
+    return str(path)
+
+def test_first_error_line_with_summary_counts(server, tmp_path):
+    run_log = _write_log(tmp_path, "UVM_INFO @ 0 ns: [TEST] start\nUVM_ERROR tb.sv(42) @ 1200 ns: [SCB] mismatch\n"
+                                   "UVM_FATAL tb.sv(50) @ 1300 ns: [SCB] giving up\n" + _SUMMARY)
+    assert server.extract_run_log_hint(run_log) == "UVM_ERROR tb.sv(42) @ 1200 ns: [SCB] mismatch (UVM_ERROR: 3, UVM_FATAL: 0)"
+
+def test_summary_count_lines_are_not_errors(server, tmp_path):
+    # An earlier summary (e.g. from a reset phase) precedes the real error
+    run_log = _write_log(tmp_path, "UVM_ERROR :    0\n  UVM_FATAL: 0  \nError-[SE] Syntax error\n  tb.sv, 7\n")
+    assert server.extract_run_log_hint(run_log) == "Error-[SE] Syntax error"
+
+def test_counts_only_when_the_error_line_is_past_the_head_window(server, tmp_path):
+    run_log = _write_log(tmp_path, "UVM_INFO filler line\n" * 60000 + "UVM_ERROR tb.sv(42) @ 9 ms: [SCB] late mismatch\n" + _SUMMARY)
+    assert server.extract_run_log_hint(run_log, head_bytes=1024 * 1024) == "UVM_ERROR: 3, UVM_FATAL: 0 (first error not within the first 1MB of run.log)"
+    assert server.extract_run_log_hint(run_log).startswith("UVM_ERROR tb.sv(42) @ 9 ms: [SCB] late mismatch")
+
+def test_summary_outside_the_tail_window_is_ignored(server, tmp_path):
+    run_log = _write_log(tmp_path, "UVM_ERROR tb.sv(42) @ 1 ns: [SCB] mismatch\n" + _SUMMARY + "UVM_INFO trailing\n" * 100)
+    assert server.extract_run_log_hint(run_log, tail_bytes=200) == "UVM_ERROR tb.sv(42) @ 1 ns: [SCB] mismatch"
+
+def test_long_error_lines_are_truncated(server, tmp_path):
+    run_log = _write_log(tmp_path, "UVM_ERROR " + "x" * 2000 + "\n")
+    assert server.extract_run_log_hint(run_log) == ("UVM_ERROR " + "x" * 2000)[:server.RUN_LOG_HINT_MAX_LINE_CHARS] + "..."
+
+def test_undecodable_bytes_are_replaced(server, tmp_path):
+    run_log = _write_log(tmp_path, b"UVM_FATAL @ 5 ns: [CFG] bad byte \xff here\n")
+    assert server.extract_run_log_hint(run_log) == "UVM_FATAL @ 5 ns: [CFG] bad byte \ufffd here"
+
+@pytest.mark.parametrize('text', ["", "UVM_INFO all good\n", "UVM_INFO done\n--- UVM Report Summary ---\nUVM_ERROR :    0\nUVM_FATAL :    0\n"])
+def test_no_hint_without_errors(server, tmp_path, text):
+    assert server.extract_run_log_hint(_write_log(tmp_path, text)) is None
+
+def test_missing_logs_and_batches(server, tmp_path):
+    failing_log = _write_log(tmp_path, "UVM_ERROR @ 1 ns: [A] broken\n")
+    missing_log = str(tmp_path / 'no_such_dir' / 'run.log')
+    assert server.extract_run_log_hint(missing_log) is None
+    assert server.extract_run_log_hints([failing_log, missing_log, failing_log]) == {failing_log: "UVM_ERROR @ 1 ns: [A] broken", missing_log: None}
@@ -0,0 +1,68 @@
+# Per-case runtime history: EWMA predictions with test-level fallback, longest-first shard
+# balancing from those predictions, and the ETA note_case_finished keeps in progress_summary.
+import pytest
+
+@pytest.fixture
+def history(server, tmp_path):
+    return server.RuntimeHistory(str(tmp_path / 'runtime_history.sqlite'))
+
+def test_predictions_fall_back_to_test_then_default(server, history):
+    history.record({'ipx_t0_seed1': 100.0})
+    assert history.predict(['ipx_t0_seed1', 'ipx_t0_seed2', 'ipx_t1_seed1']) == {
+        'ipx_t0_seed1': 100.0, 'ipx_t0_seed2': 100.0, 'ipx_t1_seed1': server.RUNTIME_HISTORY_DEFAULT_SECONDS}
+
+def test_record_keeps_an_ewma(server, history):
+    history.record({'ipx_t0_seed1': 100.0})
+    history.record({'ipx_t0_seed1': 200.0})
+    assert history.predict(['ipx_t0_seed1'])['ipx_t0_seed1'] == pytest.approx(100.0 + server.RUNTIME_HISTORY_EWMA_ALPHA * 100.0)
+
+def test_unreadable_history_predicts_the_default(server, tmp_path):
+    history = server.RuntimeHistory(str(tmp_path / 'no_such_dir' / 'runtime_history.sqlite'))
+    history.record({'ipx_t0_seed1': 100.0}) # Logged, not raised
+    assert history.predict(['ipx_t0_seed1']) == {'ipx_t0_seed1': server.RUNTIME_HISTORY_DEFAULT_SECONDS}
+
+def test_longest_first_balances_predicted_work(server):
+    predictions = {'a_seed1': 90.0, 'b_seed1': 70.0, 'c_seed1': 60.0, 'd_seed1': 50.0, 'e_seed1': 40.0, 'f_seed1': 30.0, 'g_seed1': 20.0}
+    shards = server.split_cases_into_shards(['g_seed1', 'f_seed1', 'e_seed1', 'd_seed1', 'c_seed1', 'b_seed1', 'a_seed1', 'new_seed1'], 3, predictions)
+    assert sorted(case_id for shard in shards for case_id in shard) == sorted(list(predictions) + ['new_seed1'])
+    for shard in shards:
+        shard_seconds = [predictions.get(case_id, server.RUNTIME_HISTORY_DEFAULT_SECONDS) for case_id in shard]
+        assert shard_seconds == sorted(shard_seconds, reverse=True)
+    assert shards[0][0] == 'new_seed1' # Never seen before: the default (600s) puts it first, alone
+    assert [sum(predictions[case_id] for case_id in shard) for shard in shards[1:]] == [190.0, 170.0]
+
+@pytest.fixture
+def job_plan(server, monkeypatch):
+    # A job with three predicted cases whose msim stage started at t=1000
+    clock = {'now': 1000.0}
+    monkeypatch.setattr(server.time, 'time', lambda: clock['now'])
+    monkeypatch.setitem(server.JOB_RUNTIME_PLANS, 'job1', {'predictions': {'a_seed1': 300.0, 'b_seed1': 200.0, 'c_seed1': 100.0},
+                                                          'started_at': 1000.0, 'finished_at': {}})
+    monkeypatch.setitem(server.JOB_STATUS, 'job1', {'status': 'running', 'progress_summary': {}})
+    return clock
+
+def test_eta_scales_remaining_work_by_observed_throughput(server, job_plan):
+    job_plan['now'] = 1100.0
+    server.note_case_finished('job1', 'a_seed1') # 300 predicted seconds done in 100 wall seconds
+    summary = server.JOB_STATUS['job1']['progress_summary']
+    assert (summary['predicted_remaining_seconds'], summary['eta_seconds']) == (300.0, 100.0)
+    job_plan['now'] = 1500.0
+    server.note_case_finished('job1', 'c_seed1') # 400 done in 500: slower than predicted
+    assert (summary['predicted_remaining_seconds'], summary['eta_seconds']) == (200.0, 250.0)
+    assert summary['eta_at'] == server.time.strftime('%Y-%m-%d %H:%M:%S', server.time.localtime(1750.0))
+
+def test_unknown_and_repeated_cases_leave_the_eta_alone(server, job_plan):
+    job_plan['now'] = 1100.0
+    server.note_case_finished('job1', 'a_seed1')
+    job_plan['now'] = 1900.0
+    server.note_case_finished('job1', 'a_seed1')
+    server.note_case_finished('job1', 'not_planned_seed1')
+    server.note_case_finished('no_such_job', 'a_seed1')
+    assert server.JOB_STATUS['job1']['progress_summary']['eta_seconds'] == 100.0
+    assert list(server.JOB_RUNTIME_PLANS['job1']['finished_at']) == ['a_seed1']
+
+def test_no_eta_before_the_msim_stage_starts(server, job_plan):
+    server.JOB_RUNTIME_PLANS['job1']['started_at'] = None
+    server.note_case_finished('job1', 'b_seed1')
+    assert server.JOB_STATUS['job1']['progress_summary'] == {}
+    assert server.JOB_RUNTIME_PLANS['job1']['finished_at'] == {'b_seed1': 1000.0} # Still counted once the stage starts
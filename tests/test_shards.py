@@ -0,0 +1,50 @@
+# Shard planning: how many msim shards a rerun gets (explicit, 'auto', capped by cases, cores
+# and license tokens) and how its cases are dealt across them without predictions.
+import pytest
+
+@pytest.fixture(autouse=True)
+def unlimited_admission(server, monkeypatch):
+    monkeypatch.setattr(server, 'ADMISSION', server.AdmissionController(server.LicenseTokenPool('', 0)))
+    monkeypatch.setattr(server, 'MSIM_MAX_SHARDS', 8)
+
+@pytest.mark.parametrize('requested_shards, num_cases, expected', [
+    (None, 50, 1), ('', 50, 1), (1, 50, 1), ('1', 50, 1), (4, 1, 1),
+    (4, 50, 4), ('3', 50, 3), (16, 50, 8), (6, 5, 5), # Capped by MSIM_MAX_SHARDS and by the case count
+    (0, 50, 1), (-2, 50, 1), ('many', 50, 1), ([2], 50, 1),
+])
+def test_explicit_shard_counts(server, requested_shards, num_cases, expected):
+    assert server.choose_msim_shard_count(requested_shards, num_cases) == expected
+
+@pytest.mark.parametrize('cpu_count, load_average, num_cases, expected', [
+    (32, 0.0, 100, 8), # Capped by MSIM_MAX_SHARDS
+    (32, 20.0, 100, 3), # 12 idle cores, 4 per shard
+    (32, 31.5, 100, 1), # Fully loaded host still runs one shard
+    (32, 0.0, 25, 2), # 25 cases, at least 10 per shard
+])
+def test_auto_shard_count(server, monkeypatch, cpu_count, load_average, num_cases, expected):
+    monkeypatch.setattr(server, 'MSIM_CORES_PER_SHARD', 4)
+    monkeypatch.setattr(server, 'MSIM_SHARD_MIN_CASES', 10)
+    monkeypatch.setattr(server.os, 'cpu_count', lambda: cpu_count)
+    monkeypatch.setattr(server.os, 'getloadavg', lambda: (load_average, load_average, load_average))
+    assert server.choose_msim_shard_count('auto', num_cases) == expected
+    assert server.choose_msim_shard_count(' AUTO ', num_cases) == expected
+
+def test_auto_shard_count_uses_free_tokens(server, tmp_path, monkeypatch):
+    token_file = tmp_path / 'msim_tokens'; token_file.write_text("6")
+    monkeypatch.setattr(server, 'ADMISSION', server.AdmissionController(server.LicenseTokenPool(str(token_file), 0)))
+    monkeypatch.setattr(server, 'MSIM_SHARD_MIN_CASES', 1)
+    monkeypatch.setattr(server.os, 'cpu_count', lambda: 64)
+    monkeypatch.setattr(server.os, 'getloadavg', lambda: (0.0, 0.0, 0.0))
+    server.ADMISSION.token_pool.try_acquire('other_job', 4)
+    assert server.choose_msim_shard_count('auto', 100) == 2
+    assert server.choose_msim_shard_count(5, 100) == 5 # Explicit counts are capped by the pool's size, not its free tokens
+
+def test_round_robin_without_predictions(server):
+    case_ids = [f"t{index}_seed{index}" for index in range(7)]
+    assert server.split_cases_into_shards(case_ids, 3) == [
+        ['t0_seed0', 't3_seed3', 't6_seed6'], ['t1_seed1', 't4_seed4'], ['t2_seed2', 't5_seed5']]
+
+def test_empty_shards_are_dropped(server):
+    assert server.split_cases_into_shards(['a_seed1', 'b_seed2'], 4) == [['a_seed1'], ['b_seed2']]
+    assert server.split_cases_into_shards([], 3) == []
+    assert server.split_cases_into_shards(['a_seed1', 'b_seed2'], 0) == [['a_seed1', 'b_seed2']]